@@ -1,4 +1,14 @@
 from botocore.exceptions import BotoCoreError
+import os
+import time
+
+# Most keys a single batch_get_item accepts
+BATCH_GET_MAX_KEYS = 100
+# Most user_ids one get_emails event can look up
+MAX_EMAIL_USER_IDS = int(os.getenv('MAX_EMAIL_USER_IDS', 1000))
+# Retries of the keys DynamoDB left unprocessed, with exponential backoff starting at BATCH_GET_RETRY_SECONDS
+BATCH_GET_RETRIES = int(os.getenv('BATCH_GET_RETRIES', 5))
+BATCH_GET_RETRY_SECONDS = float(os.getenv('BATCH_GET_RETRY_SECONDS', 0.05))
 
 
 def get_email(event, table):
@@ -45,3 +55,93 @@ def get_email(event, table):
         }
 
     return response
+
+
+def get_emails(event, table):
+    """
+    Gets the emails of many user_ids, reading them 100 at a time with batch_get_item and only the user_id and email
+    of each user.
+
+    :param event: Event passed to lambda, the body has `user_ids`.
+    :type event: dict
+    :param table: Table containing the user accounts.
+    :type table: dynamodb.Table
+    :return: 200 with {"emails": [{"user_id": ..., "email": ...}], "not_found": [...]}, 400 if there are no user_ids or
+             more than MAX_EMAIL_USER_IDS, 500 for any internal error or if keys were still unprocessed after retrying.
+    :rtype: dict
+    """
+    response = None
+
+    # dict.fromkeys drops duplicates and keeps the order
+    user_ids = list(dict.fromkeys(event['body']['user_ids']))
+
+    if not user_ids or len(user_ids) > MAX_EMAIL_USER_IDS:
+        return {
+            'statusCode': 400,
+            'body': f'Between 1 and {MAX_EMAIL_USER_IDS} user_ids are required'
+        }
+
+    try:
+        items = []
+
+        for start in range(0, len(user_ids), BATCH_GET_MAX_KEYS):
+            keys = [{'user_id': user_id} for user_id in user_ids[start:start + BATCH_GET_MAX_KEYS]]
+            items += batch_get_emails(table, keys)
+
+        emails = {int(item['user_id']): item.get('email', 'No email found') for item in items}
+
+        response = {
+            'statusCode': 200,
+            'body': {
+                'emails': [{'user_id': user_id, 'email': emails[user_id]} for user_id in user_ids if user_id in emails],
+                'not_found': [user_id for user_id in user_ids if user_id not in emails]
+            }
+        }
+
+    except BotoCoreError as e:
+        response = {
+            'statusCode': 500,
+            'body': 'BotoCoreError: ' + str(e)
+        }
+    except Exception as e:
+        response = {
+            'statusCode': 500,
+            'body': 'Exception: ' + str(e)
+        }
+
+    return response
+
+
+def batch_get_emails(table, keys):
+    """
+    Reads up to 100 users with batch_get_item, retrying the keys DynamoDB leaves unprocessed when throttled.
+
+    :param table: Table containing the user accounts.
+    :type table: dynamodb.Table
+    :param keys: The keys to read, e.g. [{'user_id': 123}].
+    :type keys: list
+    :return: The items found.
+    :rtype: list
+
+    :raises Exception: If keys are still unprocessed after BATCH_GET_RETRIES retries.
+    """
+    items = []
+    request_items = {
+        table.name: {
+            'Keys': keys,
+            'ProjectionExpression': 'user_id, email',
+        }
+    }
+
+    for attempt in range(BATCH_GET_RETRIES + 1):
+        if attempt:
+            time.sleep(BATCH_GET_RETRY_SECONDS * 2 ** (attempt - 1))
+
+        dynamo_response = table.meta.client.batch_get_item(RequestItems=request_items)
+        items += dynamo_response['Responses'].get(table.name, [])
+
+        request_items = dynamo_response.get('UnprocessedKeys')
+        if not request_items:
+            return items
+
+    raise Exception('Keys still unprocessed after retrying')
@@ -1,5 +1,5 @@
 from .post import post_create_user, post_login
-from .get import get_email
+from .get import get_email, get_emails
 import boto3
 import os
 
@@ -24,6 +24,8 @@ def main(event, context):
         elif event['httpMethod'] == 'GET':
             if event['action'] == 'get_email':
                 response = get_email(event, table)
+            elif event['action'] == 'get_emails':
+                response = get_emails(event, table)
 
     except Exception as e:
         response = {
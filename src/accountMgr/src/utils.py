@@ -1,7 +1,22 @@
 from boto3.dynamodb.conditions import Key
 from botocore.exceptions import BotoCoreError
+from requests.adapters import HTTPAdapter
+import os
 import requests
 
+# (connect, read) seconds, a slow random number api must not hold the lambda until it times out
+HTTP_TIMEOUT = (
+    float(os.getenv('HTTP_CONNECT_TIMEOUT_SECONDS', 2)),
+    float(os.getenv('HTTP_READ_TIMEOUT_SECONDS', 5)),
+)
+
+# Shared across warm invocations, so connections to the random number apis are kept alive between them
+session = requests.Session()
+session.mount('https://', HTTPAdapter(
+    pool_connections=int(os.getenv('HTTP_POOL_CONNECTIONS', 4)),
+    pool_maxsize=int(os.getenv('HTTP_POOL_MAXSIZE', 4)),
+))
+
 
 def email_exists(email, table):
     """
@@ -157,7 +172,7 @@ def call_csrng(csrng_url):
 
     :raises ValueError: If the API fails to respond correctly.
     """
-    response = requests.get(csrng_url)
+    response = session.get(csrng_url, timeout=HTTP_TIMEOUT)
     data = response.json()
 
     if data[0]['status'] != 'success':
@@ -177,7 +192,7 @@ def call_random_number_api(random_number_api_url):
 
     :raises ValueError: If the API fails to respond correctly.
     """
-    response = requests.get(random_number_api_url)
+    response = session.get(random_number_api_url, timeout=HTTP_TIMEOUT)
     data = response.json()
 
     if not data:
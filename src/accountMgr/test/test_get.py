@@ -0,0 +1,116 @@
+import unittest
+from unittest.mock import patch
+import boto3
+from moto import mock_aws
+from src.index import main
+
+
+def create_users_table(user_count):
+    dynamodb = boto3.resource('dynamodb', region_name='eu-west-1')
+    table = dynamodb.create_table(
+        TableName='test_table',
+        KeySchema=[{'AttributeName': 'user_id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'user_id', 'AttributeType': 'N'}],
+        BillingMode='PAY_PER_REQUEST',
+    )
+
+    with table.batch_writer() as batch:
+        for user_id in range(user_count):
+            batch.put_item(Item={
+                'user_id': user_id,
+                'email': f'user{user_id}@example.com',
+                'password': 'password',
+                'awaiting_approval': [],
+                'approved': [],
+            })
+
+    return table
+
+
+def get_emails_event(user_ids):
+    return {
+        'httpMethod': 'GET',
+        'action': 'get_emails',
+        'body': {
+            'user_ids': user_ids
+        },
+    }
+
+
+@patch.dict('os.environ', {'AWS_DEFAULT_REGION': 'eu-west-1', 'AWS_ACCESS_KEY_ID': 'testing',
+                           'AWS_SECRET_ACCESS_KEY': 'testing'})
+class TestGetEmails(unittest.TestCase):
+
+    @mock_aws
+    def test_get_emails_reads_in_chunks_of_100(self):
+        table = create_users_table(250)
+
+        with patch.object(table.meta.client, 'batch_get_item', wraps=table.meta.client.batch_get_item) as batch_get:
+            with patch('boto3.resource') as mock_boto3_resource:
+                mock_boto3_resource.return_value.Table.return_value = table
+                response = main(get_emails_event(list(range(249, -1, -1)) + [249, 1000]), {})
+
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual(response['body']['emails'][:2], [
+            {'user_id': 249, 'email': 'user249@example.com'},
+            {'user_id': 248, 'email': 'user248@example.com'},
+        ])
+        self.assertEqual(len(response['body']['emails']), 250)
+        self.assertEqual(response['body']['not_found'], [1000])
+
+        self.assertEqual(batch_get.call_count, 3)
+        request_items = batch_get.call_args.kwargs['RequestItems']['test_table']
+        self.assertEqual(request_items['ProjectionExpression'], 'user_id, email')
+
+    @patch('src.get.BATCH_GET_RETRY_SECONDS', 0)
+    @patch('boto3.resource')
+    def test_get_emails_retries_unprocessed_keys(self, mock_boto3_resource):
+        mock_table = mock_boto3_resource.return_value.Table.return_value
+        mock_table.name = 'test_table'
+        unprocessed = {'test_table': {'Keys': [{'user_id': 2}], 'ProjectionExpression': 'user_id, email'}}
+        mock_table.meta.client.batch_get_item.side_effect = [
+            {
+                'Responses': {'test_table': [{'user_id': 1, 'email': 'one@example.com'}]},
+                'UnprocessedKeys': unprocessed,
+            },
+            {
+                'Responses': {'test_table': [{'user_id': 2, 'email': 'two@example.com'}]},
+                'UnprocessedKeys': {},
+            },
+        ]
+
+        response = main(get_emails_event([1, 2]), {})
+
+        self.assertEqual(response, {
+            'statusCode': 200,
+            'body': {
+                'emails': [
+                    {'user_id': 1, 'email': 'one@example.com'},
+                    {'user_id': 2, 'email': 'two@example.com'},
+                ],
+                'not_found': []
+            }
+        })
+        mock_table.meta.client.batch_get_item.assert_called_with(RequestItems=unprocessed)
+
+    @patch('src.get.BATCH_GET_RETRIES', 2)
+    @patch('src.get.BATCH_GET_RETRY_SECONDS', 0)
+    @patch('boto3.resource')
+    def test_get_emails_gives_up_on_unprocessed_keys(self, mock_boto3_resource):
+        mock_table = mock_boto3_resource.return_value.Table.return_value
+        mock_table.name = 'test_table'
+        mock_table.meta.client.batch_get_item.return_value = {
+            'Responses': {'test_table': []},
+            'UnprocessedKeys': {'test_table': {'Keys': [{'user_id': 1}]}},
+        }
+
+        response = main(get_emails_event([1]), {})
+
+        self.assertEqual(response['statusCode'], 500)
+        self.assertEqual(mock_table.meta.client.batch_get_item.call_count, 3)
+
+    @patch('boto3.resource')
+    def test_get_emails_without_user_ids(self, mock_boto3_resource):
+        response = main(get_emails_event([]), {})
+
+        self.assertEqual(response['statusCode'], 400)
@@ -1,6 +1,6 @@
 import unittest
 from unittest.mock import patch, MagicMock
-from src.utils import email_exists, user_id_exists, get_new_user_id, get_email_item
+from src.utils import email_exists, user_id_exists, get_new_user_id, get_email_item, HTTP_TIMEOUT
 from boto3.dynamodb.conditions import Key
 from botocore.exceptions import BotoCoreError
 
@@ -201,7 +201,7 @@ class TestUtils(unittest.TestCase):
 
     @patch('boto3.resource')
     @patch('src.utils.user_id_exists')
-    @patch('requests.get')
+    @patch('src.utils.session.get')
     def test_get_new_user_id(self, mock_requests_get, mock_user_id_exists, mock_boto3_resource):
         random_min = 0
         random_max = 100000000000
@@ -224,14 +224,14 @@ class TestUtils(unittest.TestCase):
             random_number,
             mock_table
         )
-        mock_requests_get.assert_called_once_with(url)
+        mock_requests_get.assert_called_once_with(url, timeout=HTTP_TIMEOUT)
         mock_requests_get_response.called_once_with()
 
         assert response is random_number
 
     @patch('boto3.resource')
     @patch('src.utils.user_id_exists')
-    @patch('requests.get')
+    @patch('src.utils.session.get')
     def test_get_new_user_id_multiple_times(self, mock_requests_get, mock_user_id_exists, mock_boto3_resource):
         random_min = 0
         random_max = 100000000000
@@ -271,7 +271,7 @@ class TestUtils(unittest.TestCase):
 
     @patch('boto3.resource')
     @patch('src.utils.user_id_exists')
-    @patch('requests.get')
+    @patch('src.utils.session.get')
     def test_get_new_user_id_error_on_non_success_status(self, mock_requests_get, mock_user_id_exists, mock_boto3_resource):
         random_min = 0
         random_max = 100000000000
@@ -294,11 +294,11 @@ class TestUtils(unittest.TestCase):
         self.assertIn('Error processing API response: API response status is not success', str(context.exception))
 
         # Ensure the API was called
-        mock_requests_get.assert_called_once_with(url)
+        mock_requests_get.assert_called_once_with(url, timeout=HTTP_TIMEOUT)
 
     @patch('boto3.resource')
     @patch('src.utils.user_id_exists')
-    @patch('requests.get')
+    @patch('src.utils.session.get')
     def test_get_new_user_id_error_on_connection_failure(self, mock_requests_get, mock_user_id_exists, mock_boto3_resource):
         random_min = 0
         random_max = 100000000000
@@ -312,11 +312,11 @@ class TestUtils(unittest.TestCase):
         with self.assertRaises(ConnectionError):
             get_new_user_id(mock_table)
 
-        mock_requests_get.assert_called_once_with(url)
+        mock_requests_get.assert_called_once_with(url, timeout=HTTP_TIMEOUT)
 
     @patch('boto3.resource')
     @patch('src.utils.user_id_exists')
-    @patch('requests.get')
+    @patch('src.utils.session.get')
     def test_get_new_user_id_error_on_invalid_json(self, mock_requests_get, mock_user_id_exists, mock_boto3_resource):
         random_min = 0
         random_max = 100000000000
@@ -333,4 +333,4 @@ class TestUtils(unittest.TestCase):
         with self.assertRaises(ValueError):
             get_new_user_id(mock_table)
 
-        mock_requests_get.assert_called_once_with(url)
+        mock_requests_get.assert_called_once_with(url, timeout=HTTP_TIMEOUT)
@@ -0,0 +1,69 @@
+"""
+Compares the throughput of /trips with the lambda invocations capped at 1 in flight (how the synchronous boto3 calls
+on the event loop behaved) with the cap at `--concurrency`. The lambda is replaced by a client that sleeps for
+`--latency` seconds.
+
+Run from src/ecs:
+    python -m benchmark.lambda_concurrency [--latency 0.2] [--requests 50] [--concurrency 10]
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import time
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'eu-west-1')
+
+
+class SlowLambdaClient:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def invoke(self, FunctionName, InvocationType, Payload):
+        time.sleep(self.latency)
+        trip_id = json.loads(Payload)['body']['trip_id']
+        return {
+            'ResponseMetadata': {'HTTPStatusCode': 200},
+            'Payload': io.BytesIO(json.dumps({'statusCode': 200, 'body': {'trip_id': trip_id}}).encode('utf-8'))
+        }
+
+
+async def measure_throughput(latency, requests, max_concurrency):
+    import httpx
+    from fastapi import FastAPI
+    from src.lambda_transport import LambdaTransport
+    from src.trip_mgr import trip_mgr
+    from src.trip_cache import TripCache
+    from src.auth_route_dependency import authenticate_request
+
+    app = FastAPI()
+    transport = LambdaTransport(SlowLambdaClient(latency), max_concurrency)
+    # every request is for a different trip, so each one invokes the lambda
+    trip_mgr(app, transport, TripCache())
+    app.dependency_overrides[authenticate_request] = lambda: 1
+
+    async with httpx.AsyncClient(app=app, base_url='http://test') as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[client.get('/trips', params={'trip_id': trip_id}) for trip_id in range(requests)])
+        elapsed = time.perf_counter() - start
+
+    transport.close()
+    return requests / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds a lambda invocation takes')
+    parser.add_argument('--requests', type=int, default=50, help='requests sent at once')
+    parser.add_argument('--concurrency', type=int, default=10, help='lambda invocations in flight at once')
+    args = parser.parse_args()
+
+    print(f'{"cap":<10}{"req/s":>10}')
+    for max_concurrency in (1, args.concurrency):
+        throughput = asyncio.run(measure_throughput(args.latency, args.requests, max_concurrency))
+        print(f'{max_concurrency:<10}{throughput:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
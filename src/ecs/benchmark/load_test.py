@@ -0,0 +1,298 @@
+"""
+Load tests the gateway fully offline. The real `app` from src.main is booted against moto's DynamoDB, SQS and
+Secrets Manager, the lambdas run in process (`LAMBDA_TRANSPORT=in_process`) with the real tripMgr and accountMgr
+handlers, and Weatherbit and Google Places are replaced by stubs that respond after `--upstream-latency` seconds.
+
+Virtual users log in, then send a weighted mix of requests: list trips by location, get a trip, apply for a trip,
+approve an application to one of their own trips, weather forecasts and images. The throughput and the p50/p95/p99
+latency of each route are reported.
+
+moto runs in the same process, so absolute numbers include its CPU time, compare runs on the same machine to catch
+regressions. Pinning to the cores of the target task, e.g. `taskset -c 0,1` for a t4g.micro, gets closer to it.
+
+moto is kept out of the production image in requirements-dev.txt, which the tests need too. Run from src/ecs:
+    pip install -r requirements-dev.txt
+    python -m benchmark.load_test [--users 20] [--requests 2000] [--trips 500] [--upstream-latency 0.05]
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+
+REGION = 'eu-west-1'
+USERS_TABLE = 'load_test_users'
+TRIPS_TABLE = 'load_test_trips'
+TOKENS_TABLE = 'load_test_tokens'
+LOCATIONS = ['London', 'New York', 'Paris', 'Tokyo', 'Sydney', 'Cape Town', 'Lima', 'Reykjavik']
+PASSWORD = 'password'
+
+# route -> weight of the requests after login
+TRAFFIC_MIX = {
+    'GET /trips?location': 35,
+    'GET /trips?trip_id': 20,
+    'POST /user-wants-to-go-on-trip': 10,
+    'POST /user-approval': 5,
+    'GET /weather-forecast': 15,
+    'GET /image': 15,
+}
+
+
+def configure_environment():
+    """
+    Sets the environment the gateway and the lambdas read on import, so it must run before src.main is imported.
+    """
+    os.environ.update({
+        'AWS_ACCESS_KEY_ID': 'testing',
+        'AWS_SECRET_ACCESS_KEY': 'testing',
+        'AWS_SESSION_TOKEN': 'testing',
+        'AWS_DEFAULT_REGION': REGION,
+        'LAMBDA_TRANSPORT': 'in_process',
+        'USERS_DYNAMODB_TABLE': USERS_TABLE,
+        'TRIPS_DYNAMODB_TABLE': TRIPS_TABLE,
+        'TOKEN_DYNAMODB_TABLE': TOKENS_TABLE,
+        'SECRETS_REGION': REGION,
+        'IMAGE_CACHE_DIR': tempfile.mkdtemp(prefix='load-test-images-'),
+        # each virtual user sends far more than a real one, the limiter still runs but never rejects
+        'RATE_LIMIT_CAPACITY': '1000000',
+    })
+
+    # the api keys come from the mocked secret, as they do when deployed
+    for name in ('WEATHER_API_KEY', 'IMAGE_API_KEY', 'TOKEN_SIGNING_KEY'):
+        os.environ.pop(name, None)
+
+
+def create_aws_resources(user_count, trip_count):
+    """
+    Creates the tables, queue and secret in moto and seeds the users and trips.
+
+    :return: The user_ids and the trips, as {trip_id: admin_id}.
+    :rtype: tuple
+    """
+    import boto3
+
+    dynamodb = boto3.resource('dynamodb', region_name=REGION)
+
+    def create_table(name, key, indexes=()):
+        attributes = [{'AttributeName': key, 'AttributeType': 'N'}]
+        attributes += [{'AttributeName': index_key, 'AttributeType': index_type} for index_key, index_type in indexes]
+
+        kwargs = {}
+        if indexes:
+            kwargs['GlobalSecondaryIndexes'] = [{
+                'IndexName': f'{index_key}-index',
+                'KeySchema': [{'AttributeName': index_key, 'KeyType': 'HASH'}],
+                'Projection': {'ProjectionType': 'ALL'},
+            } for index_key, _ in indexes]
+
+        return dynamodb.create_table(
+            TableName=name,
+            KeySchema=[{'AttributeName': key, 'KeyType': 'HASH'}],
+            AttributeDefinitions=attributes,
+            BillingMode='PAY_PER_REQUEST',
+            **kwargs
+        )
+
+    users_table = create_table(USERS_TABLE, 'user_id', [('email', 'S')])
+    trips_table = create_table(TRIPS_TABLE, 'trip_id', [('admin_id', 'N'), ('location', 'S')])
+    create_table(TOKENS_TABLE, 'user_id')
+
+    queue_url = boto3.client('sqs', region_name=REGION).create_queue(QueueName='load-test-failed-requests')['QueueUrl']
+    os.environ['FAILED_REQUEST_SQS_QUEUE'] = queue_url
+
+    boto3.client('secretsmanager', region_name=REGION).create_secret(
+        Name=os.getenv('SECRET_ID', 'cloudCourseWork'),
+        SecretString=json.dumps({'WEATHER_API_KEY': 'weather-key', 'IMAGE_API_KEY': 'image-key'}),
+    )
+
+    user_ids = [100000000000 + index for index in range(user_count)]
+    trips = {}
+
+    with users_table.batch_writer() as batch:
+        for user_id in user_ids:
+            batch.put_item(Item={
+                'user_id': user_id,
+                'email': f'user{user_id}@example.com',
+                'password': PASSWORD,
+                'awaiting_approval': [],
+                'approved': [],
+            })
+
+    with trips_table.batch_writer() as batch:
+        for index in range(trip_count):
+            trip_id = 17000000000000 + index
+            trips[trip_id] = random.choice(user_ids)
+            start_date = int(time.time()) + random.randint(1, 10) * 86400
+
+            batch.put_item(Item={
+                'trip_id': trip_id,
+                'admin_id': trips[trip_id],
+                'location': random.choice(LOCATIONS),
+                'start_date': start_date,
+                'end_date': start_date + 3 * 86400,
+                'title': f'Trip number {index}',
+                'description': 'A week of walking, food and museums.',
+                'awaiting_approval': [],
+                'approved': [],
+            })
+
+    return user_ids, trips
+
+
+def stub_external_apis(http_client, latency):
+    """
+    Replaces the transport of the gateway's http client with stand-ins for Weatherbit and Google Places.
+    """
+    import httpx
+
+    async def handle(request):
+        await asyncio.sleep(latency)
+
+        if request.url.host == 'api.weatherbit.io':
+            return httpx.Response(200, json={
+                'data': [{'temp': random.randint(0, 30), 'weather': {'description': 'Sunny'}} for _ in range(24)]
+            })
+
+        if request.url.path.endswith('findplacefromtext/json'):
+            photo_reference = 'photo-' + request.url.params['input']
+            return httpx.Response(200, json={'candidates': [{'photos': [{'photo_reference': photo_reference}]}]})
+
+        return httpx.Response(200, content=os.urandom(64 * 1024), headers={'Content-Type': 'image/jpeg'})
+
+    http_client.client = httpx.AsyncClient(transport=httpx.MockTransport(handle), follow_redirects=True)
+
+
+class LoadTest:
+    """
+    Runs the virtual users against the app and records the latency of each route.
+    """
+
+    def __init__(self, client, user_ids, trips):
+        self.client = client
+        self.user_ids = user_ids
+        self.trips = trips
+        self.trip_ids = list(trips)
+        self.routes = list(TRAFFIC_MIX)
+        self.weights = list(TRAFFIC_MIX.values())
+
+        # admin_id -> (trip_id, user_id) applications waiting for the admin to approve them
+        self.applications = defaultdict(list)
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.remaining = 0
+
+    async def request(self, route, method, url, **kwargs):
+        start = time.perf_counter()
+        response = await self.client.request(method, url, **kwargs)
+        self.latencies[route].append(time.perf_counter() - start)
+
+        if response.status_code >= 500:
+            self.errors[route] += 1
+
+        return response
+
+    async def virtual_user(self, user_id):
+        response = await self.request('POST /login', 'POST', '/login', json={
+            'email': f'user{user_id}@example.com', 'password': PASSWORD
+        })
+        headers = {'User-Id': str(user_id), 'Authorization': response.json()['auth_token']}
+
+        while self.remaining > 0:
+            self.remaining -= 1
+            route = random.choices(self.routes, self.weights)[0]
+
+            if route == 'POST /user-approval' and self.applications[user_id]:
+                trip_id, applicant_id = self.applications[user_id].pop()
+                await self.request(route, 'POST', '/user-approval', headers=headers, json={
+                    'trip_id': trip_id, 'is_approved': True, 'user_id_to_update': applicant_id
+                })
+            elif route in ('POST /user-wants-to-go-on-trip', 'POST /user-approval'):
+                trip_id = random.choice(self.trip_ids)
+                await self.request('POST /user-wants-to-go-on-trip', 'POST', '/user-wants-to-go-on-trip',
+                                   headers=headers, json={'trip_id': trip_id})
+                self.applications[self.trips[trip_id]].append((trip_id, user_id))
+            elif route == 'GET /trips?location':
+                await self.request(route, 'GET', '/trips', headers=headers,
+                                   params={'location': random.choice(LOCATIONS)})
+            elif route == 'GET /trips?trip_id':
+                await self.request(route, 'GET', '/trips', headers=headers,
+                                   params={'trip_id': random.choice(self.trip_ids)})
+            elif route == 'GET /weather-forecast':
+                start_date = (int(time.time()) // 86400 + random.randint(1, 7)) * 86400
+                await self.request(route, 'GET', '/weather-forecast', headers=headers, params={
+                    'location': random.choice(LOCATIONS), 'start_date': start_date, 'end_date': start_date + 86400
+                })
+            elif route == 'GET /image':
+                await self.request(route, 'GET', '/image', headers=headers,
+                                   params={'location': random.choice(LOCATIONS)})
+
+    async def run(self, concurrency, requests):
+        self.remaining = requests
+
+        start = time.perf_counter()
+        await asyncio.gather(*[self.virtual_user(user_id) for user_id in random.sample(self.user_ids, concurrency)])
+        return time.perf_counter() - start
+
+    def report(self, elapsed):
+        def percentile(sorted_latencies, fraction):
+            return sorted_latencies[min(len(sorted_latencies) - 1, int(len(sorted_latencies) * fraction))] * 1000
+
+        total = sum(len(latencies) for latencies in self.latencies.values())
+        print(f'{total} requests in {elapsed:.2f}s, {total / elapsed:.1f} req/s')
+        print(f'{"route":<34} {"count":>6} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"5xx":>5}')
+
+        for route in ['POST /login'] + self.routes:
+            latencies = sorted(self.latencies.get(route, []))
+            if not latencies:
+                continue
+
+            print(f'{route:<34} {len(latencies):>6} {len(latencies) / elapsed:>8.1f} '
+                  f'{percentile(latencies, 0.5):>8.2f} {percentile(latencies, 0.95):>8.2f} '
+                  f'{percentile(latencies, 0.99):>8.2f} {self.errors[route]:>5}')
+
+
+async def run_load_test(app, user_ids, trips, args):
+    import httpx
+
+    async with httpx.AsyncClient(app=app, base_url='http://gateway') as client:
+        load_test = LoadTest(client, user_ids, trips)
+        elapsed = await load_test.run(min(args.users, len(user_ids)), args.requests)
+
+    load_test.report(elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=20, help='concurrent virtual users')
+    parser.add_argument('--requests', type=int, default=2000, help='requests sent after the users log in')
+    parser.add_argument('--trips', type=int, default=500)
+    parser.add_argument('--upstream-latency', type=float, default=0.05,
+                        help='seconds the Weatherbit and Google Places stubs take to respond')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    configure_environment()
+
+    from moto import mock_aws
+
+    with mock_aws():
+        user_ids, trips = create_aws_resources(max(args.users, 50), args.trips)
+
+        # imported once the environment and the mocked resources exist, as the app reads them on import
+        from src import main as gateway
+
+        stub_external_apis(gateway.http_client, args.upstream_latency)
+
+        try:
+            asyncio.run(run_load_test(gateway.app, user_ids, trips, args))
+        finally:
+            gateway.failed_request_reporter.stop()
+            gateway.lambda_client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""
+Measures what the metrics add to a request: observing a latency in a histogram series, and looking the series up by
+its labels first as the middleware does.
+
+Run from src/ecs:
+    python -m benchmark.metrics [--observations 100000]
+"""
+import argparse
+import timeit
+from src.metrics import MetricFamily
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--observations', type=int, default=100000)
+    args = parser.parse_args()
+
+    family = MetricFamily('benchmark_seconds', 'A benchmark.', 'histogram', ('method', 'route', 'status'))
+    series = family.labels('GET', '/trips', '200')
+
+    observe = min(timeit.repeat(lambda: series.observe(0.03), number=args.observations, repeat=3))
+    labelled = min(timeit.repeat(
+        lambda: family.labels('GET', '/trips', '200').observe(0.03), number=args.observations, repeat=3
+    ))
+
+    print(f'{"":<30}{"us":>10}')
+    print(f'{"observe":<30}{observe / args.observations * 1e6:>10.2f}')
+    print(f'{"labels + observe":<30}{labelled / args.observations * 1e6:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
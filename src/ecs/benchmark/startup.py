@@ -0,0 +1,68 @@
+"""
+Compares the time until the gateway can serve requests when the secret is read from Secrets Manager at startup
+(before) with reading it on first use (after), and what the first and later requests pay for the secret after.
+Secrets Manager is replaced by a client that sleeps for `--latency` seconds.
+
+Run from src/ecs:
+    python -m benchmark.startup [--latency 0.3] [--requests 1000]
+"""
+import argparse
+import json
+import os
+import time
+from unittest.mock import MagicMock
+
+os.environ.setdefault('AWS_DEFAULT_REGION', 'eu-west-1')
+
+
+def create_client(latency):
+    def get_secret_value(SecretId):
+        time.sleep(latency)
+        return {'SecretString': json.dumps({'WEATHER_API_KEY': 'weather', 'IMAGE_API_KEY': 'image'})}
+
+    client = MagicMock()
+    client.get_secret_value.side_effect = get_secret_value
+    return client
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--latency', type=float, default=0.3, help='seconds a Secrets Manager call takes')
+    parser.add_argument('--requests', type=int, default=1000)
+    args = parser.parse_args()
+
+    for name in ('WEATHER_API_KEY', 'IMAGE_API_KEY'):
+        os.environ.pop(name, None)
+
+    start = time.perf_counter()
+    import src.main  # noqa: F401
+    from src.secrets_provider import SecretsProvider
+    import_seconds = time.perf_counter() - start
+
+    provider = SecretsProvider()
+    provider.refresh_interval = 3600
+    provider._client = create_client(args.latency)
+
+    # before: the secret was read before the app was created, every startup waited for it
+    start = time.perf_counter()
+    provider._fetch()
+    fetch_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    provider.get('WEATHER_API_KEY')
+    first_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for _ in range(args.requests):
+        provider.get('WEATHER_API_KEY')
+    later_seconds = (time.perf_counter() - start) / args.requests
+
+    print(f'{"":<30}{"ms":>10}')
+    print(f'{"startup before (eager)":<30}{(import_seconds + fetch_seconds) * 1000:>10.2f}')
+    print(f'{"startup after (lazy)":<30}{import_seconds * 1000:>10.2f}')
+    print(f'{"first secret use after":<30}{first_seconds * 1000:>10.2f}')
+    print(f'{"later secret use after":<30}{later_seconds * 1000:>10.4f}')
+
+
+if __name__ == '__main__':
+    main()
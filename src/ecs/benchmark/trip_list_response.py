@@ -0,0 +1,91 @@
+"""
+Compares the CPU time and bytes on the wire of a trip list response, from the lambda payload to the response body,
+before (stdlib json and JSONResponse) and after (orjson and compression).
+
+Run from src/ecs:
+    python -m benchmark.trip_list_response [--trips 10000] [--iterations 20]
+"""
+import argparse
+import asyncio
+import io
+import json
+import random
+import time
+from fastapi.responses import JSONResponse
+from starlette.requests import Request
+from src.json_response import fast_json_response
+from src.lambda_transport import handle_lambda_response
+
+# fast_json_response is a coroutine, every iteration runs on the same loop
+loop = asyncio.new_event_loop()
+
+LOCATIONS = ['London', 'New York', 'Paris', 'Tokyo', 'Sydney', 'Cape Town', 'Lima', 'Reykjavik']
+
+
+def create_trips(count):
+    trips = []
+    for index in range(count):
+        start_date = 1700000000 + random.randint(0, 10000000)
+        trips.append({
+            'trip_id': 17000000000000 + index,
+            'admin_id': random.randint(100000000000, 999999999999),
+            'start_date': start_date,
+            'end_date': start_date + random.randint(1, 14) * 86400,
+            'location': random.choice(LOCATIONS),
+            'title': f'Trip number {index}',
+            'description': 'A week of walking, food and museums with a group of friends from the course.',
+            'awaiting_approval': [random.randint(100000000000, 999999999999) for _ in range(random.randint(0, 3))],
+            'approved': [random.randint(100000000000, 999999999999) for _ in range(random.randint(0, 5))],
+        })
+    return trips
+
+
+def lambda_response(payload_bytes):
+    return {'ResponseMetadata': {'HTTPStatusCode': 200}, 'Payload': io.BytesIO(payload_bytes)}
+
+
+def request(accept_encoding):
+    headers = [(b'accept-encoding', accept_encoding.encode())] if accept_encoding else []
+    return Request({'type': 'http', 'method': 'GET', 'path': '/trips', 'headers': headers})
+
+
+def before(payload_bytes, _):
+    response_payload = json.loads(payload_bytes.decode('utf-8'))
+    return JSONResponse(status_code=200, content=response_payload['body']).body
+
+
+def after(payload_bytes, accept_encoding):
+    response_payload = handle_lambda_response(lambda_response(payload_bytes))
+    return loop.run_until_complete(fast_json_response(request(accept_encoding), response_payload['body'])).body
+
+
+def measure(name, respond, payload_bytes, accept_encoding, iterations):
+    respond(payload_bytes, accept_encoding)
+
+    cpu_start = time.process_time()
+    for _ in range(iterations):
+        body = respond(payload_bytes, accept_encoding)
+    cpu_ms = (time.process_time() - cpu_start) / iterations * 1000
+
+    print(f'{name:<28} {cpu_ms:>10.2f} {len(body):>14,}')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--trips', type=int, default=10000)
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    random.seed(0)
+    payload_bytes = json.dumps({'statusCode': 200, 'body': create_trips(args.trips)}).encode('utf-8')
+
+    print(f'{args.trips} trips, {len(payload_bytes):,} byte lambda payload, {args.iterations} iterations')
+    print(f'{"":<28} {"cpu ms/req":>10} {"bytes on wire":>14}')
+    measure('before: json', before, payload_bytes, None, args.iterations)
+    measure('after: orjson', after, payload_bytes, None, args.iterations)
+    measure('after: orjson + gzip', after, payload_bytes, 'gzip', args.iterations)
+    measure('after: orjson + br', after, payload_bytes, 'gzip, br', args.iterations)
+
+
+if __name__ == '__main__':
+    main()
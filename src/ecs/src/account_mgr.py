@@ -1,11 +1,14 @@
-from fastapi import HTTPException, Depends, Request
+from typing import List
+from fastapi import HTTPException, Depends, Query, Request
 from fastapi.responses import JSONResponse
-import json
+from starlette.concurrency import run_in_threadpool
 import logging
+import os
 from pydantic import BaseModel
 from .utils import call_account_mgr
 from .auth_token_mgr import AuthTokenMgr
 from .auth_route_dependency import authenticate_request
+from .rate_limiter import rate_limit, COST_QUERY
 
 
 class CreateAccountRequest(BaseModel):
@@ -22,12 +25,16 @@ class SignOutRequest(BaseModel):
     user_id: int
 
 
+# Most user_ids one /emails request can look up, matching the account mgr's limit
+MAX_EMAIL_USER_IDS = int(os.getenv('MAX_EMAIL_USER_IDS', 1000))
+
+
 def account_mgr(app, lambda_client):
     """
     Method that defines all account mgr methods.
     """
     @app.post('/account')
-    def create_account(request: CreateAccountRequest):
+    async def create_account(request: CreateAccountRequest):
         """
         Creates an account.
 
@@ -44,16 +51,16 @@ def account_mgr(app, lambda_client):
         content = None
 
         try:
-            payload = json.dumps({
+            payload = {
                 'httpMethod': 'POST',
                 'action': 'create_user',
                 'body': {
                     'email': email,
                     'password': password
                 }
-            })
+            }
 
-            response_payload = call_account_mgr(lambda_client, payload)
+            response_payload = await call_account_mgr(lambda_client, payload)
 
             status_code = response_payload['statusCode']
 
@@ -74,7 +81,7 @@ def account_mgr(app, lambda_client):
         return JSONResponse(status_code=201, content=content)
 
     @app.post('/login')
-    def login(request: LoginRequest):
+    async def login(request: LoginRequest):
         """
         Signs the user in.
 
@@ -93,21 +100,21 @@ def account_mgr(app, lambda_client):
         content = None
 
         try:
-            payload = json.dumps({
+            payload = {
                 'httpMethod': 'POST',
                 'action': 'login',
                 'body': {
                     'email': email,
                     'password': password
                 }
-            })
+            }
 
-            response_payload = call_account_mgr(lambda_client, payload)
+            response_payload = await call_account_mgr(lambda_client, payload)
 
             status_code = response_payload['statusCode']
 
             if status_code == 200:
-                auth_token = AuthTokenMgr().create_token(response_payload['body']['user_id'])
+                auth_token = await run_in_threadpool(AuthTokenMgr().create_token, response_payload['body']['user_id'])
 
                 content = {
                     'user_id': response_payload['body']['user_id'],
@@ -146,7 +153,7 @@ def account_mgr(app, lambda_client):
 
         content = None
 
-        is_user_removed = AuthTokenMgr().remove_token(user_id)
+        is_user_removed = await run_in_threadpool(AuthTokenMgr().remove_token, user_id)
 
         content = {
             'isUserRemovedFromTokenTable': is_user_removed
@@ -154,7 +161,7 @@ def account_mgr(app, lambda_client):
 
         return JSONResponse(status_code=200, content=content)
 
-    @app.get('/email')
+    @app.get('/email', dependencies=[Depends(rate_limit())])
     async def get_email(user_id_of_email: int, user_id=Depends(authenticate_request)):
         """
         Returns the email for a specific user_id.
@@ -172,15 +179,15 @@ def account_mgr(app, lambda_client):
         content = None
 
         try:
-            payload = json.dumps({
+            payload = {
                 'httpMethod': 'GET',
                 'action': 'get_email',
                 'body': {
                     'user_id': user_id_of_email,
                 }
-            })
+            }
 
-            response_payload = call_account_mgr(lambda_client, payload)
+            response_payload = await call_account_mgr(lambda_client, payload)
 
             status_code = response_payload['statusCode']
 
@@ -205,3 +212,54 @@ def account_mgr(app, lambda_client):
             raise HTTPException(status_code=500, detail=str(e))
 
         return JSONResponse(status_code=200, content=content)
+
+    @app.get('/emails', dependencies=[Depends(rate_limit(COST_QUERY))])
+    async def get_emails(user_ids: List[int] = Query([]), user_id=Depends(authenticate_request)):
+        """
+        Returns the emails of many user_ids in one request, e.g. the members of a trip.
+
+        :param user_ids: The user ids of the desired emails, repeated in the query e.g. ?user_ids=1&user_ids=2.
+        :type: list
+
+        :return: {"emails": [{"user_id": 1, "email": "..."}], "not_found": [2]}
+
+        :raises HTTPException: With status code 400 if there are no user_ids or more than MAX_EMAIL_USER_IDS.
+        :raises HTTPException: With status code 500 in an internal error occurred.
+        :raises HTTPException: With status code 502 if the lambda fails unexpectedly.
+        """
+
+        if not 1 <= len(user_ids) <= MAX_EMAIL_USER_IDS:
+            raise HTTPException(status_code=400, detail=f'Between 1 and {MAX_EMAIL_USER_IDS} user_ids are required')
+
+        content = None
+
+        try:
+            payload = {
+                'httpMethod': 'GET',
+                'action': 'get_emails',
+                'body': {
+                    'user_ids': user_ids,
+                }
+            }
+
+            response_payload = await call_account_mgr(lambda_client, payload)
+
+            status_code = response_payload['statusCode']
+
+            if status_code == 200:
+                content = response_payload['body']
+            elif status_code == 500:
+                logging.error('An error occurred while calling the lambda: ' + str(response_payload))
+                raise HTTPException(status_code=500, detail='Server error occurred')
+            else:
+                logging.error('An error occurred while calling the lambda: ' + str(response_payload))
+                raise HTTPException(status_code=500, detail='Internal error occurred')
+
+        except HTTPException as http_exception:
+            raise http_exception
+
+        except Exception as e:
+            logging.error('invoking user_mgr: ' + str(e))
+            raise HTTPException(status_code=500, detail=str(e))
+
+        return JSONResponse(status_code=200, content=content)
@@ -1,4 +1,6 @@
+import hmac
 from .auth_token_mgr import AuthTokenMgr
+from .secrets_provider import SecretsProvider
 from fastapi import Header, HTTPException, Depends, Request
 
 
@@ -18,3 +20,20 @@ def authenticate_request(request: Request):
         raise HTTPException(status_code=401, detail='Invalid authorization code or user_id')
 
     return user_id
+
+
+async def authenticate_internal_request(request: Request):
+    """
+    Authenticates a request to the internal routes (the metrics and stats), which must carry
+    "Authorization: Bearer <INTERNAL_API_TOKEN>", the token being read from the secret.
+    Example: @app.get('/metrics', dependencies=[Depends(authenticate_internal_request)])
+
+    :raises HTTPException: With status code 401 if the token is missing or wrong.
+    :raises HTTPException: With status code 500 if the secret does not have an INTERNAL_API_TOKEN.
+    """
+    token = await SecretsProvider().aget('INTERNAL_API_TOKEN')
+    authorization = request.headers.get('Authorization', '')
+
+    # compared as bytes, compare_digest rejects str with non-ASCII characters, which a header can contain
+    if not hmac.compare_digest(authorization.encode('utf-8'), f'Bearer {token}'.encode('utf-8')):
+        raise HTTPException(status_code=401, detail='Invalid internal token')
@@ -1,17 +1,22 @@
 import secrets
 import boto3
 import os
+import logging
+import threading
+import time
+from boto3.dynamodb.conditions import Attr
 from fastapi import HTTPException
+from .ttl_cache import TTLCache
+from .signed_tokens import create_signed_token, read_signed_token, TokenRevocations
+from .singleton import SingletonParentClass
+from .secrets_provider import SecretsProvider
+from .metrics import observe_downstream
 
+# Cached for user_ids that are not signed in
+_NOT_SIGNED_IN = object()
 
-# PLEASE NOTE THIS IS A STANDARD PYTHON PATTERN
-class SingletonParentClass(type):
-    _instances = {}
-
-    def __call__(cls, *args, **kwargs):
-        if cls not in cls._instances:
-            cls._instances[cls] = super().__call__(*args, **kwargs)
-        return cls._instances[cls]
+# Name the tokens table's calls are recorded under in the metrics
+TOKENS_TABLE = 'tokens_table'
 
 
 class AuthTokenMgr(metaclass=SingletonParentClass):
@@ -19,6 +24,39 @@ class AuthTokenMgr(metaclass=SingletonParentClass):
         self.dynamodb = boto3.resource('dynamodb')
         self.table = self.dynamodb.Table(os.environ['TOKEN_DYNAMODB_TABLE'])
 
+        # user_id -> the token validated for it, or _NOT_SIGNED_IN. Sign-ins and sign-outs on this container update
+        # it immediately, ones on other containers are seen once the entry expires.
+        self.token_cache = TTLCache(
+            int(os.getenv('TOKEN_CACHE_MAX_ENTRIES', 10000)),
+            float(os.getenv('TOKEN_CACHE_TTL_SECONDS', 60))
+        )
+        self.not_signed_in_ttl = float(os.getenv('TOKEN_CACHE_NOT_SIGNED_IN_TTL_SECONDS', 5))
+
+        # `opaque` tokens are random and checked against the tokens table, `signed` tokens carry their user_id and
+        # expiry and are checked with their signature, the tokens table then only holds sign-outs (revocations)
+        self.token_format = os.getenv('AUTH_TOKEN_FORMAT', 'opaque')
+
+        if self.token_format == 'signed':
+            self.token_lifetime = int(float(os.getenv('TOKEN_LIFETIME_SECONDS', 86400)) * 1000)
+            self.revocation_sync_interval = float(os.getenv('TOKEN_REVOCATION_SYNC_SECONDS', 30))
+            self.revocations = TokenRevocations()
+
+            try:
+                self.sync_revocations()
+            except Exception as e:
+                logging.error('initial token revocation sync failed: ' + str(e))
+
+            threading.Thread(target=self._sync_revocations_forever, name='token-revocation-sync', daemon=True).start()
+
+    @property
+    def signing_key(self):
+        """
+        The key `signed` tokens are signed with, read from the secret on each use so a rotated key is picked up.
+
+        :rtype: bytes
+        """
+        return SecretsProvider().get('TOKEN_SIGNING_KEY').encode('utf-8')
+
     def is_token_valid(self, user_id, token):
         """
         Validates a user_id against a token.
@@ -34,15 +72,29 @@ class AuthTokenMgr(metaclass=SingletonParentClass):
         :raises HTTPException: With status code 500 for some kind of internal error.
         """
 
+        if self.token_format == 'signed':
+            return self._is_signed_token_valid(user_id, token)
+
+        cached_token = self.token_cache.get(user_id)
+
+        if cached_token is _NOT_SIGNED_IN:
+            raise HTTPException(status_code=405, detail="User ID not signed in")
+
+        # a token that does not match the cached one may have been created on another container, so it is checked
+        if cached_token is not None and token == cached_token:
+            return True
+
         try:
-            response = self.table.get_item(Key={'user_id': user_id})
+            response = self._call_table('get_item', Key={'user_id': user_id})
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Could not check existing sign-ins: {str(e)}")
 
         if 'Item' in response and 'token' in response['Item']:
+            self.token_cache.set(user_id, response['Item']['token'])
             return token == response['Item']['token']
 
         if not response.get('Item'):
+            self.token_cache.set(user_id, _NOT_SIGNED_IN, ttl=self.not_signed_in_ttl)
             raise HTTPException(status_code=405, detail="User ID not signed in")
 
         return False
@@ -59,11 +111,18 @@ class AuthTokenMgr(metaclass=SingletonParentClass):
         :raises HTTPException: With status code 500 for some kind of internal error.
         """
 
+        if self.token_format == 'signed':
+            # a token issued in the same millisecond as a sign-out would be revoked
+            issued_at = max(_now_millis(), self.revocations.revoked_before(user_id) + 1)
+            return create_signed_token(self.signing_key, user_id, issued_at, issued_at + self.token_lifetime)
+
         new_token = secrets.token_hex(16)
         try:
-            self.table.put_item(Item={'user_id': user_id, 'token': new_token})
+            self._call_table('put_item', Item={'user_id': user_id, 'token': new_token})
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Unable to signin: {str(e)}")
+
+        self.token_cache.set(user_id, new_token)
         return new_token
 
     def remove_token(self, user_id):
@@ -78,8 +137,94 @@ class AuthTokenMgr(metaclass=SingletonParentClass):
         :raises HTTPException: With status code 500 for some kind of internal error.
         """
 
+        if self.token_format == 'signed':
+            return self._revoke_signed_tokens(user_id)
+
         try:
-            response = self.table.delete_item(Key={'user_id': user_id})
+            response = self._call_table('delete_item', Key={'user_id': user_id})
         except Exception as e:
             raise HTTPException(status_code=500, detail=f"Unable to sign-out correctly: {str(e)}")
+
+        self.token_cache.pop(user_id)
         return True
+
+    def _call_table(self, operation, **kwargs):
+        start = time.perf_counter()
+        is_error = True
+
+        try:
+            response = getattr(self.table, operation)(**kwargs)
+            is_error = False
+            return response
+        finally:
+            observe_downstream(TOKENS_TABLE, operation, time.perf_counter() - start, is_error)
+
+    def _is_signed_token_valid(self, user_id, token):
+        claims = read_signed_token(self.signing_key, token)
+
+        if claims is None:
+            return False
+
+        token_user_id, issued_at, expires_at = claims
+
+        if token_user_id != user_id or expires_at <= _now_millis():
+            return False
+
+        if self.revocations.is_revoked(user_id, issued_at):
+            raise HTTPException(status_code=405, detail="User ID not signed in")
+
+        return True
+
+    def _revoke_signed_tokens(self, user_id):
+        revoked_before = _now_millis()
+        self.revocations.revoke(user_id, revoked_before)
+
+        try:
+            self._call_table('put_item', Item={
+                'user_id': user_id,
+                'revoked_before': revoked_before,
+                # seconds, so that it can be used as the table's time to live attribute
+                'expires_at': (revoked_before + self.token_lifetime) // 1000
+            })
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Unable to sign-out correctly: {str(e)}")
+        return True
+
+    def sync_revocations(self):
+        """
+        Reads the sign-outs made by every container from the tokens table, only the ones that could still revoke an
+        unexpired token are kept.
+
+        :return: None
+        """
+        oldest = _now_millis() - self.token_lifetime
+
+        scan_kwargs = {
+            'FilterExpression': Attr('revoked_before').gte(oldest),
+            'ProjectionExpression': 'user_id, revoked_before'
+        }
+
+        while True:
+            response = self._call_table('scan', **scan_kwargs)
+
+            for item in response.get('Items', []):
+                self.revocations.revoke(int(item['user_id']), int(item['revoked_before']))
+
+            if 'LastEvaluatedKey' not in response:
+                break
+            scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+        self.revocations.prune(oldest)
+
+    def _sync_revocations_forever(self):
+        while True:
+            time.sleep(self.revocation_sync_interval)
+
+            try:
+                self.sync_revocations()
+            except Exception as e:
+                logging.error('token revocation sync failed: ' + str(e))
+
+
+def _now_millis():
+    return int(time.time() * 1000)
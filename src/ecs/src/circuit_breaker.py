@@ -0,0 +1,146 @@
+import time
+from collections import deque
+import httpx
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(httpx.HTTPError):
+    """
+    Raised instead of calling an upstream whose circuit is open. It is an httpx.HTTPError so callers handle it like
+    any other failed call, e.g. by serving a cached response.
+    """
+
+
+class CircuitBreaker:
+    """
+    Stops calling an upstream that is failing, so requests fail fast instead of queueing behind calls that will time
+    out.
+
+    - Closed: calls go through, the outcomes of the last `window` calls are kept. Once at least `min_calls` are kept
+      and the share of failures reaches `failure_rate`, the circuit opens.
+    - Open: calls are rejected for `open_seconds`, then the circuit is half open.
+    - Half open: up to `half_open_probes` calls at a time go through. A successful probe closes the circuit with a
+      clean window, a failed one opens it again.
+
+    Only used from the event loop.
+    """
+
+    def __init__(self, failure_rate=0.5, min_calls=20, window=100, open_seconds=30.0, half_open_probes=1):
+        """
+        :param failure_rate: The share of failed calls, from 0 to 1, that opens the circuit.
+        :type failure_rate: float
+        :param min_calls: The number of calls needed in the window before the circuit can open.
+        :type min_calls: int
+        :param window: The number of recent calls the failure rate is measured over.
+        :type window: int
+        :param open_seconds: Seconds calls are rejected for before probing the upstream.
+        :type open_seconds: float
+        :param half_open_probes: The number of probes in flight at once while half open.
+        :type half_open_probes: int
+        """
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_probes = half_open_probes
+
+        self.state = CLOSED
+        self.outcomes = deque(maxlen=window)
+        self.failures = 0
+        self.opened_at = None
+        self.probes = 0
+
+        self.opened = 0
+        self.rejected = 0
+
+    def acquire(self):
+        """
+        Checks that a call can be made, call `record` or `release` once it is done.
+
+        :return: True if the call is a half open probe.
+        :rtype: bool
+
+        :raises CircuitOpenError: If the circuit is open, or half open with all its probes in flight.
+        """
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.open_seconds:
+                self.rejected += 1
+                raise CircuitOpenError('Circuit is open')
+
+            self.state = HALF_OPEN
+            self.probes = 0
+
+        if self.state == HALF_OPEN:
+            if self.probes >= self.half_open_probes:
+                self.rejected += 1
+                raise CircuitOpenError('Circuit is half open')
+
+            self.probes += 1
+            return True
+
+        return False
+
+    def record(self, is_failure, is_probe):
+        """
+        Records the outcome of a call.
+
+        :param is_failure: True if the call failed.
+        :type is_failure: bool
+        :param is_probe: What `acquire` returned for the call.
+        :type is_probe: bool
+        """
+        if is_probe:
+            self.probes = max(0, self.probes - 1)
+
+            if self.state == HALF_OPEN:
+                if is_failure:
+                    self._open()
+                else:
+                    self._close()
+            return
+
+        # calls started before the circuit opened do not count towards the next window
+        if self.state != CLOSED:
+            return
+
+        if len(self.outcomes) == self.outcomes.maxlen:
+            self.failures -= self.outcomes[0]
+
+        self.outcomes.append(is_failure)
+        self.failures += is_failure
+
+        if len(self.outcomes) >= self.min_calls and self.failures >= self.failure_rate * len(self.outcomes):
+            self._open()
+
+    def release(self, is_probe):
+        """
+        Releases a call that was cancelled before it had an outcome.
+
+        :param is_probe: What `acquire` returned for the call.
+        :type is_probe: bool
+        """
+        if is_probe:
+            self.probes = max(0, self.probes - 1)
+
+    def _open(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.opened += 1
+
+    def _close(self):
+        self.state = CLOSED
+        self.outcomes.clear()
+        self.failures = 0
+
+    def stats(self):
+        """
+        :return: The state of the circuit, how many times it opened and how many calls it rejected.
+        :rtype: dict
+        """
+        return {
+            'state': self.state,
+            'opened': self.opened,
+            'rejected': self.rejected,
+        }
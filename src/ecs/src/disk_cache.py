@@ -0,0 +1,204 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+
+_FILE_NAME = re.compile(r'^([0-9a-f]{64}\.cache|tmp\w+\.tmp)$')
+
+
+class CachedFile:
+    def __init__(self, path, size, content_type):
+        """
+        :param path: Where the file is stored.
+        :type path: str
+        :param size: The size of the file in bytes.
+        :type size: int
+        :param content_type: The media type of the file.
+        :type content_type: str
+        """
+        self.path = path
+        self.size = size
+        self.content_type = content_type
+
+    def open(self):
+        """
+        Opens the file for reading, an open file can still be read after it is evicted.
+
+        :return: The open file.
+        :rtype: BinaryIO
+
+        :raises OSError: If the file was evicted since it was looked up.
+        """
+        return open(self.path, 'rb')
+
+
+class CacheWriter:
+    """
+    Writes a file to the cache in chunks, the file is only added to the cache once it is committed.
+    """
+
+    def __init__(self, cache, key, content_type):
+        self.cache = cache
+        self.key = key
+        self.content_type = content_type
+        self.size = 0
+
+        file_descriptor, self.temp_path = tempfile.mkstemp(dir=cache.directory, suffix='.tmp')
+        self.file = os.fdopen(file_descriptor, 'wb')
+
+    def write(self, chunk):
+        """
+        :param chunk: The next part of the file.
+        :type chunk: bytes
+        """
+        self.file.write(chunk)
+        self.size += len(chunk)
+
+    def commit(self):
+        """
+        Adds the written file to the cache.
+
+        :return: The cached file.
+        :rtype: CachedFile
+        """
+        self.file.close()
+        return self.cache._add(self.key, self.temp_path, self.size, self.content_type)
+
+    def discard(self):
+        """
+        Removes the partly written file, e.g. when the download failed.
+        """
+        self.file.close()
+        try:
+            os.remove(self.temp_path)
+        except OSError:
+            pass
+
+
+class DiskLRUCache:
+    """
+    A size bounded, thread safe, least recently used cache of files on local disk. The index is kept in memory, so
+    the cache starts empty with each container.
+    """
+
+    def __init__(self, directory, max_bytes):
+        """
+        :param directory: The directory to store the files in, it is created if it does not exist.
+        :type directory: str
+        :param max_bytes: The maximum total size of the files, the least recently used files are evicted past this.
+        :type max_bytes: int
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        os.makedirs(directory, exist_ok=True)
+
+        # files left by a previous process are not in the index, so they would never be evicted
+        for file_name in os.listdir(directory):
+            if _FILE_NAME.match(file_name):
+                os.remove(os.path.join(directory, file_name))
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(key.encode('utf-8')).hexdigest() + '.cache')
+
+    def get(self, key):
+        """
+        :param key: The key of the file.
+        :type key: str
+        :return: The cached file, or None.
+        :rtype: CachedFile | None
+        """
+        with self._lock:
+            cached_file = self._entries.get(key)
+
+            if cached_file is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return cached_file
+
+    def writer(self, key, content_type):
+        """
+        Starts writing a file to the cache in chunks.
+
+        :param key: The key of the file.
+        :type key: str
+        :param content_type: The media type of the file.
+        :type content_type: str
+        :return: The writer, the file is added to the cache when it is committed.
+        :rtype: CacheWriter
+        """
+        return CacheWriter(self, key, content_type)
+
+    def put(self, key, content, content_type):
+        """
+        Writes a file to the cache, evicting the least recently used files if it is full.
+
+        :param key: The key of the file.
+        :type key: str
+        :param content: The content of the file.
+        :type content: bytes
+        :param content_type: The media type of the file.
+        :type content_type: str
+        :return: The cached file.
+        :rtype: CachedFile
+        """
+        writer = self.writer(key, content_type)
+        writer.write(content)
+        return writer.commit()
+
+    def _add(self, key, temp_path, size, content_type):
+        path = self._path(key)
+        cached_file = CachedFile(path, size, content_type)
+        evicted = []
+
+        with self._lock:
+            # replacing the file is atomic, so readers see the old or the new content
+            os.replace(temp_path, path)
+
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous.size
+
+            self._entries[key] = cached_file
+            self.total_bytes += size
+
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted_file = self._entries.popitem(last=False)
+                self.total_bytes -= evicted_file.size
+                self.evictions += 1
+                evicted.append(evicted_file.path)
+
+        for evicted_path in evicted:
+            try:
+                os.remove(evicted_path)
+            except OSError:
+                pass
+
+        return cached_file
+
+    def stats(self):
+        """
+        :return: The counters of the cache.
+        :rtype: dict
+        """
+        return {
+            'entries': len(self._entries),
+            'bytes': self.total_bytes,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
@@ -0,0 +1,208 @@
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import boto3
+from .metrics import observe_downstream
+
+# SQS accepts at most 10 messages per SendMessageBatch
+MAX_BATCH_SIZE = 10
+
+REDACTED_HEADERS = {'authorization', 'cookie'}
+
+_STOP = object()
+
+
+class FailedRequestReporter:
+    """
+    Sends failed requests to the failed request mgr's SQS queue in the background.
+
+    Reports are put on a bounded in-memory queue, so reporting never waits on SQS. A worker thread sends them with
+    SendMessageBatch once it has a full batch or the oldest report has waited `flush_interval` seconds. When the queue
+    is full new reports are dropped and counted.
+    """
+
+    def __init__(self, sqs_client, queue_url, max_queue_size=1000, flush_interval=1.0):
+        """
+        :param sqs_client: The boto3 sqs client.
+        :type sqs_client: boto3.client
+        :param queue_url: The url of the failed request queue.
+        :type queue_url: str
+        :param max_queue_size: The maximum number of reports waiting to be sent.
+        :type max_queue_size: int
+        :param flush_interval: The maximum number of seconds a report waits for its batch to fill.
+        :type flush_interval: float
+        """
+        self.sqs_client = sqs_client
+        self.queue_url = queue_url
+        self.flush_interval = flush_interval
+
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+
+        self.sent = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def start(self):
+        """
+        Starts the worker thread, this is done on the first report if it has not been called.
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='failed-request-reporter', daemon=True)
+                self._thread.start()
+
+    def report(self, request, exception):
+        """
+        Queues a failed request to be sent, without blocking.
+
+        :param request: The request sent to ecs.
+        :type request: Request
+        :param exception: The response made by ecs.
+        :type exception: HTTPException
+
+        :return: None
+        """
+        if self._thread is None:
+            self.start()
+
+        headers = {
+            key: '[REDACTED]' if key.lower() in REDACTED_HEADERS else value
+            for key, value in request.headers.items()
+        }
+
+        message_body = json.dumps({
+            'status_code': exception.status_code,
+            'description': exception.detail,
+            'request': {
+                'method': request.method,
+                'url': str(request.url),
+                'headers': headers,
+            }
+        })
+
+        try:
+            self.queue.put_nowait(message_body)
+        except queue.Full:
+            self.dropped += 1
+            if self.dropped % 100 == 1:
+                logging.warning('failed request queue is full, ' + str(self.dropped) + ' reports dropped so far')
+
+    def stop(self, timeout=5):
+        """
+        Sends every queued report and stops the worker thread.
+
+        :param timeout: The maximum number of seconds to wait for the queue to drain.
+        :type timeout: float
+        """
+        with self._lock:
+            thread = self._thread
+
+        if thread is None:
+            return
+
+        try:
+            self.queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logging.error('failed request queue did not drain before shutdown')
+
+        thread.join(timeout)
+
+        with self._lock:
+            self._thread = None
+
+    def _run(self):
+        while True:
+            batch = []
+            stopping = False
+
+            message_body = self.queue.get()
+            if message_body is _STOP:
+                return
+            batch.append(message_body)
+
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < MAX_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                try:
+                    message_body = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+                except queue.Empty:
+                    break
+
+                if message_body is _STOP:
+                    stopping = True
+                    break
+                batch.append(message_body)
+
+            self._send(batch)
+
+            if stopping:
+                # drain whatever was queued before the stop
+                self._drain()
+                return
+
+    def _drain(self):
+        batch = []
+        while True:
+            try:
+                message_body = self.queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if message_body is not _STOP:
+                batch.append(message_body)
+
+            if len(batch) == MAX_BATCH_SIZE:
+                self._send(batch)
+                batch = []
+
+        if batch:
+            self._send(batch)
+
+    def _send(self, batch):
+        start = time.perf_counter()
+
+        try:
+            response = self.sqs_client.send_message_batch(
+                QueueUrl=self.queue_url,
+                Entries=[
+                    {'Id': str(index), 'MessageBody': message_body} for index, message_body in enumerate(batch)
+                ]
+            )
+        except Exception as e:
+            observe_downstream('sqs', 'send_message_batch', time.perf_counter() - start, is_error=True)
+            self.failed += len(batch)
+            logging.error('sending failed requests to sqs: ' + str(e))
+            return
+
+        failed = len(response.get('Failed', []))
+        observe_downstream('sqs', 'send_message_batch', time.perf_counter() - start, is_error=failed > 0)
+
+        self.sent += len(batch) - failed
+        self.failed += failed
+
+        if failed:
+            logging.error('sqs rejected failed requests: ' + str(response['Failed']))
+
+
+def create_failed_request_reporter(region_name):
+    """
+    Creates the failed request reporter configured from the environment: `FAILED_REQUEST_SQS_QUEUE` is the queue
+    url, `FAILED_REQUEST_QUEUE_SIZE` the maximum number of reports waiting to be sent (default 1000) and
+    `FAILED_REQUEST_FLUSH_SECONDS` the maximum time a report waits for its batch to fill (default 1).
+
+    :param region_name: The region the queue is located in.
+    :type region_name: str
+    :return: The failed request reporter.
+    :rtype: FailedRequestReporter
+    """
+    return FailedRequestReporter(
+        boto3.client('sqs', region_name=region_name),
+        os.environ.get('FAILED_REQUEST_SQS_QUEUE'),
+        max_queue_size=int(os.getenv('FAILED_REQUEST_QUEUE_SIZE', 1000)),
+        flush_interval=float(os.getenv('FAILED_REQUEST_FLUSH_SECONDS', 1)),
+    )
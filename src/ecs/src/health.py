@@ -1,9 +1,16 @@
-from starlette.responses import JSONResponse
+from fastapi import Depends
+from starlette.responses import JSONResponse, Response
+from .auth_route_dependency import authenticate_internal_request
+from .metrics import registry
+from .http_client import WEATHERBIT, GOOGLE_PLACES
+from .weather_mgr import weather_flights
+from .image_mgr import photo_reference_flights, photo_download_flights
+from . import rate_limiter
 
 
-def health(app):
+def health(app, http_client):
     """
-    Responds with 200 when healthy
+    Responds with 200 when healthy. Defines the internal metrics and stats routes too, which need the internal token.
     """
     @app.get('/health')
     def health_check():
@@ -12,3 +19,45 @@ def health(app):
     @app.get('/')
     def _no_path_health_check():
         return JSONResponse(status_code=200, content={'message': 'Healthy'})
+
+    @app.get('/metrics', dependencies=[Depends(authenticate_internal_request)])
+    def metrics():
+        """
+        Exports the per-route request counts, status codes and latency histograms, and the time spent in each
+        downstream (the lambdas per action, the tokens table, Weatherbit, Google Places and SQS), for Prometheus.
+
+        :return: The metrics in the Prometheus text format.
+        :rtype: Response
+        """
+        return Response(content=registry.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
+
+    @app.get('/upstream-stats', dependencies=[Depends(authenticate_internal_request)])
+    def upstream_stats():
+        """
+        :return: The request counts and latency of each external api.
+        :rtype: JSONResponse
+        """
+        return JSONResponse(status_code=200, content=http_client.stats())
+
+    @app.get('/single-flight-stats', dependencies=[Depends(authenticate_internal_request)])
+    def single_flight_stats():
+        """
+        Gets how many concurrent identical calls to the external apis were collapsed into one, the trip lookups
+        collapsed are counted in `/trips-cache-stats`.
+
+        :return: The calls started and collapsed for each kind of call.
+        :rtype: JSONResponse
+        """
+        return JSONResponse(status_code=200, content={
+            WEATHERBIT: weather_flights.stats(),
+            GOOGLE_PLACES + '_reference': photo_reference_flights.stats(),
+            GOOGLE_PLACES + '_photo': photo_download_flights.stats(),
+        })
+
+    @app.get('/rate-limit-stats', dependencies=[Depends(authenticate_internal_request)])
+    def rate_limit_stats():
+        """
+        :return: The number of users with a rate limit bucket and of requests allowed and rejected.
+        :rtype: JSONResponse
+        """
+        return JSONResponse(status_code=200, content=rate_limiter.rate_limiter.stats())
@@ -0,0 +1,316 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+import httpx
+from .metrics import observe_downstream
+from .circuit_breaker import CircuitBreaker, CLOSED
+
+# Upstream names, used to group the latency stats
+WEATHERBIT = 'weatherbit'
+GOOGLE_PLACES = 'google_places'
+
+# Latencies needed before a request is hedged, the percentile of fewer is not meaningful
+HEDGE_MIN_SAMPLES = 20
+# How many calls the hedge delay is reused for before the percentile is computed again
+HEDGE_DELAY_REFRESH_CALLS = 50
+
+
+class UpstreamStats:
+    """
+    Latency of the calls made to one upstream, percentiles are over the most recent `window` calls.
+    """
+
+    def __init__(self, window=1000):
+        """
+        :param window: The number of recent latencies kept for the percentiles.
+        :type window: int
+        """
+        self.requests = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds, is_error):
+        """
+        :param seconds: How long the call took.
+        :type seconds: float
+        :param is_error: True if the call failed or the upstream responded with a 5xx.
+        :type is_error: bool
+        """
+        with self._lock:
+            self.requests += 1
+            self.errors += is_error
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            self.recent.append(seconds)
+
+    def percentile(self, fraction):
+        """
+        :param fraction: The percentile, from 0 to 1.
+        :type fraction: float
+        :return: The latency in seconds at the percentile of the recent calls, None if there are fewer than
+                 `HEDGE_MIN_SAMPLES`.
+        :rtype: float | None
+        """
+        with self._lock:
+            if len(self.recent) < HEDGE_MIN_SAMPLES:
+                return None
+            recent = sorted(self.recent)
+
+        return recent[min(len(recent) - 1, int(len(recent) * fraction))]
+
+    def stats(self):
+        """
+        :return: The counters and latency percentiles in milliseconds.
+        :rtype: dict
+        """
+        with self._lock:
+            recent = sorted(self.recent)
+            requests = self.requests
+
+            def percentile(fraction):
+                return round(recent[min(len(recent) - 1, int(len(recent) * fraction))] * 1000, 2) if recent else None
+
+            return {
+                'requests': requests,
+                'errors': self.errors,
+                'mean_ms': round(self.total_seconds / requests * 1000, 2) if requests else None,
+                'p50_ms': percentile(0.5),
+                'p95_ms': percentile(0.95),
+                'p99_ms': percentile(0.99),
+                'max_ms': round(self.max_seconds * 1000, 2),
+            }
+
+
+class HttpClient:
+    """
+    A shared async http client for the external apis. Connections are pooled per host and kept alive between
+    requests, every request has a connect and read timeout, and the latency of each upstream is recorded.
+
+    Each upstream has a circuit breaker, calls to a failing upstream raise `CircuitOpenError` without being sent.
+    GET requests can be hedged: if no response arrived within the `hedge_percentile` latency of the upstream, a
+    second identical request is sent and the first good response is used.
+    """
+
+    def __init__(self, connect_timeout=3.0, read_timeout=10.0, max_connections=100, max_keepalive_connections=20,
+                 transport=None, circuit_breaker_options=None, hedge_percentile=None):
+        """
+        :param connect_timeout: Seconds to wait for a connection, including getting one from the pool.
+        :type connect_timeout: float
+        :param read_timeout: Seconds to wait for each read or write of the response.
+        :type read_timeout: float
+        :param max_connections: The maximum number of open connections across all hosts.
+        :type max_connections: int
+        :param max_keepalive_connections: The maximum number of idle connections kept open.
+        :type max_keepalive_connections: int
+        :param transport: Replaces the network transport, used in the tests.
+        :type transport: httpx.AsyncBaseTransport
+        :param circuit_breaker_options: Passed to the CircuitBreaker of each upstream.
+        :type circuit_breaker_options: dict
+        :param hedge_percentile: The latency percentile, from 0 to 1, after which GET requests are hedged. None to
+                                 never hedge.
+        :type hedge_percentile: float | None
+        """
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout, pool=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive_connections),
+            transport=transport,
+            follow_redirects=True,
+        )
+        self.circuit_breaker_options = circuit_breaker_options or {}
+        self.hedge_percentile = hedge_percentile
+
+        self.upstreams = {}
+        self.circuit_breakers = {}
+        self.hedges = {}
+        self._hedge_delays = {}
+
+    def _upstream_stats(self, upstream):
+        upstream_stats = self.upstreams.get(upstream)
+        if upstream_stats is None:
+            upstream_stats = self.upstreams.setdefault(upstream, UpstreamStats())
+        return upstream_stats
+
+    def _circuit_breaker(self, upstream):
+        circuit_breaker = self.circuit_breakers.get(upstream)
+        if circuit_breaker is None:
+            circuit_breaker = self.circuit_breakers.setdefault(
+                upstream, CircuitBreaker(**self.circuit_breaker_options)
+            )
+        return circuit_breaker
+
+    async def _send(self, upstream, url, send):
+        circuit_breaker = self._circuit_breaker(upstream)
+        is_probe = circuit_breaker.acquire()
+
+        start = time.perf_counter()
+        is_error = True
+        is_failure = True
+
+        try:
+            response = await send()
+            is_error = response.status_code >= 500
+            # the upstream asking to slow down counts towards opening the circuit
+            is_failure = is_error or response.status_code == 429
+            return response
+        except asyncio.CancelledError:
+            # a hedge that lost the race says nothing about the upstream
+            is_failure = None
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+
+            if is_failure is None:
+                circuit_breaker.release(is_probe)
+            else:
+                circuit_breaker.record(is_failure, is_probe)
+                self._upstream_stats(upstream).record(seconds, is_error)
+
+                # the path without the query, e.g. /v2.0/forecast/hourly, so the api keys and locations are not labels
+                observe_downstream(upstream, httpx.URL(url).path, seconds, is_error)
+
+    def _hedge_delay(self, upstream):
+        if self.hedge_percentile is None or self._circuit_breaker(upstream).state != CLOSED:
+            return None
+
+        upstream_stats = self._upstream_stats(upstream)
+        computed_at, delay = self._hedge_delays.get(upstream, (None, None))
+
+        if computed_at is None or upstream_stats.requests - computed_at >= HEDGE_DELAY_REFRESH_CALLS:
+            delay = upstream_stats.percentile(self.hedge_percentile)
+
+            # computed again on the next call until there are enough latencies
+            if delay is not None:
+                self._hedge_delays[upstream] = (upstream_stats.requests, delay)
+
+        return delay
+
+    async def get(self, upstream, url, **kwargs):
+        """
+        Sends a GET request, hedged if `hedge_percentile` is set and the upstream has enough recorded latencies.
+
+        :param upstream: The name the latency is recorded under, e.g. WEATHERBIT.
+        :type upstream: str
+        :param url: The url to request.
+        :type url: str
+        :param kwargs: Passed to httpx.AsyncClient.get, e.g. params.
+        :return: The response.
+        :rtype: httpx.Response
+
+        :raises CircuitOpenError: If the upstream's circuit is open.
+        :raises httpx.HTTPError: If the request fails or times out.
+        """
+        def send():
+            return self._send(upstream, url, lambda: self.client.get(url, **kwargs))
+
+        hedge_delay = self._hedge_delay(upstream)
+        if hedge_delay is None:
+            return await send()
+
+        first = asyncio.ensure_future(send())
+
+        try:
+            done, _ = await asyncio.wait({first}, timeout=hedge_delay)
+        except BaseException:
+            first.cancel()
+            raise
+
+        if done:
+            return first.result()
+
+        second = asyncio.ensure_future(send())
+        self.hedges[upstream] = self.hedges.get(upstream, 0) + 1
+        return await _first_good_response([first, second])
+
+    async def open_stream(self, upstream, url, **kwargs):
+        """
+        Sends a GET request without reading the body, the latency recorded is the time to the response headers.
+        The caller must close the response with `await response.aclose()`. Streams are not hedged.
+
+        :param upstream: The name the latency is recorded under, e.g. GOOGLE_PLACES.
+        :type upstream: str
+        :param url: The url to request.
+        :type url: str
+        :param kwargs: Passed to httpx.AsyncClient.build_request, e.g. params.
+        :return: The response, its body can be read in chunks with `response.aiter_bytes`.
+        :rtype: httpx.Response
+
+        :raises CircuitOpenError: If the upstream's circuit is open.
+        :raises httpx.HTTPError: If the request fails or times out.
+        """
+        return await self._send(
+            upstream, url, lambda: self.client.send(self.client.build_request('GET', url, **kwargs), stream=True)
+        )
+
+    def stats(self):
+        """
+        :return: The latency stats, circuit breaker state and number of hedged requests of each upstream.
+        :rtype: dict
+        """
+        stats = {}
+
+        for upstream, upstream_stats in list(self.upstreams.items()):
+            stats[upstream] = upstream_stats.stats()
+            stats[upstream]['hedges'] = self.hedges.get(upstream, 0)
+
+        for upstream, circuit_breaker in list(self.circuit_breakers.items()):
+            stats.setdefault(upstream, {})['circuit'] = circuit_breaker.stats()
+
+        return stats
+
+    async def aclose(self):
+        """
+        Closes the pooled connections.
+        """
+        await self.client.aclose()
+
+
+async def _first_good_response(tasks):
+    """
+    Waits for the first response that is not a 5xx, the other requests are cancelled. If none is good, the last
+    response is returned or the last error raised.
+    """
+    pending = set(tasks)
+
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+            for task in done:
+                if task.exception() is None and task.result().status_code < 500:
+                    return task.result()
+
+        return task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def create_http_client():
+    """
+    Creates the http client configured from the environment: `HTTP_CONNECT_TIMEOUT_SECONDS` (default 3),
+    `HTTP_READ_TIMEOUT_SECONDS` (default 10), `HTTP_MAX_CONNECTIONS` (default 100),
+    `HTTP_MAX_KEEPALIVE_CONNECTIONS` (default 20), `HTTP_HEDGE_PERCENTILE` (default unset, no hedging) and the
+    circuit breakers' `CIRCUIT_FAILURE_RATE` (default 0.5), `CIRCUIT_MIN_CALLS` (default 20), `CIRCUIT_WINDOW_CALLS`
+    (default 100) and `CIRCUIT_OPEN_SECONDS` (default 30).
+
+    :return: The http client.
+    :rtype: HttpClient
+    """
+    return HttpClient(
+        connect_timeout=float(os.getenv('HTTP_CONNECT_TIMEOUT_SECONDS', 3)),
+        read_timeout=float(os.getenv('HTTP_READ_TIMEOUT_SECONDS', 10)),
+        max_connections=int(os.getenv('HTTP_MAX_CONNECTIONS', 100)),
+        max_keepalive_connections=int(os.getenv('HTTP_MAX_KEEPALIVE_CONNECTIONS', 20)),
+        circuit_breaker_options={
+            'failure_rate': float(os.getenv('CIRCUIT_FAILURE_RATE', 0.5)),
+            'min_calls': int(os.getenv('CIRCUIT_MIN_CALLS', 20)),
+            'window': int(os.getenv('CIRCUIT_WINDOW_CALLS', 100)),
+            'open_seconds': float(os.getenv('CIRCUIT_OPEN_SECONDS', 30)),
+        },
+        hedge_percentile=float(os.environ['HTTP_HEDGE_PERCENTILE']) if os.getenv('HTTP_HEDGE_PERCENTILE') else None,
+    )
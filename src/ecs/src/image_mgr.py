@@ -1,44 +1,315 @@
-from fastapi import Depends, HTTPException
-from fastapi.responses import Response
-import requests
+from fastapi import Depends, Header, HTTPException
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from typing import Optional
+import hashlib
+import httpx
 import os
+import tempfile
 from .auth_route_dependency import authenticate_request
+from .disk_cache import DiskLRUCache
+from .ttl_cache import TTLCache
+from .utils import is_etag_match, parse_byte_range
+from .http_client import GOOGLE_PLACES
+from .secrets_provider import SecretsProvider
+from .single_flight import SingleFlight
 
+# Google asks for photo references not to be kept for long, so they are refreshed daily
+PHOTO_REFERENCE_TTL = float(os.getenv('IMAGE_REFERENCE_CACHE_TTL_SECONDS', 24 * 60 * 60))
+IMAGE_MAX_AGE = int(os.getenv('IMAGE_CACHE_MAX_AGE_SECONDS', 24 * 60 * 60))
+# Memory used per in-flight image is bounded by this rather than the size of the image
+CHUNK_SIZE = int(os.getenv('IMAGE_CHUNK_BYTES', 64 * 1024))
+PHOTO_MAX_WIDTH = 800
 
-def image_mgr(app, lambda_client):
+photo_reference_cache = TTLCache(int(os.getenv('IMAGE_REFERENCE_CACHE_MAX_ENTRIES', 5000)), PHOTO_REFERENCE_TTL)
+image_cache = DiskLRUCache(
+    os.getenv('IMAGE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'image-cache')),
+    int(os.getenv('IMAGE_CACHE_MAX_BYTES', 256 * 1024 * 1024)),
+)
+# Concurrent requests for the same location share one lookup, and for the same photo one download
+photo_reference_flights = SingleFlight()
+photo_download_flights = SingleFlight()
+
+
+async def get_photo_reference(http_client, location, api_key):
+    """
+    Finds the photo_reference of a location, from the cache or the google places api.
+
+    :param http_client: The shared http client.
+    :type http_client: HttpClient
+    :param location: The name of the location.
+    :type location: str
+    :param api_key: The google places api key.
+    :type api_key: str
+    :return: The photo_reference of the location.
+    :rtype: str
+
+    :raises HTTPException: With status code 400 cannot get photo for the specified location.
+    :raises HTTPException: With status code 404 no photo available for the location.
+    :raises HTTPException: With status code 502 if the google places api cannot be reached.
+    """
+    cache_key = ' '.join(location.lower().split())
+
+    photo_id = photo_reference_cache.get(cache_key)
+    if photo_id is not None:
+        return photo_id
+
+    return await photo_reference_flights.do(
+        cache_key, lambda: fetch_photo_reference(http_client, location, api_key, cache_key)
+    )
+
+
+async def fetch_photo_reference(http_client, location, api_key, cache_key):
+    """
+    Finds the photo_reference of a location with the google places api and caches it.
+
+    :param http_client: The shared http client.
+    :type http_client: HttpClient
+    :param location: The name of the location.
+    :type location: str
+    :param api_key: The google places api key.
+    :type api_key: str
+    :param cache_key: The key of the photo_reference in the cache, the normalised location.
+    :type cache_key: str
+    :return: The photo_reference of the location, the last known one if the google places api fails.
+    :rtype: str
+
+    :raises HTTPException: With status code 400 cannot get photo for the specified location.
+    :raises HTTPException: With status code 404 no photo available for the location.
+    :raises HTTPException: With status code 502 if the google places api fails and there is no photo_reference to
+                           fall back to.
+    """
+    url = f"https://maps.googleapis.com/maps/api/place/findplacefromtext/json?input={location}&inputtype=textquery&fields=photos&key={api_key}"
+    try:
+        response = await http_client.get(GOOGLE_PLACES, url)
+        is_upstream_error = response.status_code == 429 or response.status_code >= 500
+    except httpx.HTTPError:
+        is_upstream_error = True
+
+    if is_upstream_error:
+        # an expired photo_reference still finds the photo in the disk cache, rather than failing
+        photo_id = photo_reference_cache.get_stale(cache_key)
+
+        if photo_id is None:
+            raise HTTPException(status_code=502, detail='Image service unavailable')
+
+        return photo_id
+
+    if response.status_code != 200:
+        raise HTTPException(status_code=400, detail="Could not fetch location data")
+
+    photo_id = response.json().get('candidates', [{}])[0].get('photos', [{}])[0].get('photo_reference')
+    if not photo_id:
+        raise HTTPException(status_code=404, detail="No photo available for the location")
+
+    photo_reference_cache.set(cache_key, photo_id)
+
+    return photo_id
+
+
+def photo_etag(photo_id):
+    """
+    A photo_reference always refers to the same photo, so the ETag is derived from it and is known before the photo is
+    downloaded.
+
+    :param photo_id: The photo_reference of the photo.
+    :type photo_id: str
+    :return: A strong ETag, including the quotes.
+    :rtype: str
+    """
+    return '"' + hashlib.sha256(f'{photo_id}:{PHOTO_MAX_WIDTH}'.encode('utf-8')).hexdigest()[:32] + '"'
+
+
+async def open_photo_stream(http_client, photo_id, api_key):
+    """
+    Starts downloading a photo from the google places api, without reading the body.
+
+    :param http_client: The shared http client.
+    :type http_client: HttpClient
+    :param photo_id: The photo_reference of the photo.
+    :type photo_id: str
+    :param api_key: The google places api key.
+    :type api_key: str
+    :return: The upstream response, the caller must close it.
+    :rtype: httpx.Response
+
+    :raises HTTPException: With the status code of the google places api if the photo cannot be downloaded.
+    :raises HTTPException: With status code 502 if the google places api cannot be reached.
+    """
+    photo_url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth={PHOTO_MAX_WIDTH}&photoreference={photo_id}&key={api_key}"
+
+    try:
+        image = await http_client.open_stream(GOOGLE_PLACES, photo_url)
+    except httpx.HTTPError:
+        raise HTTPException(status_code=502, detail='Image service unavailable')
+
+    if image.status_code != 200:
+        await image.aclose()
+        raise HTTPException(status_code=image.status_code, detail="Failed to fetch photo")
+
+    return image
+
+
+async def download_photo(http_client, photo_id, api_key):
+    """
+    Downloads a photo from the google places api to the disk cache in chunks.
+
+    :param http_client: The shared http client.
+    :type http_client: HttpClient
+    :param photo_id: The photo_reference of the photo.
+    :type photo_id: str
+    :param api_key: The google places api key.
+    :type api_key: str
+    :return: The cached photo.
+    :rtype: CachedFile
+
+    :raises HTTPException: With the status code of the google places api if the photo cannot be downloaded.
+    :raises HTTPException: With status code 502 if the google places api cannot be reached.
+    """
+    image = await open_photo_stream(http_client, photo_id, api_key)
+    writer = await run_in_threadpool(image_cache.writer, photo_id, image.headers['Content-Type'])
+
+    try:
+        async for chunk in image.aiter_bytes(CHUNK_SIZE):
+            await run_in_threadpool(writer.write, chunk)
+
+        return await run_in_threadpool(writer.commit)
+    except httpx.HTTPError:
+        await run_in_threadpool(writer.discard)
+        raise HTTPException(status_code=502, detail='Image service unavailable')
+    except BaseException:
+        await run_in_threadpool(writer.discard)
+        raise
+    finally:
+        await image.aclose()
+
+
+async def open_cached_photo(http_client, photo_id, api_key):
+    """
+    Opens a photo from the disk cache, downloading it there first if it is not cached. Concurrent requests for a photo
+    that is not cached share one download.
+
+    :param http_client: The shared http client.
+    :type http_client: HttpClient
+    :param photo_id: The photo_reference of the photo.
+    :type photo_id: str
+    :param api_key: The google places api key.
+    :type api_key: str
+    :return: (cached photo, open file), the caller must close the file.
+    :rtype: tuple
+
+    :raises HTTPException: With the status code of the google places api if the photo cannot be downloaded.
+    :raises HTTPException: With status code 502 if the google places api cannot be reached.
+    """
+    cached_image = image_cache.get(photo_id)
+
+    if cached_image is not None:
+        try:
+            return cached_image, await run_in_threadpool(cached_image.open)
+        except OSError:
+            # evicted between the lookup and the open
+            pass
+
+    cached_image = await photo_download_flights.do(photo_id, lambda: download_photo(http_client, photo_id, api_key))
+
+    return cached_image, await run_in_threadpool(cached_image.open)
+
+
+async def read_file_chunks(file, start, end):
+    """
+    Yields part of an open file in chunks, closing it once done.
+
+    :param file: The open file.
+    :type file: BinaryIO
+    :param start: The first byte to send.
+    :type start: int
+    :param end: The last byte to send, inclusive.
+    :type end: int
+    :return: The chunks of the file.
+    :rtype: AsyncIterator[bytes]
+    """
+    try:
+        await run_in_threadpool(file.seek, start)
+        remaining = end - start + 1
+
+        while remaining > 0:
+            chunk = await run_in_threadpool(file.read, min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await run_in_threadpool(file.close)
+
+
+def image_mgr(app, lambda_client, http_client):
     """
     Method that defines all image mgr method.
     """
     @app.get('/image')
-    async def get_image(location: str, user_id=Depends(authenticate_request)):
+    async def get_image(
+            location: str,
+            if_none_match: Optional[str] = Header(None),
+            range_header: Optional[str] = Header(None, alias='Range'),
+            user_id=Depends(authenticate_request)
+    ):
         """
-        Gets an image for a location based on a location.
+        Gets an image for a location based on a location. The image is downloaded to local disk on the first request,
+        concurrent first requests sharing one download, and streamed from there in chunks, so memory use does not grow
+        with the size of the image. The response carries an ETag so clients can revalidate with If-None-Match, and a
+        single byte Range can be requested.
 
         :param location: The name of the location.
         :type location: str
+        :param if_none_match: ETags of the copies the client already has.
+        :type if_none_match: str
+        :param range_header: The byte range to send, e.g. "bytes=0-1023".
+        :type range_header: str
 
-        :return: JPEG content of new photo.
+        :return: JPEG content of new photo, 206 with part of it for a Range request, or 304 if the client's copy is
+                current.
 
         :raises HTTPException: With status code 400 cannot get photo for the specified location.
         :raises HTTPException: With status code 404 no photo available for the location.
+        :raises HTTPException: With status code 416 if the Range is outside the photo.
+        :raises HTTPException: With status code 502 if the google places api cannot be reached.
         """
 
-        api_key = os.getenv('IMAGE_API_KEY')
+        api_key = await SecretsProvider().aget('IMAGE_API_KEY')
+
+        photo_id = await get_photo_reference(http_client, location, api_key)
+
+        headers = {
+            'ETag': photo_etag(photo_id),
+            'Cache-Control': f'private, max-age={IMAGE_MAX_AGE}',
+            'Accept-Ranges': 'bytes',
+        }
+
+        if is_etag_match(if_none_match, headers['ETag']):
+            return Response(status_code=304, headers=headers)
+
+        cached_image, file = await open_cached_photo(http_client, photo_id, api_key)
 
-        # Get the photo_id
-        url = f"https://maps.googleapis.com/maps/api/place/findplacefromtext/json?input={location}&inputtype=textquery&fields=photos&key={api_key}"
-        response = requests.get(url)
-        if response.status_code != 200:
-            raise HTTPException(status_code=400, detail="Could not fetch location data")
+        try:
+            byte_range = parse_byte_range(range_header, cached_image.size)
+        except HTTPException:
+            await run_in_threadpool(file.close)
+            raise
 
-        photo_id = response.json().get('candidates', [{}])[0].get('photos', [{}])[0].get('photo_reference')
-        if not photo_id:
-            raise HTTPException(status_code=404, detail="No photo available for the location")
+        if byte_range is None:
+            start, end = 0, cached_image.size - 1
+            status_code = 200
+        else:
+            start, end = byte_range
+            status_code = 206
+            headers['Content-Range'] = f'bytes {start}-{end}/{cached_image.size}'
 
-        # Get the actual photo
-        photo_url = f"https://maps.googleapis.com/maps/api/place/photo?maxwidth=800&photoreference={photo_id}&key={api_key}"
-        image = requests.get(photo_url)
-        if image.status_code != 200:
-            raise HTTPException(status_code=image.status_code, detail="Failed to fetch photo")
+        headers['Content-Length'] = str(end - start + 1)
 
-        return Response(content=image.content, media_type=image.headers['Content-Type'])
+        return StreamingResponse(
+            read_file_chunks(file, start, end),
+            status_code=status_code,
+            media_type=cached_image.content_type,
+            headers=headers,
+        )
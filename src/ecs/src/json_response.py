@@ -0,0 +1,117 @@
+import gzip
+import os
+from decimal import Decimal
+import orjson
+from fastapi.responses import Response
+from starlette.concurrency import run_in_threadpool
+from .utils import etag_for_encoding
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed, as compressing them saves little and costs a round of CPU
+COMPRESSION_MIN_BYTES = int(os.getenv('RESPONSE_COMPRESSION_MIN_BYTES', 1024))
+# The lowest levels, the higher ones cost more CPU than they save in bytes on the trip lists
+GZIP_LEVEL = int(os.getenv('RESPONSE_GZIP_LEVEL', 1))
+BROTLI_QUALITY = int(os.getenv('RESPONSE_BROTLI_QUALITY', 1))
+# Bodies at least this large are compressed in a worker thread, so the event loop keeps serving other requests
+COMPRESSION_THREADPOOL_MIN_BYTES = int(os.getenv('RESPONSE_COMPRESSION_THREADPOOL_MIN_BYTES', 65536))
+
+
+def _default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value % 1 == 0 else float(value)
+    raise TypeError
+
+
+def choose_encoding(accept_encoding):
+    """
+    Picks the content encoding to use from an Accept-Encoding header, brotli is preferred over gzip.
+
+    :param accept_encoding: The Accept-Encoding header, e.g. "gzip, deflate, br".
+    :type accept_encoding: str | None
+    :return: 'br', 'gzip' or None to send the body uncompressed.
+    :rtype: str | None
+    """
+    if not accept_encoding:
+        return None
+
+    accepted = set()
+    for coding in accept_encoding.lower().split(','):
+        name, _, params = coding.strip().partition(';')
+        params = params.replace(' ', '')
+
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                # a malformed q-value, the coding is ignored
+                continue
+
+            # "q=0" means the client does not accept the encoding
+            if q == 0:
+                continue
+        accepted.add(name.strip())
+
+    if brotli is not None and ('br' in accepted or '*' in accepted):
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+
+    return None
+
+
+def compress(body, encoding):
+    """
+    :param body: The body to compress.
+    :type body: bytes
+    :param encoding: 'br' or 'gzip'.
+    :type encoding: str
+    :return: The compressed body.
+    :rtype: bytes
+    """
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+async def fast_json_response(request, content, status_code=200, headers=None):
+    """
+    Creates a JSON response encoded with orjson, compressed with brotli or gzip if the client accepts it and the body
+    is at least `COMPRESSION_MIN_BYTES`. Used for the trip lists, which can be large, bodies of at least
+    `COMPRESSION_THREADPOOL_MIN_BYTES` are compressed off the event loop. An ETag in `headers` gets the encoding
+    appended when the body is compressed, see `etag_for_encoding`.
+
+    :param request: The request being responded to, for its Accept-Encoding header.
+    :type request: Request
+    :param content: The content to encode.
+    :param status_code: The status code of the response.
+    :type status_code: int
+    :param headers: Extra headers of the response, with the ETag of the uncompressed body if it has one.
+    :type headers: dict
+    :return: The response.
+    :rtype: Response
+    """
+    body = orjson.dumps(content, default=_default)
+    headers = dict(headers or {})
+
+    if len(body) >= COMPRESSION_MIN_BYTES:
+        # caches must not send a compressed body to a client that did not ask for it
+        headers['Vary'] = 'Accept-Encoding'
+
+        encoding = choose_encoding(request.headers.get('accept-encoding'))
+
+        if encoding is not None:
+            if len(body) >= COMPRESSION_THREADPOOL_MIN_BYTES:
+                body = await run_in_threadpool(compress, body, encoding)
+            else:
+                body = compress(body, encoding)
+            headers['Content-Encoding'] = encoding
+
+            if 'ETag' in headers:
+                headers['ETag'] = etag_for_encoding(headers['ETag'], encoding)
+
+    return Response(content=body, status_code=status_code, headers=headers, media_type='application/json')
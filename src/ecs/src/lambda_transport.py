@@ -0,0 +1,308 @@
+import asyncio
+import functools
+import importlib
+import importlib.util
+import logging
+import os
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+import boto3
+import orjson
+from botocore.config import Config
+from fastapi import HTTPException
+from .metrics import observe_downstream
+
+DEFAULT_MAX_CONCURRENCY = 10
+
+# Lambdas reachable through a transport
+TRIP_MGR = 'trip_mgr'
+ACCOUNT_MGR = 'account_mgr'
+
+# Environment variables holding the arn of each lambda
+FUNCTION_ARN_ENV = {
+    TRIP_MGR: 'TRIP_MGR_ARN',
+    ACCOUNT_MGR: 'USER_MGR_ARN',
+}
+
+# Environment variables holding the path to the source of each lambda, with their defaults for this repo's layout
+SRC_PATH_ENV = {
+    TRIP_MGR: 'TRIP_MGR_SRC_PATH',
+    ACCOUNT_MGR: 'USER_MGR_SRC_PATH',
+}
+DEFAULT_SRC_PATHS = {
+    TRIP_MGR: os.path.join(os.path.dirname(__file__), '..', '..', 'tripMgr', 'src'),
+    ACCOUNT_MGR: os.path.join(os.path.dirname(__file__), '..', '..', 'accountMgr', 'src'),
+}
+
+
+def handle_lambda_response(lambda_response):
+    """
+    Checks a lambdas response to ensure that it worked correctly.
+
+    :param lambda_response: The raw response from the lambda called.
+    :type lambda_response: dict
+    :return: The response payload from the lambda.
+    :rtype: dict
+
+    :raises HTTPException: With status code 502 if the lambda fails unexpectedly.
+    """
+
+    if lambda_response['ResponseMetadata']['HTTPStatusCode'] != 200:
+        logging.error('lambda returned non-200 response: ' + str(lambda_response))
+        raise HTTPException(status_code=502, detail='Error lambda returned non-200 response')
+
+    # orjson parses the bytes directly, which matters for the large trip lists
+    response_payload = orjson.loads(lambda_response['Payload'].read())
+
+    return response_payload
+
+
+def _operation(payload):
+    """
+    The operation an invocation is recorded under, its action, or for a batch its actions in order, e.g.
+    "batch:verify_trip_admin+delete_trip". The routes send a fixed set of batches, so the labels stay bounded.
+    """
+    if payload.get('httpMethod') == 'BATCH':
+        return 'batch:' + '+'.join(action.get('action', 'unknown') for action in payload.get('actions', []))
+
+    return payload.get('action', 'unknown')
+
+
+class _BoundedTransport(ABC):
+    """
+    Runs invocations without blocking the event loop.
+
+    Reaching a lambda is blocking work (boto3 is synchronous, and so are the handlers themselves), so each invocation
+    is run on a thread pool. The size of the pool is the concurrency cap, any invocations over the cap wait for a free
+    worker.
+    """
+
+    def __init__(self, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        """
+        :param max_concurrency: The maximum number of invocations in flight at once.
+        :type max_concurrency: int
+        """
+        self.max_concurrency = max_concurrency
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='lambda-invoke')
+
+    @abstractmethod
+    def _invoke_sync(self, target, payload):
+        """
+        Invokes a lambda, blocking until it responds. Run on the transport's worker threads.
+
+        :param target: The lambda to invoke, `TRIP_MGR` or `ACCOUNT_MGR`.
+        :type target: str
+        :param payload: The event to send to the lambda.
+        :type payload: dict
+        :return: The response payload from the lambda.
+        :rtype: dict
+        """
+
+    def _invoke_timed(self, target, payload):
+        start = time.perf_counter()
+        is_error = True
+
+        try:
+            response_payload = self._invoke_sync(target, payload)
+            is_error = False
+            return response_payload
+        finally:
+            # time waiting for a free worker is not included, only the invocation
+            observe_downstream(target, _operation(payload), time.perf_counter() - start, is_error)
+
+    async def invoke(self, target, payload):
+        """
+        Invokes a lambda and waits for its response without blocking the event loop.
+
+        :param target: The lambda to invoke, `TRIP_MGR` or `ACCOUNT_MGR`.
+        :type target: str
+        :param payload: The event to send to the lambda.
+        :type payload: dict
+        :return: The response payload from the lambda.
+        :rtype: dict
+
+        :raises HTTPException: With status code 502 if the lambda fails unexpectedly.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor,
+            functools.partial(self._invoke_timed, target, payload)
+        )
+
+    def close(self):
+        """
+        Waits for in flight invocations to finish and releases the worker threads.
+        """
+        self.executor.shutdown(wait=True)
+
+
+class LambdaTransport(_BoundedTransport):
+    """
+    Reaches the lambdas over the network with boto3.
+    """
+
+    def __init__(self, lambda_client, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        """
+        :param lambda_client: The boto3 lambda client.
+        :type lambda_client: boto3.client
+        :param max_concurrency: The maximum number of lambda invocations in flight at once.
+        :type max_concurrency: int
+        """
+        super().__init__(max_concurrency)
+        self.lambda_client = lambda_client
+
+    def _invoke_sync(self, target, payload):
+        lambda_response = self.lambda_client.invoke(
+            FunctionName=os.getenv(FUNCTION_ARN_ENV[target]),
+            InvocationType='RequestResponse',
+            Payload=orjson.dumps(payload)
+        )
+
+        return handle_lambda_response(lambda_response)
+
+
+class InProcessTransport(_BoundedTransport):
+    """
+    Calls the lambda handlers directly inside the gateway, skipping the network round trip and the JSON encoding of
+    the event and response. Intended for co-located deployments and load testing. Handlers run concurrently, so those
+    using boto3's default session need `use_thread_local_boto3_sessions`, which `create_lambda_transport` calls.
+    """
+
+    def __init__(self, handlers, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        """
+        :param handlers: The handler (`main(event, context)`) of each lambda, keyed by `TRIP_MGR` / `ACCOUNT_MGR`.
+        :type handlers: dict
+        :param max_concurrency: The maximum number of handlers running at once.
+        :type max_concurrency: int
+        """
+        super().__init__(max_concurrency)
+        self.handlers = handlers
+
+    def _invoke_sync(self, target, payload):
+        response_payload = self.handlers[target](payload, None)
+
+        return replace_decimals(response_payload)
+
+
+class ThreadLocalSession:
+    """
+    Stands in for boto3's default session, which `boto3.resource` and `boto3.client` create from, with a session per
+    thread. boto3 sessions are not thread safe, and the in process handlers create their resources and clients from
+    the default session on the transport's worker threads, see `use_thread_local_boto3_sessions`.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def session(self):
+        """
+        :return: The calling thread's session, created on its first use.
+        :rtype: boto3.session.Session
+        """
+        session = getattr(self._local, 'session', None)
+
+        if session is None:
+            session = self._local.session = boto3.session.Session()
+
+        return session
+
+    def __getattr__(self, name):
+        return getattr(self.session(), name)
+
+
+def use_thread_local_boto3_sessions():
+    """
+    Replaces boto3's default session with a `ThreadLocalSession`, so handlers running at the same time on different
+    threads never share a session, in the same way as the workers of tripMgr's parallel scan.
+    """
+    if not isinstance(boto3.DEFAULT_SESSION, ThreadLocalSession):
+        boto3.DEFAULT_SESSION = ThreadLocalSession()
+
+
+def replace_decimals(value):
+    """
+    DynamoDB returns numbers as Decimals, which the lambda runtime converts when serialising the response. This does
+    the same for responses that never leave the process.
+
+    :param value: The value to convert.
+    :return: The value with every Decimal replaced by an int, or a float if it is not whole.
+    """
+    if isinstance(value, Decimal):
+        return int(value) if value % 1 == 0 else float(value)
+    elif isinstance(value, dict):
+        return {key: replace_decimals(val) for key, val in value.items()}
+    elif isinstance(value, list):
+        return [replace_decimals(val) for val in value]
+
+    return value
+
+
+def load_lambda_handler(target):
+    """
+    Imports the `index.main` handler of a lambda from its source directory. The lambdas are all packaged as `src`,
+    so each is imported under its own package name to keep them apart from the gateway's `src` package.
+
+    :param target: The lambda to load, `TRIP_MGR` or `ACCOUNT_MGR`.
+    :type target: str
+    :return: The lambda's handler.
+    :rtype: function
+    """
+    package_name = f'_in_process_{target}'
+
+    if package_name not in sys.modules:
+        src_path = os.path.abspath(os.getenv(SRC_PATH_ENV[target], DEFAULT_SRC_PATHS[target]))
+
+        spec = importlib.util.spec_from_file_location(
+            package_name,
+            os.path.join(src_path, '__init__.py'),
+            submodule_search_locations=[src_path]
+        )
+        package = importlib.util.module_from_spec(spec)
+        sys.modules[package_name] = package
+        spec.loader.exec_module(package)
+
+    return importlib.import_module(package_name + '.index').main
+
+
+def create_lambda_transport(region_name):
+    """
+    Creates the transport used by all routes to reach the lambdas, configured from the environment.
+    `LAMBDA_TRANSPORT` selects `lambda` (default) or `in_process`, and `LAMBDA_MAX_CONCURRENCY` sets the concurrency
+    cap (default 10).
+
+    :param region_name: The region the lambdas are located in.
+    :type region_name: str
+    :return: The lambda transport.
+    :rtype: LambdaTransport | InProcessTransport
+
+    :raises ValueError: If `LAMBDA_TRANSPORT` is not a known transport.
+    """
+    transport = os.getenv('LAMBDA_TRANSPORT', 'lambda')
+    max_concurrency = int(os.getenv('LAMBDA_MAX_CONCURRENCY', DEFAULT_MAX_CONCURRENCY))
+
+    if transport == 'lambda':
+        # botocore only keeps 10 connections by default, so the pool must grow with the cap
+        lambda_client = boto3.client(
+            'lambda',
+            region_name=region_name,
+            config=Config(max_pool_connections=max_concurrency)
+        )
+
+        return LambdaTransport(lambda_client, max_concurrency)
+
+    elif transport == 'in_process':
+        # the handlers run concurrently on the worker threads and build their boto3 resources on each invocation
+        use_thread_local_boto3_sessions()
+
+        handlers = {
+            TRIP_MGR: load_lambda_handler(TRIP_MGR),
+            ACCOUNT_MGR: load_lambda_handler(ACCOUNT_MGR),
+        }
+
+        return InProcessTransport(handlers, max_concurrency)
+
+    raise ValueError('Unknown LAMBDA_TRANSPORT: ' + transport)
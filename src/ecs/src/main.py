@@ -1,44 +1,65 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
 from fastapi.responses import JSONResponse
 from starlette.requests import Request
-import boto3
 from .account_mgr import account_mgr
 from .trip_mgr import trip_mgr
 from .weather_mgr import weather_mgr
 from .image_mgr import image_mgr
-from .utils import get_secrets, send_message_to_sqs
+from .trip_enrichment import trip_enrichment
 from .health import health
+from .lambda_transport import create_lambda_transport
+from .trip_cache import create_trip_cache
+from .failed_request_reporter import create_failed_request_reporter
+from .http_client import create_http_client
+from .metrics import MetricsMiddleware
 
 region_name = 'eu-west-1'
 
-# Get secrets
-get_secrets(region_name)
+# Create clients
+lambda_client = create_lambda_transport(region_name)
+failed_request_reporter = create_failed_request_reporter(region_name)
+http_client = create_http_client()
+
+# Create caches
+trip_cache = create_trip_cache()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Send the failed requests still queued before the container stops
+    failed_request_reporter.stop()
+    lambda_client.close()
+    await http_client.aclose()
 
-# Create client
-lambda_client = boto3.client('lambda', region_name=region_name)
 
 # Init the app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(MetricsMiddleware)
 
 
 # Specify handlers
 @app.exception_handler(HTTPException)
-def http_exception_handler(request: Request, exception: HTTPException):
-    print('about to send')
-    send_message_to_sqs(request, exception)
-    print('sent')
+async def http_exception_handler(request: Request, exception: HTTPException):
+    # a client over its rate limit would otherwise flood the failed request queue
+    if exception.status_code != 429:
+        failed_request_reporter.report(request, exception)
     return JSONResponse(
         status_code=exception.status_code,
         content={"detail": exception.detail},
+        headers=exception.headers,
     )
 
 # Set endpoints
-health(app)
+health(app, http_client)
 
 account_mgr(app, lambda_client)
 
-trip_mgr(app, lambda_client)
+trip_mgr(app, lambda_client, trip_cache)
+
+weather_mgr(app, lambda_client, http_client)
 
-weather_mgr(app, lambda_client)
+image_mgr(app, lambda_client, http_client)
 
-image_mgr(app, lambda_client)
+trip_enrichment(app, lambda_client, http_client, trip_cache)
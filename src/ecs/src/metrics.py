@@ -0,0 +1,248 @@
+import threading
+import time
+from bisect import bisect_left
+
+# Upper bounds in seconds, from a token cache hit to a slow upstream
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Counts observations into fixed buckets. Observing is a bisect and two additions under the series' own lock,
+    nothing is allocated, the cumulative counts Prometheus expects are only built when the metrics are read.
+    """
+
+    __slots__ = ('upper_bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, upper_bounds):
+        """
+        :param upper_bounds: The sorted upper bounds of the buckets, the +Inf bucket is added.
+        :type upper_bounds: tuple
+        """
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        """
+        :param value: The observed value, e.g. seconds.
+        :type value: float
+        """
+        index = bisect_left(self.upper_bounds, value)
+
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def samples(self):
+        """
+        :return: The cumulative count of each bucket with its upper bound as a string, then the sum and count.
+        :rtype: tuple
+        """
+        with self._lock:
+            counts = list(self.counts)
+            total = self.sum
+
+        buckets = []
+        cumulative = 0
+        for upper_bound, count in zip(self.upper_bounds + (float('inf'),), counts):
+            cumulative += count
+            buckets.append(('+Inf' if upper_bound == float('inf') else repr(upper_bound), cumulative))
+
+        return buckets, total, cumulative
+
+
+class Counter:
+    """
+    A count that only goes up.
+    """
+
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        """
+        :param amount: How much to add.
+        :type amount: int
+        """
+        with self._lock:
+            self.value += amount
+
+
+class MetricFamily:
+    """
+    A metric with labels, each combination of label values is its own series, created on first use.
+    """
+
+    def __init__(self, name, documentation, metric_type, label_names, buckets=DEFAULT_BUCKETS):
+        """
+        :param name: The metric name, e.g. 'gateway_request_duration_seconds'.
+        :type name: str
+        :param documentation: The HELP text.
+        :type documentation: str
+        :param metric_type: 'histogram' or 'counter'.
+        :type metric_type: str
+        :param label_names: The names of the labels, in the order their values are given to `labels`.
+        :type label_names: tuple
+        :param buckets: The upper bounds of a histogram's buckets.
+        :type buckets: tuple
+        """
+        self.name = name
+        self.documentation = documentation
+        self.metric_type = metric_type
+        self.label_names = label_names
+        self.buckets = tuple(buckets)
+
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *label_values):
+        """
+        Gets the series of the label values.
+
+        :param label_values: One value per label name.
+        :return: The series.
+        :rtype: Histogram | Counter
+        """
+        series = self._series.get(label_values)
+
+        if series is None:
+            with self._lock:
+                series = self._series.get(label_values)
+                if series is None:
+                    series = Histogram(self.buckets) if self.metric_type == 'histogram' else Counter()
+                    self._series[label_values] = series
+
+        return series
+
+    def render(self):
+        """
+        :return: The family in the Prometheus text exposition format.
+        :rtype: list
+        """
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.metric_type}']
+
+        for label_values, series in sorted(self._series.copy().items()):
+            labels = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.label_names, label_values))
+
+            if self.metric_type == 'counter':
+                lines.append(f'{self.name}{{{labels}}} {series.value}')
+                continue
+
+            buckets, total, count = series.samples()
+            separator = ',' if labels else ''
+            for upper_bound, cumulative in buckets:
+                lines.append(f'{self.name}_bucket{{{labels}{separator}le="{upper_bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {total}')
+            lines.append(f'{self.name}_count{{{labels}}} {count}')
+
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRegistry:
+    """
+    The metrics exported at `/metrics`.
+    """
+
+    def __init__(self):
+        self.families = []
+
+    def histogram(self, name, documentation, label_names, buckets=DEFAULT_BUCKETS):
+        family = MetricFamily(name, documentation, 'histogram', label_names, buckets)
+        self.families.append(family)
+        return family
+
+    def counter(self, name, documentation, label_names):
+        family = MetricFamily(name, documentation, 'counter', label_names)
+        self.families.append(family)
+        return family
+
+    def render(self):
+        """
+        :return: Every metric in the Prometheus text exposition format.
+        :rtype: str
+        """
+        lines = []
+        for family in self.families:
+            lines.extend(family.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+REQUEST_SECONDS = registry.histogram(
+    'gateway_request_duration_seconds',
+    'Time to respond to a request, including streaming the body, by route and status code.',
+    ('method', 'route', 'status'),
+)
+DOWNSTREAM_SECONDS = registry.histogram(
+    'gateway_downstream_duration_seconds',
+    'Time spent in a call to a downstream service, by dependency and operation.',
+    ('dependency', 'operation'),
+)
+DOWNSTREAM_ERRORS = registry.counter(
+    'gateway_downstream_errors_total',
+    'Calls to a downstream service that failed, by dependency and operation.',
+    ('dependency', 'operation'),
+)
+
+
+def observe_downstream(dependency, operation, seconds, is_error=False):
+    """
+    Records a call to a downstream service.
+
+    :param dependency: The service called, e.g. 'trip_mgr', 'tokens_table', 'weatherbit', 'sqs'.
+    :type dependency: str
+    :param operation: What was called, e.g. the lambda action or the DynamoDB operation.
+    :type operation: str
+    :param seconds: How long the call took.
+    :type seconds: float
+    :param is_error: True if the call failed.
+    :type is_error: bool
+    """
+    DOWNSTREAM_SECONDS.labels(dependency, operation).observe(seconds)
+
+    if is_error:
+        DOWNSTREAM_ERRORS.labels(dependency, operation).inc()
+
+
+class MetricsMiddleware:
+    """
+    Records the latency and status code of every request by its route template (e.g. '/trips', not the url), so
+    the number of series stays bounded. Written as plain ASGI middleware so streamed bodies are timed until their
+    last chunk and nothing is buffered.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # set by the router once the request is matched
+            route = scope.get('route')
+            route_path = route.path if route is not None else 'unmatched'
+
+            REQUEST_SECONDS.labels(scope['method'], route_path, str(status)).observe(time.perf_counter() - start)
@@ -0,0 +1,134 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from fastapi import Depends, HTTPException, Request
+from .auth_route_dependency import authenticate_request
+
+# Tokens taken by a request, by how much work it causes in the lambdas and DynamoDB
+COST_DEFAULT = 1
+COST_QUERY = int(os.getenv('RATE_LIMIT_QUERY_COST', 2))
+COST_SCAN = int(os.getenv('RATE_LIMIT_SCAN_COST', 20))
+
+
+class TokenBucketLimiter:
+    """
+    Limits the rate of requests of each user with a token bucket: a user's bucket holds up to `capacity` tokens and
+    refills at `refill_per_second`, each request takes its cost in tokens or is rejected. Buckets are refilled lazily
+    when used, so a request is O(1) whatever the number of users.
+
+    The buckets of the `max_users` most recently seen users are kept, the least recently seen are dropped past this,
+    a dropped user starts again with a full bucket. Buckets are local to the container.
+    """
+
+    def __init__(self, capacity=60, refill_per_second=5.0, max_users=100000):
+        """
+        :param capacity: The most tokens a bucket holds, i.e. the largest burst.
+        :type capacity: float
+        :param refill_per_second: Tokens added to a bucket per second, i.e. the sustained rate.
+        :type refill_per_second: float
+        :param max_users: The maximum number of buckets kept.
+        :type max_users: int
+        """
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.max_users = max_users
+
+        # user_id -> [tokens, monotonic time they were counted at], least recently seen first
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.allowed = 0
+        self.rejected = 0
+
+    def acquire(self, user_id, cost=COST_DEFAULT):
+        """
+        Takes `cost` tokens from the user's bucket.
+
+        :param user_id: The user making the request.
+        :type user_id: int
+        :param cost: The tokens the request costs, capped at the capacity so any request can eventually be made.
+        :type cost: float
+        :return: 0 if the request is allowed, else the seconds until the bucket holds enough tokens.
+        :rtype: float
+        """
+        cost = min(cost, self.capacity)
+        now = time.monotonic()
+
+        with self._lock:
+            bucket = self._buckets.get(user_id)
+
+            if bucket is None:
+                bucket = [self.capacity, now]
+                self._buckets[user_id] = bucket
+
+                if len(self._buckets) > self.max_users:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(user_id)
+                bucket[0] = min(self.capacity, bucket[0] + (now - bucket[1]) * self.refill_per_second)
+                bucket[1] = now
+
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                self.allowed += 1
+                return 0
+
+            self.rejected += 1
+            return (cost - bucket[0]) / self.refill_per_second
+
+    def stats(self):
+        """
+        :return: The number of users tracked and of requests allowed and rejected.
+        :rtype: dict
+        """
+        return {
+            'users': len(self._buckets),
+            'allowed': self.allowed,
+            'rejected': self.rejected,
+        }
+
+
+def create_rate_limiter():
+    """
+    Creates the rate limiter configured from the environment: `RATE_LIMIT_CAPACITY` (default 60),
+    `RATE_LIMIT_REFILL_PER_SECOND` (default 5) and `RATE_LIMIT_MAX_USERS` (default 100000).
+
+    :return: The rate limiter.
+    :rtype: TokenBucketLimiter
+    """
+    return TokenBucketLimiter(
+        capacity=float(os.getenv('RATE_LIMIT_CAPACITY', 60)),
+        refill_per_second=float(os.getenv('RATE_LIMIT_REFILL_PER_SECOND', 5)),
+        max_users=int(os.getenv('RATE_LIMIT_MAX_USERS', 100000)),
+    )
+
+
+rate_limiter = create_rate_limiter()
+
+
+def rate_limit(cost=COST_DEFAULT):
+    """
+    Creates a dependency that rate limits a route per user. It depends on authenticate_request, which FastAPI runs
+    once per request however many dependencies share it.
+    Example: @app.get('/trips', dependencies=[Depends(rate_limit(trips_cost))])
+
+    :param cost: The tokens a request costs, or a function of the request returning them.
+    :type cost: float | function
+    :return: The dependency.
+    :rtype: function
+
+    :raises HTTPException: With status code 429 and a Retry-After header if the user is over their rate.
+    """
+    def dependency(request: Request, user_id=Depends(authenticate_request)):
+        retry_after = rate_limiter.acquire(user_id, cost(request) if callable(cost) else cost)
+
+        if retry_after:
+            raise HTTPException(
+                status_code=429,
+                detail='Too many requests',
+                headers={'Retry-After': str(math.ceil(retry_after))}
+            )
+
+    return dependency
@@ -0,0 +1,118 @@
+import json
+import logging
+import os
+import threading
+import time
+import boto3
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from .singleton import SingletonParentClass
+
+
+class SecretsProvider(metaclass=SingletonParentClass):
+    """
+    Reads the gateway's secrets (`WEATHER_API_KEY`, `IMAGE_API_KEY`, `INTERNAL_API_TOKEN` and optionally
+    `TOKEN_SIGNING_KEY`) from Secrets Manager.
+
+    The secret is loaded on first use rather than at startup and kept in memory. After that it is refreshed in the
+    background every `SECRETS_REFRESH_SECONDS`, a failed refresh keeps the last good value. Values set in the
+    environment take precedence, for running locally.
+    """
+
+    def __init__(self):
+        self.secret_id = os.getenv('SECRET_ID', 'cloudCourseWork')
+        self.region_name = os.getenv('SECRETS_REGION', 'eu-west-1')
+        self.refresh_interval = float(os.getenv('SECRETS_REFRESH_SECONDS', 300))
+        # how long to wait before trying again when the first load fails, so requests do not pile onto Secrets Manager
+        self.retry_interval = float(os.getenv('SECRETS_RETRY_SECONDS', 5))
+
+        self._values = None
+        self._client = None
+        self._last_failure = None
+        self._lock = threading.Lock()
+
+        self.loads = 0
+        self.failures = 0
+
+    def get(self, name):
+        """
+        Gets a secret, loading the secret from Secrets Manager if this is the first use. This blocks on the first use,
+        so call it from a thread pool, or use `aget`.
+
+        :param name: The name of the value in the secret, e.g. 'WEATHER_API_KEY'.
+        :type name: str
+        :return: The value.
+        :rtype: str
+
+        :raises HTTPException: With status code 503 if the secret has never been loaded and cannot be loaded now.
+        :raises HTTPException: With status code 500 if the secret does not have the value.
+        """
+        value = os.environ.get(name)
+        if value is not None:
+            return value
+
+        values = self._values
+        if values is None:
+            values = self._load_first()
+
+        if name not in values:
+            raise HTTPException(status_code=500, detail=f'Secret {name} is not set')
+
+        return values[name]
+
+    async def aget(self, name):
+        """
+        The same as `get`, without blocking the event loop on the first use.
+
+        :param name: The name of the value in the secret, e.g. 'WEATHER_API_KEY'.
+        :type name: str
+        :return: The value.
+        :rtype: str
+        """
+        if self._values is not None or name in os.environ:
+            return self.get(name)
+
+        return await run_in_threadpool(self.get, name)
+
+    def _load_first(self):
+        with self._lock:
+            # another thread may have loaded it while this one waited for the lock
+            if self._values is not None:
+                return self._values
+
+            if self._last_failure is not None and time.monotonic() - self._last_failure < self.retry_interval:
+                raise HTTPException(status_code=503, detail='Secrets are unavailable')
+
+            try:
+                self._values = self._fetch()
+            except Exception as e:
+                self._last_failure = time.monotonic()
+                logging.error('loading secrets: ' + str(e))
+                raise HTTPException(status_code=503, detail='Secrets are unavailable')
+
+            threading.Thread(target=self._refresh_forever, name='secrets-refresh', daemon=True).start()
+
+            return self._values
+
+    def _fetch(self):
+        if self._client is None:
+            self._client = boto3.session.Session().client(service_name='secretsmanager', region_name=self.region_name)
+
+        try:
+            response = self._client.get_secret_value(SecretId=self.secret_id)
+        except Exception:
+            self.failures += 1
+            raise
+
+        self.loads += 1
+
+        return json.loads(response['SecretString'])
+
+    def _refresh_forever(self):
+        while True:
+            time.sleep(self.refresh_interval)
+
+            try:
+                self._values = self._fetch()
+            except Exception as e:
+                logging.error('refreshing secrets, keeping the last good values: ' + str(e))
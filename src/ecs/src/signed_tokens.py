@@ -0,0 +1,115 @@
+import hashlib
+import hmac
+import secrets
+import threading
+
+
+def create_signed_token(signing_key, user_id, issued_at, expires_at):
+    """
+    Creates a token that can be validated without a lookup, in the format
+    `<user_id>.<issued_at>.<expires_at>.<nonce>.<signature>`.
+
+    :param signing_key: The key the token is signed with.
+    :type signing_key: bytes
+    :param user_id: User_id the token is for.
+    :type user_id: int
+    :param issued_at: When the token was issued, in unix milliseconds.
+    :type issued_at: int
+    :param expires_at: When the token stops being valid, in unix milliseconds.
+    :type expires_at: int
+    :return: The new token.
+    :rtype: str
+    """
+    claims = f'{user_id}.{issued_at}.{expires_at}.{secrets.token_hex(8)}'
+
+    return claims + '.' + _sign(signing_key, claims)
+
+
+def read_signed_token(signing_key, token):
+    """
+    Checks the signature of a token and reads its claims, this does not check the expiry or revocation.
+
+    :param signing_key: The key the token was signed with.
+    :type signing_key: bytes
+    :param token: The token to read.
+    :type token: str
+    :return: (user_id, issued_at, expires_at) or None if the token is malformed or its signature is invalid.
+    :rtype: tuple | None
+    """
+    if not token:
+        return None
+
+    claims, _, signature = token.rpartition('.')
+
+    # compared as bytes, compare_digest rejects str with non-ASCII characters, which a header can contain
+    if not hmac.compare_digest(signature.encode('utf-8'), _sign(signing_key, claims).encode('utf-8')):
+        return None
+
+    try:
+        user_id, issued_at, expires_at, _ = claims.split('.')
+        return int(user_id), int(issued_at), int(expires_at)
+    except ValueError:
+        return None
+
+
+def _sign(signing_key, claims):
+    return hmac.new(signing_key, claims.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+class TokenRevocations:
+    """
+    The sign-outs of signed tokens, stored as user_id -> revoked_before, every token for the user issued at or before
+    revoked_before is revoked. Entries older than the token lifetime can be pruned, as every token they revoke has
+    expired.
+    """
+
+    def __init__(self):
+        self._revoked_before = {}
+        self._lock = threading.Lock()
+
+    def revoke(self, user_id, revoked_before):
+        """
+        :param user_id: User_id to revoke the tokens of.
+        :type user_id: int
+        :param revoked_before: Tokens issued at or before this time are revoked, in unix milliseconds.
+        :type revoked_before: int
+        """
+        with self._lock:
+            if revoked_before > self._revoked_before.get(user_id, 0):
+                self._revoked_before[user_id] = revoked_before
+
+    def revoked_before(self, user_id):
+        """
+        :param user_id: User_id to check.
+        :type user_id: int
+        :return: Tokens for the user issued at or before this time are revoked, 0 if none are.
+        :rtype: int
+        """
+        return self._revoked_before.get(user_id, 0)
+
+    def is_revoked(self, user_id, issued_at):
+        """
+        :param user_id: User_id the token is for.
+        :type user_id: int
+        :param issued_at: When the token was issued, in unix milliseconds.
+        :type issued_at: int
+        :return: True if the token has been revoked.
+        :rtype: bool
+        """
+        return issued_at <= self._revoked_before.get(user_id, 0)
+
+    def prune(self, oldest):
+        """
+        Removes the revocations from before oldest.
+
+        :param oldest: Unix milliseconds.
+        :type oldest: int
+        """
+        with self._lock:
+            self._revoked_before = {
+                user_id: revoked_before for user_id, revoked_before in self._revoked_before.items()
+                if revoked_before >= oldest
+            }
+
+    def __len__(self):
+        return len(self._revoked_before)
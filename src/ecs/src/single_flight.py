@@ -0,0 +1,69 @@
+import asyncio
+import logging
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one: the first caller starts the call, callers that arrive
+    while it is in flight wait for it and all of them receive its result, or its exception. Once the call finishes
+    the next caller starts a new one, results are not cached here.
+
+    The call runs as its own task, so a caller that is cancelled (e.g. the client disconnected) does not cancel it
+    for the others. Only used from the event loop.
+    """
+
+    def __init__(self):
+        self._in_flight = {}
+
+        self.calls = 0
+        self.collapsed = 0
+
+    async def do(self, key, fetch):
+        """
+        Awaits the in-flight call for the key, or starts one.
+
+        :param key: Identifies identical calls, e.g. the normalised params of an upstream request.
+        :type key: Hashable
+        :param fetch: Called without arguments to start the call, returning an awaitable.
+        :type fetch: function
+        :return: The result of the call.
+        """
+        task = self._in_flight.get(key)
+
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fetch())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.collapsed += 1
+
+        return await asyncio.shield(task)
+
+    def is_in_flight(self, key):
+        """
+        :param key: Identifies the call.
+        :type key: Hashable
+        :return: True if a call for the key is in flight.
+        :rtype: bool
+        """
+        return key in self._in_flight
+
+    def _forget(self, key, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+
+        # every waiter may have been cancelled, so the exception is retrieved here to not log it as never retrieved
+        if not task.cancelled() and task.exception() is not None:
+            logging.debug('single flight call ' + str(key) + ' failed: ' + str(task.exception()))
+
+    def stats(self):
+        """
+        :return: The number of calls in flight, calls started and calls that were collapsed into one in flight.
+        :rtype: dict
+        """
+        return {
+            'in_flight': len(self._in_flight),
+            'calls': self.calls,
+            'collapsed': self.collapsed,
+        }
@@ -0,0 +1,8 @@
+# PLEASE NOTE THIS IS A STANDARD PYTHON PATTERN
+class SingletonParentClass(type):
+    _instances = {}
+
+    def __call__(cls, *args, **kwargs):
+        if cls not in cls._instances:
+            cls._instances[cls] = super().__call__(*args, **kwargs)
+        return cls._instances[cls]
@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import os
+import time
+from .ttl_cache import TTLCache
+from .single_flight import SingleFlight
+
+# Lookups that can be cached, the key of an entry is (lookup, value)
+BY_TRIP_ID = 'trip_id'
+BY_LOCATION = 'location'
+BY_ADMIN_ID = 'admin_id'
+
+
+class _CachedLookup:
+    def __init__(self, response_payload, fresh_until):
+        self.response_payload = response_payload
+        self.fresh_until = fresh_until
+
+
+class TripCache:
+    """
+    Read-through cache of the trip_mgr responses for trip lookups by trip_id, location and admin_id.
+
+    - Found trips are fresh for `ttl` seconds, then served for another `stale_ttl` seconds while they are refreshed in
+      the background (stale-while-revalidate).
+    - Lookups that found nothing (404) are cached for `negative_ttl` seconds.
+    - Concurrent misses for the same lookup share one fetch.
+    - The mutation routes invalidate the entries that contain the trip they changed, including the lookups of only
+      some of its fields. Invalidation is local to this container, other containers see the change once their
+      entries expire.
+
+    The cache is only used from the event loop.
+    """
+
+    def __init__(self, max_entries=1000, ttl=30, stale_ttl=30, negative_ttl=5):
+        """
+        :param max_entries: The maximum number of cached lookups.
+        :type max_entries: int
+        :param ttl: Seconds a found trip lookup is fresh for.
+        :type ttl: float
+        :param stale_ttl: Seconds a found trip lookup is served stale for after it stops being fresh.
+        :type stale_ttl: float
+        :param negative_ttl: Seconds a lookup that found nothing is cached for.
+        :type negative_ttl: float
+        """
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+
+        self.cache = TTLCache(max_entries, ttl + stale_ttl, on_evict=self._forget_key)
+
+        # trip_id -> keys of the lookups whose response contains the trip
+        self.keys_by_trip_id = {}
+        # bumped on every invalidation, a fetch that overlaps an invalidation is not cached
+        self.generation = 0
+        # the field projections cached, so a lookup's projected entries can be invalidated with it
+        self.projections = set()
+
+        self.refreshing = set()
+        self._refresh_tasks = set()
+        self.flights = SingleFlight()
+
+        self.hits = 0
+        self.stale_hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get_or_fetch(self, key, fetch):
+        """
+        Gets the response of a lookup from the cache, or by awaiting fetch on a miss.
+
+        :param key: (lookup, value), e.g. (BY_TRIP_ID, 123), or (lookup, value, fields) for a lookup of only some
+                    fields, fields being a sorted tuple.
+        :type key: tuple
+        :param fetch: Called without arguments to fetch the lookup from trip_mgr, returning an awaitable.
+        :type fetch: function
+        :return: The response payload from trip_mgr.
+        :rtype: dict
+        """
+        cached = self.cache.get(key)
+
+        if cached is not None:
+            if cached.response_payload['statusCode'] == 404:
+                self.negative_hits += 1
+            elif time.monotonic() < cached.fresh_until:
+                self.hits += 1
+            else:
+                self.stale_hits += 1
+                self._schedule_refresh(key, fetch)
+
+            return cached.response_payload
+
+        self.misses += 1
+
+        generation = self.generation
+
+        async def fetch_and_store():
+            response_payload = await fetch()
+            self._store(key, response_payload, generation)
+            return response_payload
+
+        # a fetch that started before an invalidation is not shared with the lookups made after it
+        return await self.flights.do((generation, key), fetch_and_store)
+
+    def _store(self, key, response_payload, generation):
+        if generation != self.generation:
+            return
+
+        status_code = response_payload['statusCode']
+
+        if status_code in (200, 404):
+            # drop the previous response's trips from the index before it is replaced
+            self.cache.pop(key)
+
+            if len(key) == 3:
+                self.projections.add(key[2])
+
+        if status_code == 200:
+            self.cache.set(key, _CachedLookup(response_payload, time.monotonic() + self.ttl))
+
+            for trip_id in _trip_ids(response_payload['body']):
+                self.keys_by_trip_id.setdefault(trip_id, set()).add(key)
+
+        elif status_code == 404:
+            self.cache.set(key, _CachedLookup(response_payload, time.monotonic()), ttl=self.negative_ttl)
+
+    def _schedule_refresh(self, key, fetch):
+        if key in self.refreshing:
+            return
+
+        self.refreshing.add(key)
+        task = asyncio.get_running_loop().create_task(self._refresh(key, fetch))
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    async def _refresh(self, key, fetch):
+        try:
+            generation = self.generation
+            response_payload = await fetch()
+            self._store(key, response_payload, generation)
+        except Exception as e:
+            logging.error('refreshing trip cache entry ' + str(key) + ': ' + str(e))
+        finally:
+            self.refreshing.discard(key)
+
+    def _forget_key(self, key, cached):
+        if cached.response_payload['statusCode'] != 200:
+            return
+
+        for trip_id in _trip_ids(cached.response_payload['body']):
+            keys = self.keys_by_trip_id.get(trip_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self.keys_by_trip_id[trip_id]
+
+    def invalidate_trip(self, trip_id):
+        """
+        Removes every lookup containing the trip, call after the trip is changed or deleted.
+
+        :param trip_id: The trip that changed.
+        :type trip_id: int
+        """
+        self.generation += 1
+        self.invalidations += 1
+
+        for key in list(self.keys_by_trip_id.get(trip_id, ())):
+            self.cache.pop(key)
+
+        for key in self._projected_keys((BY_TRIP_ID, trip_id)):
+            self.cache.pop(key)
+
+    def invalidate_new_trip(self, location, admin_id):
+        """
+        Removes the lookups a new trip would appear in, call after a trip is created.
+
+        :param location: The location of the new trip.
+        :type location: str
+        :param admin_id: The admin of the new trip.
+        :type admin_id: int
+        """
+        self.generation += 1
+        self.invalidations += 1
+
+        for key in self._projected_keys((BY_LOCATION, normalise_location(location))):
+            self.cache.pop(key)
+
+        for key in self._projected_keys((BY_ADMIN_ID, admin_id)):
+            self.cache.pop(key)
+
+    def _projected_keys(self, key):
+        """
+        :return: The key of a lookup of whole trips and the keys of the same lookup for each cached projection.
+        :rtype: list
+        """
+        return [key] + [key + (fields,) for fields in self.projections]
+
+    def stats(self):
+        """
+        :return: The counters of the cache.
+        :rtype: dict
+        """
+        return {
+            'entries': len(self.cache),
+            'max_entries': self.cache.max_entries,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'evictions': self.cache.evictions,
+            'invalidations': self.invalidations,
+            'collapsed': self.flights.collapsed,
+        }
+
+
+def _trip_ids(body):
+    trips = body if isinstance(body, list) else [body]
+    return [trip['trip_id'] for trip in trips if isinstance(trip, dict) and 'trip_id' in trip]
+
+
+def normalise_location(location):
+    """
+    Formats a location the same way trip_mgr stores it, so lookups for "lONdon" and "London" share an entry.
+    Example: "helLo wOrlD" -> "Hello World"
+
+    :param location: The location to format.
+    :type location: str
+    :return: The formatted location.
+    :rtype: str
+    """
+    return ' '.join(word[0].upper() + word[1:].lower() for word in location.split())
+
+
+def create_trip_cache():
+    """
+    Creates the trip cache configured from the environment: `TRIP_CACHE_MAX_ENTRIES` (default 1000),
+    `TRIP_CACHE_TTL_SECONDS` (default 30), `TRIP_CACHE_STALE_SECONDS` (default 30) and
+    `TRIP_CACHE_NEGATIVE_TTL_SECONDS` (default 5).
+
+    :return: The trip cache.
+    :rtype: TripCache
+    """
+    return TripCache(
+        max_entries=int(os.getenv('TRIP_CACHE_MAX_ENTRIES', 1000)),
+        ttl=float(os.getenv('TRIP_CACHE_TTL_SECONDS', 30)),
+        stale_ttl=float(os.getenv('TRIP_CACHE_STALE_SECONDS', 30)),
+        negative_ttl=float(os.getenv('TRIP_CACHE_NEGATIVE_TTL_SECONDS', 5)),
+    )
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import os
+import time
+from urllib.parse import urlencode
+from fastapi import Depends, HTTPException, Request
+from .auth_route_dependency import authenticate_request
+from .rate_limiter import rate_limit, COST_QUERY
+from .utils import call_account_mgr, call_trip_mgr
+from .trip_cache import BY_TRIP_ID
+from .weather_mgr import get_weather_content
+from .weather_aggregates import DAILY
+from .image_mgr import get_photo_reference, photo_etag
+from .secrets_provider import SecretsProvider
+from .json_response import fast_json_response
+
+# Seconds each dependency of /trips/{trip_id}/full is waited for before it is left out of the response
+WEATHER_TIMEOUT = float(os.getenv('TRIP_FULL_WEATHER_TIMEOUT_SECONDS', 2))
+IMAGE_TIMEOUT = float(os.getenv('TRIP_FULL_IMAGE_TIMEOUT_SECONDS', 2))
+EMAIL_TIMEOUT = float(os.getenv('TRIP_FULL_EMAIL_TIMEOUT_SECONDS', 1))
+
+
+async def get_trip(lambda_client, trip_cache, trip_id):
+    """
+    Gets a trip through the trip cache.
+
+    :param lambda_client: The lambda transport.
+    :type lambda_client: LambdaTransport | InProcessTransport
+    :param trip_cache: The trip cache.
+    :type trip_cache: TripCache
+    :param trip_id: The trip to get.
+    :type trip_id: int
+    :return: The trip.
+    :rtype: dict
+
+    :raises HTTPException: With status code 404 if the trip does not exist.
+    :raises HTTPException: With status code 500 in an internal error occurred.
+    :raises HTTPException: With status code 502 if the lambda fails unexpectedly.
+    """
+    payload = {
+        'httpMethod': 'GET',
+        'action': 'get_trip_info_by_id',
+        'body': {
+            'trip_id': trip_id
+        }
+    }
+
+    response_payload = await trip_cache.get_or_fetch(
+        (BY_TRIP_ID, trip_id), lambda: call_trip_mgr(lambda_client, payload)
+    )
+
+    status_code = response_payload['statusCode']
+
+    if status_code == 404:
+        raise HTTPException(status_code=404, detail='Trip not found')
+    elif status_code != 200:
+        logging.error('error while getting trip returned non-200 response: ' + str(response_payload))
+        raise HTTPException(status_code=500, detail='Error while getting trip non-200 response')
+
+    return response_payload['body']
+
+
+async def get_trip_weather(http_client, trip):
+    """
+    :return: The daily weather of the trip's dates.
+    :rtype: dict
+
+    :raises LookupError: If the weather api has no data for the trip.
+    """
+    start_date = int(trip['start_date'])
+    end_date = int(trip['end_date'])
+
+    content, status_code = await get_weather_content(
+        http_client, trip['location'], start_date, end_date, end_date < time.time(), DAILY
+    )
+
+    if status_code != 200:
+        raise LookupError('No weather data available')
+
+    return content
+
+
+async def get_trip_image(http_client, trip):
+    """
+    :return: The url and ETag of the trip location's photo, the photo itself is not downloaded.
+    :rtype: dict
+    """
+    api_key = await SecretsProvider().aget('IMAGE_API_KEY')
+    photo_id = await get_photo_reference(http_client, trip['location'], api_key)
+
+    return {
+        'url': '/image?' + urlencode({'location': trip['location']}),
+        'etag': photo_etag(photo_id),
+    }
+
+
+async def get_admin_email(lambda_client, trip):
+    """
+    :return: The email of the trip's admin.
+    :rtype: str
+
+    :raises LookupError: If the admin's account does not exist.
+    """
+    payload = {
+        'httpMethod': 'GET',
+        'action': 'get_email',
+        'body': {
+            'user_id': trip['admin_id'],
+        }
+    }
+
+    response_payload = await call_account_mgr(lambda_client, payload)
+
+    if response_payload['statusCode'] != 200:
+        raise LookupError('Admin email not found')
+
+    return response_payload['body']['email']
+
+
+async def _with_timeout(name, awaitable, timeout, errors):
+    """
+    Awaits a dependency, recording why in `errors` and returning None if it fails or takes longer than `timeout`.
+    """
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError:
+        errors[name] = 'Timed out'
+    except HTTPException as e:
+        errors[name] = e.detail
+    except LookupError as e:
+        errors[name] = str(e)
+    except Exception as e:
+        logging.error(f'enriching trip with {name}: ' + str(e))
+        errors[name] = 'Failed'
+
+    return None
+
+
+def trip_enrichment(app, lambda_client, http_client, trip_cache):
+    """
+    Method that defines the trip enrichment methods.
+    """
+    @app.get('/trips/{trip_id}/full', dependencies=[Depends(rate_limit(COST_QUERY))])
+    async def get_full_trip(request: Request, trip_id: int, user_id=Depends(authenticate_request)):
+        """
+        Gets a trip with everything needed to show it: the daily weather over its dates, its location's image and the
+        email of its admin. The weather, image and email are fetched concurrently, each with its own timeout, so the
+        response takes as long as the slowest of them. Any that fail or time out are null, with the reason in
+        `errors`.
+
+        :param trip_id: The trip to get.
+        :type trip_id: int
+        :return: {"trip": {...}, "weather": {"days": [...]}, "image": {"url": "...", "etag": "..."},
+                 "admin_email": "...", "errors": {"weather": "Timed out"}}
+
+        :raises HTTPException: With status code 404 if the trip does not exist.
+        :raises HTTPException: With status code 500 in an internal error occurred.
+        :raises HTTPException: With status code 502 if the lambda fails unexpectedly.
+        """
+        try:
+            trip = await get_trip(lambda_client, trip_cache, trip_id)
+        except HTTPException as http_exception:
+            raise http_exception
+        except Exception as e:
+            logging.error('invoking trip_mgr: ' + str(e))
+            raise HTTPException(status_code=500, detail=str(e))
+
+        errors = {}
+
+        weather, image, admin_email = await asyncio.gather(
+            _with_timeout('weather', get_trip_weather(http_client, trip), WEATHER_TIMEOUT, errors),
+            _with_timeout('image', get_trip_image(http_client, trip), IMAGE_TIMEOUT, errors),
+            _with_timeout('admin_email', get_admin_email(lambda_client, trip), EMAIL_TIMEOUT, errors),
+        )
+
+        content = {
+            'trip': trip,
+            'weather': weather,
+            'image': image,
+            'admin_email': admin_email,
+            'errors': errors,
+        }
+
+        return await fast_json_response(request, content)
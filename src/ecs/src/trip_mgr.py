@@ -1,11 +1,23 @@
-from fastapi import HTTPException, Depends
-from fastapi.responses import JSONResponse
+from fastapi import HTTPException, Depends, Query, Request
+from fastapi.responses import JSONResponse, Response
 from typing import Optional
-import json
+import hashlib
 import logging
 from pydantic import BaseModel
-from .utils import call_trip_mgr
-from .auth_route_dependency import authenticate_request
+from .utils import call_trip_mgr, call_trip_mgr_batch, match_etag
+from .auth_route_dependency import authenticate_request, authenticate_internal_request
+from .rate_limiter import rate_limit, COST_DEFAULT, COST_QUERY, COST_SCAN
+from .trip_cache import BY_TRIP_ID, BY_LOCATION, BY_ADMIN_ID, normalise_location
+from .json_response import fast_json_response
+
+# The largest page of trips that can be requested from /trips
+MAX_PAGE_LIMIT = 1000
+# Clients may keep the trips but must revalidate them with If-None-Match before each use
+TRIPS_CACHE_CONTROL = 'private, no-cache'
+# Attributes of a trip that can be requested with `fields`, trip_id and version are always returned
+TRIP_FIELDS = ('trip_id', 'admin_id', 'location', 'title', 'description', 'start_date', 'end_date',
+               'awaiting_approval', 'approved', 'version')
+REQUIRED_TRIP_FIELDS = ('trip_id', 'version')
 
 
 class CreateTripRequest(BaseModel):
@@ -39,41 +51,165 @@ class DeleteTripRequest(BaseModel):
     trip_id: int
 
 
-def verify_current_user_is_admin(user_id, trip_id, lambda_client):
+async def call_trip_mgr_as_admin(user_id, trip_id, lambda_client, payload):
     """
-    Throws 401 if the current user is not the admin of the specified trip, otherwise there are no external interactions.
+    Calls the trip_mgr lambda with the given payload, only if the current user is the admin of the specified trip.
+    The check and the payload are run in a single invocation.
 
     :param user_id: User ID of the user making the request.
     :type user_id: int
     :param trip_id: ID of trip in question.
     :type trip_id: int
-    :param lambda_client: The lambda client.
-    :type lambda_client: boto3.client
-    :return: None
+    :param lambda_client: The lambda transport.
+    :type lambda_client: LambdaTransport | InProcessTransport
+    :param payload: Payload to send to the lambda once the user is verified.
+    :type payload: dict
+    :return: The response payload from the lambda for the given payload.
+    :rtype: dict
 
     :raises HTTPException: With status code 401 if the current user is not admin of specified trip.
+    :raises HTTPException: With status code 404 if the specified trip does not exist.
+    :raises HTTPException: With status code 500 if the trip could not be checked.
     :raises HTTPException: With status code 502 if the lambda fails unexpectedly.
     """
-    verify_payload = json.dumps({
+    verify_payload = {
         'httpMethod': 'GET',
-        'action': 'get_trip_info_by_id',
+        'action': 'verify_trip_admin',
         'body': {
-            'trip_id': trip_id
+            'trip_id': trip_id,
+            'admin_id': user_id
         }
-    })
+    }
 
-    verify_response_payload = call_trip_mgr(lambda_client, verify_payload)
+    verify_response_payload, response_payload = await call_trip_mgr_batch(
+        lambda_client, [verify_payload, payload], stop_on_failure=True
+    )
 
-    if user_id != verify_response_payload['body']['admin_id'] \
-            and 200 == verify_response_payload['statusCode']:
+    status_code = verify_response_payload['statusCode']
+
+    if status_code == 401:
         raise HTTPException(status_code=401, detail='Not authorised to make the change')
+    elif status_code == 404:
+        raise HTTPException(status_code=404, detail='Trip not found')
+    elif status_code != 200:
+        logging.error('error while verifying trip admin returned non-200 response: ' + str(verify_response_payload))
+        raise HTTPException(status_code=500, detail='Failed to get trip')
+
+    return response_payload
+
+
+def trips_cost(request):
+    """
+    The rate limit cost of a /trips request: a trip_id is a single read, a location or admin_id is a query and no
+    filter scans the table, whether or not it is paged, as a page is up to MAX_PAGE_LIMIT trips of the scan.
+
+    :param request: The /trips request.
+    :type request: Request
+    :return: The tokens the request costs.
+    :rtype: int
+    """
+    query_params = request.query_params
+
+    if 'trip_id' in query_params:
+        return COST_DEFAULT
+    if 'location' in query_params or 'admin_id' in query_params:
+        return COST_QUERY
+
+    return COST_SCAN
+
+
+def parse_fields(fields):
+    """
+    Parses the `fields` query parameter of the trip routes.
+
+    :param fields: Comma separated trip attributes, e.g. "trip_id,title,location", or None for whole trips.
+    :type fields: str | None
+    :return: The attributes including trip_id and version as a sorted tuple, or None for whole trips.
+    :rtype: tuple | None
+
+    :raises HTTPException: With status code 400 if a field is not an attribute of a trip.
+    """
+    if fields is None:
+        return None
 
+    requested = {field.strip() for field in fields.split(',') if field.strip()}
+    unknown = requested.difference(TRIP_FIELDS)
 
-def trip_mgr(app, lambda_client):
+    if unknown:
+        raise HTTPException(status_code=400, detail='Unknown fields: ' + ', '.join(sorted(unknown)))
+
+    return tuple(sorted(requested.union(REQUIRED_TRIP_FIELDS))) if requested else None
+
+
+def trips_etag(content, fields=None):
+    """
+    Derives a strong ETag for a trip response from the trip_id and version of each trip in it, and the fields
+    returned. Every write to a trip bumps its version, so this identifies the response without serializing it.
+
+    :param content: A trip, a list of trips or a page of them as {"items": [...], "next_cursor": "..."}.
+    :type content: dict | list
+    :param fields: The fields of the trips returned, None for whole trips.
+    :type fields: tuple | None
+    :return: The ETag, including the quotes.
+    :rtype: str
+    """
+    next_cursor = None
+
+    if isinstance(content, dict) and 'items' in content:
+        next_cursor = content.get('next_cursor')
+        content = content['items']
+
+    trips = content if isinstance(content, list) else [content]
+    versions = ','.join(f'{trip.get("trip_id")}:{trip.get("version", 0)}' for trip in trips)
+
+    digest = hashlib.blake2b(f'{versions}|{next_cursor}|{fields}'.encode('utf-8'), digest_size=16).hexdigest()
+    return f'"{digest}"'
+
+
+async def trips_response(request, content, fields=None):
+    """
+    Responds with trips, or with 304 if the client's copy from an earlier response is still current.
+
+    :param request: The request being responded to, for its If-None-Match and Accept-Encoding headers.
+    :type request: Request
+    :param content: The trips.
+    :type content: dict | list
+    :param fields: The fields of the trips, None for whole trips.
+    :type fields: tuple | None
+    :return: The response.
+    :rtype: Response
+    """
+    headers = {
+        'ETag': trips_etag(content, fields),
+        'Cache-Control': TRIPS_CACHE_CONTROL,
+    }
+
+    client_etag = match_etag(request.headers.get('if-none-match'), headers['ETag'])
+
+    if client_etag is not None:
+        # the 304 confirms the encoding of the client's copy, which depends on its Accept-Encoding
+        headers['ETag'] = client_etag
+        headers['Vary'] = 'Accept-Encoding'
+        return Response(status_code=304, headers=headers)
+
+    return await fast_json_response(request, content, headers=headers)
+
+
+def trip_mgr(app, lambda_client, trip_cache):
     """
     Method that defines all trip mgr methods.
     """
-    @app.post('/trip')
+    @app.get('/trips-cache-stats', dependencies=[Depends(authenticate_internal_request)])
+    async def get_trips_cache_stats():
+        """
+        Gets the counters of the trip cache, used to size it.
+
+        :return: The number of entries, hits, stale hits, negative hits, misses, evictions, invalidations and misses
+                 collapsed into a fetch already in flight.
+        """
+        return JSONResponse(status_code=200, content=trip_cache.stats())
+
+    @app.post('/trip', dependencies=[Depends(rate_limit())])
     async def create_trip(request: CreateTripRequest, user_id=Depends(authenticate_request)):
         """
         Creates a new trip.
@@ -99,7 +235,7 @@ def trip_mgr(app, lambda_client):
                 # add two hours if they are the same
                 request.end_date += two_hours
 
-            payload = json.dumps({
+            payload = {
                 'httpMethod': 'POST',
                 'action': 'create_trip',
                 'body': {
@@ -110,9 +246,10 @@ def trip_mgr(app, lambda_client):
                     'title': request.title,
                     'description': request.description
                 }
-            })
+            }
 
-            response_payload = call_trip_mgr(lambda_client, payload)
+            response_payload = await call_trip_mgr(lambda_client, payload)
+            trip_cache.invalidate_new_trip(request.location, user_id)
 
             status_code = response_payload['statusCode']
 
@@ -130,7 +267,7 @@ def trip_mgr(app, lambda_client):
 
         return JSONResponse(status_code=201, content=content)
 
-    @app.delete('/trip')
+    @app.delete('/trip', dependencies=[Depends(rate_limit(COST_QUERY))])
     async def delete_trip(request: DeleteTripRequest, user_id=Depends(authenticate_request)):
         """
         Deletes an existing trip.
@@ -140,6 +277,7 @@ def trip_mgr(app, lambda_client):
 
         :raises HTTPException: With status code 400 if the delete transaction failed.
         :raises HTTPException: With status code 401 if the current user is not admin of specified trip.
+        :raises HTTPException: With status code 404 if the specified trip does not exist.
         :raises HTTPException: With status code 500 in an internal error occurred.
         :raises HTTPException: With status code 502 if the lambda fails unexpectedly.
         """
@@ -147,17 +285,16 @@ def trip_mgr(app, lambda_client):
         content = None
 
         try:
-            verify_current_user_is_admin(user_id, request.trip_id, lambda_client)
-
-            payload = json.dumps({
+            payload = {
                 'httpMethod': 'DELETE',
                 'action': 'delete_trip',
                 'body': {
                     'trip_id': request.trip_id,
                 }
-            })
+            }
 
-            response_payload = call_trip_mgr(lambda_client, payload)
+            response_payload = await call_trip_mgr_as_admin(user_id, request.trip_id, lambda_client, payload)
+            trip_cache.invalidate_trip(request.trip_id)
 
             status_code = response_payload['statusCode']
 
@@ -177,13 +314,19 @@ def trip_mgr(app, lambda_client):
 
         return JSONResponse(status_code=200, content=content)
 
-    @app.get('/trips')
-    async def get_trips(trip_id: Optional[int] = None,
+    @app.get('/trips', dependencies=[Depends(rate_limit(trips_cost))])
+    async def get_trips(request: Request,
+                        trip_id: Optional[int] = None,
                         location: Optional[str] = None,
                         admin_id: Optional[int] = None,
+                        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_LIMIT),
+                        cursor: Optional[str] = None,
+                        fields: Optional[str] = None,
                         user_id=Depends(authenticate_request)):
         """
         Gets a trip by a specified parameter in the url. If no parameter is specified all trips will be returned.
+        Large responses are compressed if the client accepts it. The response carries an ETag, a request with a
+        matching If-None-Match gets a 304 without the body.
 
         :param trip_id: (Optional) gets the trip by trip_id.
         :type trip_id: int
@@ -191,54 +334,97 @@ def trip_mgr(app, lambda_client):
         :type location: str
         :param admin_id: (Optional) gets the trip by admin_id.
         :type admin_id: int
-        :return: Within the body an Item or Items array containing the trip/s.
-
+        :param limit: (Optional) the maximum number of trips to return for a location, admin_id or all trips.
+        :type limit: int
+        :param cursor: (Optional) the `next_cursor` of the previous page.
+        :type cursor: str
+        :param fields: (Optional) comma separated attributes to return of each trip, e.g.
+                       "title,location,start_date,end_date". trip_id and version are always returned.
+        :type fields: str
+        :return: Within the body an Item or Items array containing the trip/s. When a limit or cursor is given, or
+                 more than the maximum page of trips match without one, the body is
+                 {"items": [...], "next_cursor": "..."}, next_cursor is null on the last page. 304 if the client's copy
+                 is current.
+
+        :raises HTTPException: With status code 400 if the cursor or a field is invalid.
         :raises HTTPException: With status code 404 if no trip matching the description is found.
         :raises HTTPException: With status code 500 in an internal error occurred.
         :raises HTTPException: With status code 502 if the lambda fails unexpectedly.
         """
 
         content = None
+        is_paged = limit is not None or cursor is not None
+        fields = parse_fields(fields)
 
         try:
             payload = None
+            cache_key = None
 
             if trip_id is not None:
-                payload = json.dumps({
+                cache_key = (BY_TRIP_ID, trip_id)
+                payload = {
                     'httpMethod': 'GET',
                     'action': 'get_trip_info_by_id',
                     'body': {
                         'trip_id': trip_id
                     }
-                })
+                }
             elif location is not None:
-                payload = json.dumps({
+                cache_key = (BY_LOCATION, normalise_location(location))
+                payload = {
                     'httpMethod': 'GET',
                     'action': 'get_trip_info_by_location',
                     'body': {
                         'location': location
                     }
-                })
+                }
             elif admin_id is not None:
-                payload = json.dumps({
+                cache_key = (BY_ADMIN_ID, admin_id)
+                payload = {
                     'httpMethod': 'GET',
                     'action': 'get_trip_info_by_admin_id',
                     'body': {
                         'admin_id': admin_id
                     }
-                })
+                }
             else:
-                payload = json.dumps({
+                payload = {
                     'httpMethod': 'GET',
-                    'action': 'get_all_trips'
-                })
+                    'action': 'get_all_trips',
+                    'body': {}
+                }
 
-            response_payload = call_trip_mgr(lambda_client, payload)
+            if fields is not None:
+                payload['body']['fields'] = list(fields)
+                if cache_key is not None:
+                    cache_key += (fields,)
+
+            if is_paged and trip_id is None:
+                payload['body']['limit'] = limit
+                payload['body']['cursor'] = cursor
+                # pages are not cached, as the cursors could not be invalidated
+                cache_key = None
+
+            if cache_key is not None:
+                response_payload = await trip_cache.get_or_fetch(
+                    cache_key, lambda: call_trip_mgr(lambda_client, payload)
+                )
+            else:
+                response_payload = await call_trip_mgr(lambda_client, payload)
 
             status_code = response_payload['statusCode']
 
             if status_code == 200:
                 content = response_payload['body']
+
+                # an unpaged location, admin_id or scan is cut at the lambda's maximum page, the rest is left to a cursor
+                if (is_paged or response_payload.get('next_cursor')) and trip_id is None:
+                    content = {
+                        'items': content,
+                        'next_cursor': response_payload.get('next_cursor')
+                    }
+            elif status_code == 400:
+                raise HTTPException(status_code=400, detail=response_payload.get('details', 'Invalid cursor'))
             elif status_code == 404:
                 logging.error('Trips not found: ' + str(response_payload))
                 raise HTTPException(status_code=404, detail='Trips not found')
@@ -252,37 +438,49 @@ def trip_mgr(app, lambda_client):
             logging.error('invoking trip_mgr: ' + str(e))
             raise HTTPException(status_code=500, detail=str(e))
 
-        return JSONResponse(status_code=200, content=content)
+        return await trips_response(request, content, fields)
 
-    @app.get('/trips-user-id')
-    async def get_trips_user_id(user_id=Depends(authenticate_request)):
+    @app.get('/trips-user-id', dependencies=[Depends(rate_limit(COST_QUERY))])
+    async def get_trips_user_id(request: Request, fields: Optional[str] = None,
+                                user_id=Depends(authenticate_request)):
         """
-        Gets a trip by the user_id specified in the headers.
+        Gets a trip by the user_id specified in the headers. Large responses are compressed if the client accepts it.
+        The response carries an ETag, a request with a matching If-None-Match gets a 304 without the body.
 
-        :return: Within the body an Item or Items array containing the trip/s.
+        :param fields: (Optional) comma separated attributes to return of each trip, trip_id and version are always
+                       returned.
+        :type fields: str
+        :return: Within the body an Item or Items array containing the trip/s, or 304 if the client's copy is current.
 
+        :raises HTTPException: With status code 400 if a field is invalid.
         :raises HTTPException: With status code 404 if no trip matching the description is found.
         :raises HTTPException: With status code 500 in an internal error occurred.
         :raises HTTPException: With status code 502 if the lambda fails unexpectedly.
         """
 
         content = None
+        fields = parse_fields(fields)
 
         try:
-            payload = json.dumps({
+            payload = {
                 'httpMethod': 'GET',
                 'action': 'get_all_trips_for_user_id',
                 'body': {
                     'user_id': user_id
                 }
-            })
+            }
 
-            response_payload = call_trip_mgr(lambda_client, payload)
+            if fields is not None:
+                payload['body']['fields'] = list(fields)
+
+            response_payload = await call_trip_mgr(lambda_client, payload)
 
             status_code = response_payload['statusCode']
 
             if status_code == 200:
                 content = response_payload['body']['items']
+            elif status_code == 400:
+                raise HTTPException(status_code=400, detail=response_payload.get('details', 'Bad request'))
             elif status_code == 404:
                 logging.error('Trips not found: ' + str(response_payload))
                 raise HTTPException(status_code=404, detail='Trips not found')
@@ -296,9 +494,9 @@ def trip_mgr(app, lambda_client):
             logging.error('invoking trip_mgr: ' + str(e))
             raise HTTPException(status_code=500, detail=str(e))
 
-        return JSONResponse(status_code=200, content=content)
+        return await trips_response(request, content, fields)
 
-    @app.post('/user-wants-to-go-on-trip')
+    @app.post('/user-wants-to-go-on-trip', dependencies=[Depends(rate_limit())])
     async def user_wants_to_go_on_trip(request: UserWantsToGoOnTripRequest, user_id=Depends(authenticate_request)):
         """
         User specifies a trip that they would like to apply for.
@@ -314,16 +512,17 @@ def trip_mgr(app, lambda_client):
         content = None
 
         try:
-            payload = json.dumps({
+            payload = {
                 'httpMethod': 'POST',
                 'action': 'user_wants_to_go_on_trip',
                 'body': {
                     'user_id': user_id,
                     'trip_id': request.trip_id
                 }
-            })
+            }
 
-            response_payload = call_trip_mgr(lambda_client, payload)
+            response_payload = await call_trip_mgr(lambda_client, payload)
+            trip_cache.invalidate_trip(request.trip_id)
 
             status_code = response_payload['statusCode']
 
@@ -344,7 +543,7 @@ def trip_mgr(app, lambda_client):
 
         return JSONResponse(status_code=200, content=content)
 
-    @app.post('/user-approval')
+    @app.post('/user-approval', dependencies=[Depends(rate_limit())])
     async def user_approval(request: UserApproval, user_id=Depends(authenticate_request)):
         """
         Admin of a trip approves a user for a trip.
@@ -353,6 +552,7 @@ def trip_mgr(app, lambda_client):
 
         :raises HTTPException: With status code 400 the transaction failed.
         :raises HTTPException: With status code 401 if the current user is not admin of specified trip.
+        :raises HTTPException: With status code 404 if the specified trip does not exist.
         :raises HTTPException: With status code 500 in an internal error occurred.
         :raises HTTPException: With status code 502 if the lambda fails unexpectedly.
         """
@@ -360,9 +560,7 @@ def trip_mgr(app, lambda_client):
         content = None
 
         try:
-            verify_current_user_is_admin(user_id, request.trip_id, lambda_client)
-
-            payload = json.dumps({
+            payload = {
                 'httpMethod': 'POST',
                 'action': 'user_approval',
                 'body': {
@@ -370,9 +568,10 @@ def trip_mgr(app, lambda_client):
                     'trip_id': request.trip_id,
                     'is_approved': request.is_approved
                 }
-            })
+            }
 
-            response_payload = call_trip_mgr(lambda_client, payload)
+            response_payload = await call_trip_mgr_as_admin(user_id, request.trip_id, lambda_client, payload)
+            trip_cache.invalidate_trip(request.trip_id)
 
             status_code = response_payload['statusCode']
 
@@ -392,7 +591,7 @@ def trip_mgr(app, lambda_client):
 
         return JSONResponse(status_code=200, content=content)
 
-    @app.post('/user-no-longer-wants-to-attend')
+    @app.post('/user-no-longer-wants-to-attend', dependencies=[Depends(rate_limit())])
     async def user_no_longer_wants_to_attend(request: UserNoLongerWantsToAttend, user_id=Depends(authenticate_request)):
         """
         User that has applied for a trip can resign from it, this works if they have been approved or not.
@@ -406,16 +605,17 @@ def trip_mgr(app, lambda_client):
         content = None
 
         try:
-            payload = json.dumps({
+            payload = {
                 'httpMethod': 'POST',
                 'action': 'remove_user_application',
                 'body': {
                     'user_id': user_id,
                     'trip_id': request.trip_id,
                 }
-            })
+            }
 
-            response_payload = call_trip_mgr(lambda_client, payload)
+            response_payload = await call_trip_mgr(lambda_client, payload)
+            trip_cache.invalidate_trip(request.trip_id)
 
             status_code = response_payload['statusCode']
 
@@ -433,7 +633,7 @@ def trip_mgr(app, lambda_client):
 
         return JSONResponse(status_code=200, content=content)
 
-    @app.post('/user-denied')
+    @app.post('/user-denied', dependencies=[Depends(rate_limit())])
     async def user_no_longer_wants_to_attend(request: UserDenied, admin_id=Depends(authenticate_request)):
         """
         Admin can deny a user from being apart of a trip, even after being approved.
@@ -441,42 +641,25 @@ def trip_mgr(app, lambda_client):
         :return: None
 
         :raises HTTPException: With status code 401 the current user must be the admin of the trip to remove the user.
+        :raises HTTPException: With status code 404 if the specified trip does not exist.
         :raises HTTPException: With status code 500 in an internal error occurred.
         :raises HTTPException: With status code 502 if the lambda fails unexpectedly.
         """
         content = None
 
         try:
-            # Get the admin id of the trip in question and validate request
-            get_trip_payload = json.dumps({
-                'httpMethod': 'GET',
-                'action': 'get_trip_info_by_id',
-                'body': {
-                    'trip_id': request.trip_id
-                }
-            })
-
-            trip_payload = call_trip_mgr(lambda_client, get_trip_payload)
-
-            if trip_payload['statusCode'] != 200:
-                raise HTTPException(status_code=500, detail='Failed to get trip')
-
-            if admin_id != trip_payload['body']['admin_id']:
-                print(admin_id)
-                print(trip_payload['body']['admin_id'])
-                raise HTTPException(status_code=401, detail='Not Authorized')
-
-            # Remove user
-            payload = json.dumps({
+            # Remove user, only if the current user is the admin of the trip
+            payload = {
                 'httpMethod': 'POST',
                 'action': 'remove_user_application',
                 'body': {
                     'user_id': request.user_id,
                     'trip_id': request.trip_id,
                 }
-            })
+            }
 
-            response_payload = call_trip_mgr(lambda_client, payload)
+            response_payload = await call_trip_mgr_as_admin(admin_id, request.trip_id, lambda_client, payload)
+            trip_cache.invalidate_trip(request.trip_id)
 
             status_code = response_payload['statusCode']
 
@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    A bounded, thread safe, least recently used cache whose entries expire after a time to live.
+
+    Expired entries are kept until they are evicted or replaced, so callers that can tolerate stale data (e.g. when
+    an upstream is failing) can still read them with `get_stale`.
+    """
+
+    def __init__(self, max_entries, ttl, on_evict=None):
+        """
+        :param max_entries: The maximum number of entries, the least recently used entry is evicted past this.
+        :type max_entries: int
+        :param ttl: The default number of seconds an entry is fresh for.
+        :type ttl: float
+        :param on_evict: Called with (key, value) when an entry is evicted to make space, or removed with `pop`.
+        :type on_evict: function
+        """
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.on_evict = on_evict
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """
+        Gets a fresh entry.
+
+        :param key: The key of the entry.
+        :param default: Returned if there is no fresh entry.
+        :return: The value of the entry, or default.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None or entry[1] <= time.monotonic():
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def get_stale(self, key, default=None):
+        """
+        Gets an entry even if it has expired, this does not count towards the hits or misses.
+
+        :param key: The key of the entry.
+        :param default: Returned if there is no entry.
+        :return: The value of the entry, or default.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+
+            return default if entry is None else entry[0]
+
+    def set(self, key, value, ttl=None):
+        """
+        Adds or replaces an entry, evicting the least recently used entry if the cache is full.
+
+        :param key: The key of the entry.
+        :param value: The value of the entry.
+        :param ttl: The number of seconds the entry is fresh for, defaults to the cache's ttl.
+        :type ttl: float
+        """
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        evicted = []
+
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False))
+                self.evictions += 1
+
+        if self.on_evict:
+            for evicted_key, (evicted_value, _) in evicted:
+                self.on_evict(evicted_key, evicted_value)
+
+    def pop(self, key, default=None):
+        """
+        Removes an entry.
+
+        :param key: The key of the entry.
+        :param default: Returned if there is no entry.
+        :return: The value of the removed entry, or default.
+        """
+        with self._lock:
+            entry = self._entries.pop(key, None)
+
+        if entry is None:
+            return default
+
+        if self.on_evict:
+            self.on_evict(key, entry[0])
+
+        return entry[0]
+
+    def clear(self):
+        """
+        Removes every entry.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """
+        :return: The counters of the cache.
+        :rtype: dict
+        """
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
@@ -1,41 +1,32 @@
 from fastapi import HTTPException
-import os
-import json
 import logging
 from datetime import datetime
-import time
-import boto3
-from botocore.exceptions import ClientError
+from .lambda_transport import TRIP_MGR, ACCOUNT_MGR
 
 
-def handle_lambda_response(lambda_response):
+async def call_account_mgr(lambda_client, payload):
     """
-    Checks a lambdas response to ensure that it worked correctly.
+    Calls the account_mgr lambda with the given payload.
 
-    :param lambda_response: The raw response from the lambda called.
-    :type lambda_response: dict
-    :return: The response payload from the lambda.
+    :param lambda_client: The lambda transport.
+    :type lambda_client: LambdaTransport | InProcessTransport
+    :param payload: Payload to send to the lambda.
+    :type payload: dict
+    :return: The response payload from the lambda with any other details abstracted away.
     :rtype: dict
 
     :raises HTTPException: With status code 502 if the lambda fails unexpectedly.
     """
 
-    if lambda_response['ResponseMetadata']['HTTPStatusCode'] != 200:
-        logging.error('lambda returned non-200 response: ' + str(lambda_response))
-        raise HTTPException(status_code=502, detail='Error lambda returned non-200 response')
+    return await lambda_client.invoke(ACCOUNT_MGR, payload)
 
-    response_payload = lambda_response['Payload'].read().decode('utf-8')
-    response_payload = json.loads(response_payload)
 
-    return response_payload
-
-
-def call_account_mgr(lambda_client, payload):
+async def call_trip_mgr(lambda_client, payload):
     """
-    Calls the account_mgr lambda with the given payload.
+    Calls the trip_mgr lambda with the given payload.
 
-    :param lambda_client: The lambda client.
-    :type lambda_client: boto3.client
+    :param lambda_client: The lambda transport.
+    :type lambda_client: LambdaTransport | InProcessTransport
     :param payload: Payload to send to the lambda.
     :type payload: dict
     :return: The response payload from the lambda with any other details abstracted away.
@@ -44,36 +35,36 @@ def call_account_mgr(lambda_client, payload):
     :raises HTTPException: With status code 502 if the lambda fails unexpectedly.
     """
 
-    lambda_response = lambda_client.invoke(
-        FunctionName=os.getenv('USER_MGR_ARN'),
-        InvocationType='RequestResponse',
-        Payload=payload
-    )
+    return await lambda_client.invoke(TRIP_MGR, payload)
 
-    return handle_lambda_response(lambda_response)
 
-
-def call_trip_mgr(lambda_client, payload):
+async def call_trip_mgr_batch(lambda_client, payloads, stop_on_failure=True):
     """
-    Calls the trip_mgr lambda with the given payload.
+    Calls the trip_mgr lambda once with several payloads.
 
-    :param lambda_client: The lambda client.
-    :type lambda_client: boto3.client
-    :param payload: Payload to send to the lambda.
-    :type payload: dict
-    :return: The response payload from the lambda with any other details abstracted away.
-    :rtype: dict
+    :param lambda_client: The lambda transport.
+    :type lambda_client: LambdaTransport | InProcessTransport
+    :param payloads: Payloads to run in order, each is what would be sent to `call_trip_mgr`.
+    :type payloads: list
+    :param stop_on_failure: Skip the payloads after the first that fails, skipped payloads respond with 424.
+    :type stop_on_failure: bool
+    :return: The response payload of each payload, in the same order.
+    :rtype: list
 
     :raises HTTPException: With status code 502 if the lambda fails unexpectedly.
     """
 
-    lambda_response = lambda_client.invoke(
-        FunctionName=os.getenv('TRIP_MGR_ARN'),
-        InvocationType='RequestResponse',
-        Payload=payload
-    )
+    response_payload = await call_trip_mgr(lambda_client, {
+        'httpMethod': 'BATCH',
+        'stop_on_failure': stop_on_failure,
+        'actions': payloads
+    })
 
-    return handle_lambda_response(lambda_response)
+    if response_payload['statusCode'] != 200:
+        logging.error('trip_mgr batch returned non-200 response: ' + str(response_payload))
+        raise HTTPException(status_code=502, detail='Error lambda returned non-200 response')
+
+    return response_payload['body']
 
 
 def convert_unix_to_datetime(unix_time):
@@ -88,71 +79,112 @@ def convert_unix_to_datetime(unix_time):
     return datetime.utcfromtimestamp(unix_time).strftime('%Y-%m-%d:%H')
 
 
-def get_secrets(region_name):
-    """
-    Sets the environment variables `WEATHER_API_KEY` & `IMAGE_API_KEY`, so that they can be used
-    on the external api managers.
+# The content encodings fast_json_response can send, each is a different representation with its own strong ETag
+ETAG_ENCODINGS = ('br', 'gzip')
 
-    :param region_name: The region the secrets are located in.
-    :type region_name: str
 
-    :return: None
+def etag_for_encoding(etag, encoding):
+    """
+    Derives the ETag of a resource sent with a content encoding, as a strong ETag identifies the bytes sent.
+
+    :param etag: The ETag of the uncompressed resource, including the quotes.
+    :type etag: str
+    :param encoding: 'br', 'gzip' or None if the resource is sent uncompressed.
+    :type encoding: str | None
+    :return: The ETag with the encoding, e.g. "abc-br", the same ETag without an encoding.
+    :rtype: str
     """
+    if encoding is None:
+        return etag
 
-    secret_name = "cloudCourseWork"
+    return f'{etag[:-1]}-{encoding}"'
 
-    session = boto3.session.Session()
-    client = session.client(
-        service_name='secretsmanager',
-        region_name=region_name
-    )
 
-    try:
-        get_secret_value_response = client.get_secret_value(
-            SecretId=secret_name
-        )
-    except ClientError as e:
-        raise e
+def _without_encoding(etag):
+    etag = etag.removeprefix('W/')
+
+    for encoding in ETAG_ENCODINGS:
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+
+    return etag
 
-    secrets = json.loads(get_secret_value_response['SecretString'])
 
-    os.environ['WEATHER_API_KEY'] = secrets['WEATHER_API_KEY']
-    os.environ['IMAGE_API_KEY'] = secrets['IMAGE_API_KEY']
+def match_etag(if_none_match, etag):
+    """
+    Checks an If-None-Match header against the current ETag of a resource. The ETag of any encoding of the resource
+    matches, see `etag_for_encoding`, as they all hold the same content.
+
+    :param if_none_match: The If-None-Match header, a comma separated list of ETags or "*".
+    :type if_none_match: str | None
+    :param etag: The current ETag of the resource, including the quotes.
+    :type etag: str
+    :return: The ETag of the client's copy if it is current and a 304 can be sent, else None.
+    :rtype: str | None
+    """
+    if not if_none_match:
+        return None
+
+    if if_none_match.strip() == '*':
+        return etag
+
+    # If-None-Match uses the weak comparison, so W/"x" matches "x"
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if _without_encoding(candidate) == _without_encoding(etag):
+            return candidate
 
+    return None
 
-def send_message_to_sqs(request, exception):
+
+def is_etag_match(if_none_match, etag):
+    """
+    Checks an If-None-Match header against the current ETag of a resource, see `match_etag`.
+
+    :param if_none_match: The If-None-Match header, a comma separated list of ETags or "*".
+    :type if_none_match: str | None
+    :param etag: The current ETag of the resource, including the quotes.
+    :type etag: str
+    :return: True if the client's copy is current and a 304 can be sent.
+    :rtype: bool
     """
-    Sends failed requests to failed request mgr
+    return match_etag(if_none_match, etag) is not None
 
-    :param request: The request sent to ecs.
-    :type request: Request
-    :param exception: The response made by ecs.
-    :type exception: HTTPException
 
-    :return: None
+def parse_byte_range(range_header, size):
     """
+    Parses a Range header for a single range of bytes, e.g. "bytes=0-499", "bytes=500-" or "bytes=-500".
 
-    sqs = boto3.client('sqs')
-    queue_url = os.environ.get('FAILED_REQUEST_SQS_QUEUE')
+    :param range_header: The Range header.
+    :type range_header: str | None
+    :param size: The size of the resource in bytes.
+    :type size: int
+    :return: (start, end) inclusive, or None if the whole resource should be sent, which is also the case for
+            multiple ranges or a malformed header, including one that ends before it starts.
+    :rtype: tuple | None
 
-    request_dict = {
-        'method': request.method,
-        'url': str(request.url),
-        'headers': dict(request.headers),
-    }
+    :raises HTTPException: With status code 416 if the range starts past the end of the resource.
+    """
+    if not range_header or not range_header.startswith('bytes=') or ',' in range_header:
+        return None
 
-    payload = json.dumps({
-        'status_code': exception.status_code,
-        'description': exception.detail,
-        'request': request_dict
-    })
+    start_str, _, end_str = range_header[len('bytes='):].strip().partition('-')
 
     try:
-        response = sqs.send_message(
-            QueueUrl=queue_url,
-            MessageBody=payload
-        )
-        print(response)
-    except Exception as ignore:
-        print('exception: ' + str(ignore))
-        pass
+        if not start_str:
+            # the last end_str bytes
+            start, end = max(0, size - int(end_str)), size - 1
+        else:
+            start, end = int(start_str), int(end_str) if end_str else size - 1
+
+            # an invalid range, which is ignored rather than unsatisfiable
+            if end_str and start > end:
+                return None
+    except ValueError:
+        return None
+
+    if start >= size:
+        raise HTTPException(status_code=416, detail='Range not satisfiable', headers={'Content-Range': f'bytes */{size}'})
+
+    return start, min(end, size - 1)
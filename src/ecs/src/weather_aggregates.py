@@ -0,0 +1,77 @@
+import numpy as np
+
+# Aggregations of the hourly weather that can be requested
+DAILY = 'daily'
+
+
+def daily_aggregates(hours):
+    """
+    Aggregates an hourly weather series per day: min, max and mean temperature, total precipitation and the most
+    common description. The series is converted to arrays once and every day is aggregated together, rather than
+    looping over the days.
+
+    :param hours: The hourly data from the weather api, each with `timestamp_local` (or `ts`), `temp`, `precip` and
+                  `weather.description`. Missing values are skipped.
+    :type hours: list
+    :return: One entry per day in date order, e.g. {'date': '2024-05-01', 'temp_min': 9.1, 'temp_max': 17.4,
+             'temp_mean': 13.2, 'precip_total': 1.25, 'description': 'Few clouds'}.
+    :rtype: list
+    """
+    if not hours:
+        return []
+
+    # days in the location's own time, from the unix timestamp (UTC) if the local one is missing
+    dates = np.array([_date(hour) for hour in hours])
+    temps = np.array([hour.get('temp') for hour in hours], dtype=float)
+    precips = np.array([hour.get('precip') for hour in hours], dtype=float)
+    descriptions = np.array([(hour.get('weather') or {}).get('description') or '' for hour in hours])
+
+    days, day_index = np.unique(dates, return_inverse=True)
+    day_count = len(days)
+
+    has_temp = ~np.isnan(temps)
+    temp_counts = np.bincount(day_index, weights=has_temp, minlength=day_count)
+    temp_sums = np.bincount(day_index, weights=np.where(has_temp, temps, 0.0), minlength=day_count)
+
+    # fmin and fmax ignore the missing (nan) hours, a day without any temperature stays nan
+    temp_mins = np.full(day_count, np.nan)
+    temp_maxs = np.full(day_count, np.nan)
+    np.fmin.at(temp_mins, day_index, temps)
+    np.fmax.at(temp_maxs, day_index, temps)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        temp_means = temp_sums / temp_counts
+
+    precip_totals = np.bincount(day_index, weights=np.nan_to_num(precips), minlength=day_count)
+
+    # count each description per day in a (days x descriptions) table, the most common one wins, ties go to the
+    # first alphabetically
+    description_values, description_index = np.unique(descriptions, return_inverse=True)
+    description_counts = np.bincount(
+        day_index * len(description_values) + description_index,
+        minlength=day_count * len(description_values)
+    ).reshape(day_count, len(description_values))
+    dominant_descriptions = description_values[description_counts.argmax(axis=1)]
+
+    return [
+        {
+            'date': str(days[day]),
+            'temp_min': _round(temp_mins[day], 1),
+            'temp_max': _round(temp_maxs[day], 1),
+            'temp_mean': _round(temp_means[day], 1),
+            'precip_total': _round(precip_totals[day], 2),
+            'description': str(dominant_descriptions[day]) or None,
+        }
+        for day in range(day_count)
+    ]
+
+
+def _date(hour):
+    if hour.get('timestamp_local'):
+        return hour['timestamp_local'][:10]
+
+    return str(np.datetime64(int(hour['ts']), 's').astype('datetime64[D]'))
+
+
+def _round(value, digits):
+    return None if np.isnan(value) else round(float(value), digits)
@@ -1,15 +1,53 @@
-import requests
+import logging
+import httpx
 import os
-from fastapi import Depends
+from typing import Literal, Optional
+from fastapi import Depends, HTTPException
 from fastapi.responses import JSONResponse
 from .auth_route_dependency import authenticate_request
 from .utils import convert_unix_to_datetime
+from .ttl_cache import TTLCache
+from .http_client import WEATHERBIT
+from .secrets_provider import SecretsProvider
+from .single_flight import SingleFlight
+from .circuit_breaker import CircuitOpenError
+from .weather_aggregates import daily_aggregates, DAILY
 
+# Historical hourly data never changes, so it is kept until evicted, forecasts are refreshed periodically upstream
+HISTORY_TTL = float(os.getenv('WEATHER_CACHE_HISTORY_TTL_SECONDS', 30 * 24 * 60 * 60))
+FORECAST_TTL = float(os.getenv('WEATHER_CACHE_FORECAST_TTL_SECONDS', 15 * 60))
 
-def get_weather(location, start_date, end_date, is_historical):
+weather_cache = TTLCache(int(os.getenv('WEATHER_CACHE_MAX_ENTRIES', 5000)), FORECAST_TTL)
+weather_flights = SingleFlight()
+
+
+def weather_cache_key(location, start_date_str, end_date_str, is_historical, aggregate=None):
+    """
+    Creates the cache key of a weather request, the dates are already bucketed to the hour by
+    `convert_unix_to_datetime` and the location is normalised so "  new   YORK" and "New York" share an entry.
+
+    :param location: The location of interest.
+    :type location: str
+    :param start_date_str: The start of the date range, formatted for the weather api.
+    :type start_date_str: str
+    :param end_date_str: The end of the date range, formatted for the weather api.
+    :type end_date_str: str
+    :param is_historical: Is the date range in the past (True).
+    :type is_historical: bool
+    :param aggregate: None for the middle hour, DAILY for per-day aggregates.
+    :type aggregate: str | None
+    :return: The cache key.
+    :rtype: tuple
+    """
+    return ' '.join(location.lower().split()), start_date_str, end_date_str, is_historical, aggregate
+
+
+async def get_weather(http_client, location, start_date, end_date, is_historical, aggregate=None):
     """
     Calls the weather api.
 
+    :param http_client: The shared http client.
+    :type http_client: HttpClient
     :param location: The location of interest.
     :type location: str
     :param start_date: The start of the date range.
@@ -18,33 +56,128 @@ def get_weather(location, start_date, end_date, is_historical):
     :type end_date: int
     :param is_historical: Is the date range in the past (True).
     :type is_historical: bool
-    :return: A JSONResponse containing the temperature and weather description for the middle of the date range.
-            204 will be returned if there is no content, else 200.
+    :param aggregate: None for the middle hour of the date range, DAILY for the aggregates of each day.
+    :type aggregate: str | None
+    :return: A JSONResponse containing the temperature and weather description for the middle of the date range,
+            or {"days": [...]} with each day's min/max/mean temperature, total precipitation and most common
+            description when aggregated daily. 204 will be returned if there is no content, else 200.
     :rtype: JSONResponse
 
     :raises HTTPException: With status code 500 in an internal error occurred.
+    :raises HTTPException: With status code 502 if the weather api fails and there is no cached weather to fall back to.
+    """
+    content, status_code = await get_weather_content(
+        http_client, location, start_date, end_date, is_historical, aggregate
+    )
+
+    return JSONResponse(content=content, status_code=status_code)
+
+
+async def get_weather_content(http_client, location, start_date, end_date, is_historical, aggregate=None):
     """
+    Gets the weather from the cache or the weather api.
 
-    response = None
+    :param http_client: The shared http client.
+    :type http_client: HttpClient
+    :param location: The location of interest.
+    :type location: str
+    :param start_date: The start of the date range.
+    :type start_date: int
+    :param end_date: The end of the date range.
+    :type end_date: int
+    :param is_historical: Is the date range in the past (True).
+    :type is_historical: bool
+    :param aggregate: None for the middle hour of the date range, DAILY for the aggregates of each day.
+    :type aggregate: str | None
+    :return: The content and status code: the temperature and weather description for the middle of the date
+            range, or {"days": [...]} with each day's min/max/mean temperature, total precipitation and most common
+            description when aggregated daily. The status code is 204 if there is no content, else 200.
+    :rtype: tuple
+
+    :raises HTTPException: With status code 500 in an internal error occurred.
+    :raises HTTPException: With status code 502 if the weather api fails and there is no cached weather to fall back to.
+    """
 
     start_date_str = convert_unix_to_datetime(start_date)
     end_date_str = convert_unix_to_datetime(end_date)
 
+    cache_key = weather_cache_key(location, start_date_str, end_date_str, is_historical, aggregate)
+    content = weather_cache.get(cache_key)
+
+    if content is not None:
+        return content, 200
+
+    # concurrent requests for the same weather share one call to the weather api
+    return await weather_flights.do(
+        cache_key,
+        lambda: fetch_weather(http_client, location, start_date_str, end_date_str, is_historical, aggregate, cache_key)
+    )
+
+
+async def fetch_weather(http_client, location, start_date_str, end_date_str, is_historical, aggregate, cache_key):
+    """
+    Calls the weather api and caches the weather, falling back to the last known weather if the api fails.
+
+    :param http_client: The shared http client.
+    :type http_client: HttpClient
+    :param location: The location of interest.
+    :type location: str
+    :param start_date_str: The start of the date range, formatted for the weather api.
+    :type start_date_str: str
+    :param end_date_str: The end of the date range, formatted for the weather api.
+    :type end_date_str: str
+    :param is_historical: Is the date range in the past (True).
+    :type is_historical: bool
+    :param aggregate: None for the middle hour of the date range, DAILY for the aggregates of each day.
+    :type aggregate: str | None
+    :param cache_key: The key of the weather in the cache, from `weather_cache_key`.
+    :type cache_key: tuple
+    :return: The content and status code of the response, 204 if there is no content, else 200.
+    :rtype: tuple
+
+    :raises HTTPException: With status code 502 if the weather api fails and there is no cached weather to fall back to.
+    """
     if is_historical:
         base_url = 'https://api.weatherbit.io/v2.0/history/hourly'
     else:
         base_url = 'https://api.weatherbit.io/v2.0/forecast/hourly'
 
     params = {
-        'key': os.getenv('WEATHER_API_KEY'),
+        'key': await SecretsProvider().aget('WEATHER_API_KEY'),
         'city': location,
         'start_date': start_date_str,
         'end_date': end_date_str
     }
 
-    weather_response = requests.get(base_url, params=params)
+    try:
+        weather_response = await http_client.get(WEATHERBIT, base_url, params=params)
+        is_upstream_error = weather_response.status_code == 429 or weather_response.status_code >= 500
+    except CircuitOpenError:
+        is_upstream_error = True
+    except httpx.HTTPError as e:
+        logging.error('calling weather api: ' + str(e))
+        is_upstream_error = True
+
+    if is_upstream_error:
+        # serve the last known weather rather than failing
+        content = weather_cache.get_stale(cache_key)
+
+        if content is None:
+            raise HTTPException(status_code=502, detail='Weather service unavailable')
+
+        return content, 200
+
     weather_data = weather_response.json()
 
+    if weather_data.get('data') and aggregate == DAILY:
+        content = {
+            'days': daily_aggregates(weather_data['data'])
+        }
+
+        weather_cache.set(cache_key, content, ttl=HISTORY_TTL if is_historical else FORECAST_TTL)
+
+        return content, 200
+
     if 'data' in weather_data:
         half_way = len(weather_data['data']) // 2
         data = weather_data['data'][half_way]
@@ -54,25 +187,27 @@ def get_weather(location, start_date, end_date, is_historical):
             'description': data['weather']['description']
         }
 
-        response = JSONResponse(content=content, status_code=200)
-    else:
-        content = {
-            'error': 'No weather data available for the given date and location.'
-                     'Please note requests cannot be more than 14 days ahead,'
-                     'and the location can only be defined with alphabetic or white space chars.'
-        }
+        weather_cache.set(cache_key, content, ttl=HISTORY_TTL if is_historical else FORECAST_TTL)
+
+        return content, 200
 
-        response = JSONResponse(content=content, status_code=204)
+    content = {
+        'error': 'No weather data available for the given date and location.'
+                 'Please note requests cannot be more than 14 days ahead,'
+                 'and the location can only be defined with alphabetic or white space chars.'
+    }
 
-    return response
+    return content, 204
 
 
-def weather_mgr(app, lambda_client):
+def weather_mgr(app, lambda_client, http_client):
     """
     Method that defines all weather mgr methods.
     """
     @app.get('/weather-forecast')
-    async def get_weather_forcast(location: str, start_date: int, end_date: int, user_id=Depends(authenticate_request)):
+    async def get_weather_forcast(location: str, start_date: int, end_date: int,
+                                  aggregate: Optional[Literal['daily']] = None,
+                                  user_id=Depends(authenticate_request)):
         """
         Get gets the weather forcast (future weather data).
 
@@ -82,14 +217,19 @@ def weather_mgr(app, lambda_client):
         :type start_date: int
         :param end_date: The end of the date range.
         :type end_date: int
-        :return: A JSONResponse containing the temperature and weather description for the middle of the date range.
-                204 will be returned if there is no content, else 200.
+        :param aggregate: (Optional) "daily" for each day's min/max/mean temperature, total precipitation and most
+                          common description, so a multi-day trip needs one call.
+        :type aggregate: str
+        :return: A JSONResponse containing the temperature and weather description for the middle of the date range,
+                or {"days": [...]} when aggregated daily. 204 will be returned if there is no content, else 200.
         :rtype: JSONResponse
         """
-        return get_weather(location, start_date, end_date, False)
+        return await get_weather(http_client, location, start_date, end_date, False, aggregate)
 
     @app.get('/weather-history')
-    async def get_weather_history(location: str, start_date: int, end_date: int, user_id=Depends(authenticate_request)):
+    async def get_weather_history(location: str, start_date: int, end_date: int,
+                                  aggregate: Optional[Literal['daily']] = None,
+                                  user_id=Depends(authenticate_request)):
         """
         Get gets the weather history (past weather data).
 
@@ -99,8 +239,11 @@ def weather_mgr(app, lambda_client):
         :type start_date: int
         :param end_date: The end of the date range.
         :type end_date: int
-        :return: A JSONResponse containing the temperature and weather description for the middle of the date range.
-                204 will be returned if there is no content, else 200.
+        :param aggregate: (Optional) "daily" for each day's min/max/mean temperature, total precipitation and most
+                          common description, so a multi-day trip needs one call.
+        :type aggregate: str
+        :return: A JSONResponse containing the temperature and weather description for the middle of the date range,
+                or {"days": [...]} when aggregated daily. 204 will be returned if there is no content, else 200.
         :rtype: JSONResponse
         """
-        return get_weather(location, start_date, end_date, True)
+        return await get_weather(http_client, location, start_date, end_date, True, aggregate)
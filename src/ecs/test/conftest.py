@@ -1,6 +1,7 @@
 import pytest
 import boto3
 import src.main as main
+from src import rate_limiter
 
 
 @pytest.fixture(scope="function")
@@ -14,3 +15,12 @@ def aws_credentials():
 @pytest.fixture(autouse=True)
 def mock_env(monkeypatch):
     monkeypatch.setenv('TRIP_MGR_ARN', 'lambda_arn')
+    monkeypatch.setenv('WEATHER_API_KEY', 'test-weather-api-key')
+    monkeypatch.setenv('IMAGE_API_KEY', 'test-image-api-key')
+    monkeypatch.setenv('INTERNAL_API_TOKEN', 'test-internal-api-token')
+
+
+@pytest.fixture(autouse=True)
+def reset_rate_limiter(monkeypatch):
+    """Every test starts with full rate limit buckets."""
+    monkeypatch.setattr(rate_limiter, 'rate_limiter', rate_limiter.create_rate_limiter())
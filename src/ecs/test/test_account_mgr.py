@@ -0,0 +1,53 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src import account_mgr as account_mgr_module
+from src.account_mgr import account_mgr
+from src.auth_route_dependency import authenticate_request
+
+
+class FakeTransport:
+    """Stand-in for the lambda transport that knows the emails of even user_ids."""
+
+    def __init__(self):
+        self.payloads = []
+
+    async def invoke(self, target, payload):
+        self.payloads.append(payload)
+        user_ids = payload['body']['user_ids']
+
+        return {'statusCode': 200, 'body': {
+            'emails': [{'user_id': user_id, 'email': f'user{user_id}@example.com'}
+                       for user_id in user_ids if user_id % 2 == 0],
+            'not_found': [user_id for user_id in user_ids if user_id % 2],
+        }}
+
+
+def create_client():
+    transport = FakeTransport()
+    app = FastAPI()
+    account_mgr(app, transport)
+    app.dependency_overrides[authenticate_request] = lambda: 1
+    return TestClient(app), transport
+
+
+def test_emails_are_looked_up_in_one_invocation():
+    client, transport = create_client()
+
+    response = client.get('/emails', params={'user_ids': [2, 3, 4]})
+
+    assert response.status_code == 200
+    assert response.json() == {
+        'emails': [{'user_id': 2, 'email': 'user2@example.com'}, {'user_id': 4, 'email': 'user4@example.com'}],
+        'not_found': [3],
+    }
+    assert len(transport.payloads) == 1
+    assert transport.payloads[0]['action'] == 'get_emails'
+
+
+def test_emails_needs_between_one_and_the_maximum_user_ids():
+    client, transport = create_client()
+
+    assert client.get('/emails').status_code == 400
+    user_ids = list(range(account_mgr_module.MAX_EMAIL_USER_IDS + 1))
+    assert client.get('/emails', params={'user_ids': user_ids}).status_code == 400
+    assert transport.payloads == []
@@ -0,0 +1,126 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from fastapi import HTTPException
+from src.auth_token_mgr import AuthTokenMgr, SingletonParentClass
+
+
+@pytest.fixture
+def token_table(monkeypatch):
+    monkeypatch.setenv('TOKEN_DYNAMODB_TABLE', 'token_table')
+    SingletonParentClass._instances.pop(AuthTokenMgr, None)
+
+    with patch('boto3.resource') as mock_boto3_resource:
+        mock_table = MagicMock()
+        mock_boto3_resource.return_value.Table.return_value = mock_table
+        yield mock_table
+
+    SingletonParentClass._instances.pop(AuthTokenMgr, None)
+
+
+def test_valid_token_is_cached(token_table):
+    token_table.get_item.return_value = {'Item': {'user_id': 1, 'token': 'abc'}}
+
+    assert AuthTokenMgr().is_token_valid(1, 'abc')
+    assert AuthTokenMgr().is_token_valid(1, 'abc')
+
+    token_table.get_item.assert_called_once_with(Key={'user_id': 1})
+
+
+def test_mismatched_token_is_checked_against_the_table(token_table):
+    token_table.get_item.return_value = {'Item': {'user_id': 1, 'token': 'abc'}}
+    AuthTokenMgr().is_token_valid(1, 'abc')
+
+    # the user signed in again on another container
+    token_table.get_item.return_value = {'Item': {'user_id': 1, 'token': 'def'}}
+
+    assert AuthTokenMgr().is_token_valid(1, 'def')
+    assert not AuthTokenMgr().is_token_valid(1, 'abc')
+    assert token_table.get_item.call_count == 3
+
+
+def test_not_signed_in_is_cached(token_table):
+    token_table.get_item.return_value = {}
+
+    for _ in range(2):
+        with pytest.raises(HTTPException) as exception_info:
+            AuthTokenMgr().is_token_valid(1, 'abc')
+        assert exception_info.value.status_code == 405
+
+    token_table.get_item.assert_called_once()
+
+
+def test_create_and_remove_token_update_the_cache(token_table):
+    token = AuthTokenMgr().create_token(1)
+
+    assert AuthTokenMgr().is_token_valid(1, token)
+    token_table.get_item.assert_not_called()
+
+    AuthTokenMgr().remove_token(1)
+    token_table.get_item.return_value = {}
+
+    with pytest.raises(HTTPException):
+        AuthTokenMgr().is_token_valid(1, token)
+    token_table.get_item.assert_called_once()
+
+
+@pytest.fixture
+def signed_token_table(monkeypatch, token_table):
+    monkeypatch.setenv('AUTH_TOKEN_FORMAT', 'signed')
+    monkeypatch.setenv('TOKEN_SIGNING_KEY', 'test-signing-key')
+    monkeypatch.setenv('TOKEN_REVOCATION_SYNC_SECONDS', '3600')
+    token_table.scan.return_value = {'Items': []}
+    return token_table
+
+
+def test_signed_token_is_valid_without_reading_the_table(signed_token_table):
+    token = AuthTokenMgr().create_token(1)
+
+    assert AuthTokenMgr().is_token_valid(1, token)
+    assert not AuthTokenMgr().is_token_valid(2, token)
+    assert not AuthTokenMgr().is_token_valid(1, token[:-1] + ('0' if token[-1] != '0' else '1'))
+    assert not AuthTokenMgr().is_token_valid(1, 'not-a-token')
+
+    signed_token_table.get_item.assert_not_called()
+    signed_token_table.put_item.assert_not_called()
+
+
+def test_signed_token_with_non_ascii_characters_is_rejected(signed_token_table):
+    token = AuthTokenMgr().create_token(1)
+
+    # headers are decoded as latin-1, so any byte can reach the signature check
+    assert not AuthTokenMgr().is_token_valid(1, token[:-1] + '\xe9')
+    assert not AuthTokenMgr().is_token_valid(1, token.replace('.', '\xe9.', 1))
+
+
+def test_signed_token_expires(monkeypatch, signed_token_table):
+    monkeypatch.setenv('TOKEN_LIFETIME_SECONDS', '0')
+
+    token = AuthTokenMgr().create_token(1)
+
+    assert not AuthTokenMgr().is_token_valid(1, token)
+
+
+def test_sign_out_revokes_signed_token(signed_token_table):
+    token = AuthTokenMgr().create_token(1)
+
+    AuthTokenMgr().remove_token(1)
+
+    with pytest.raises(HTTPException) as exception_info:
+        AuthTokenMgr().is_token_valid(1, token)
+    assert exception_info.value.status_code == 405
+    assert signed_token_table.put_item.call_args.kwargs['Item']['user_id'] == 1
+
+    # signing in again straight away issues a token that is not revoked
+    assert AuthTokenMgr().is_token_valid(1, AuthTokenMgr().create_token(1))
+
+
+def test_revocations_from_other_containers_are_synced(signed_token_table):
+    token = AuthTokenMgr().create_token(1)
+
+    signed_token_table.scan.return_value = {
+        'Items': [{'user_id': 1, 'revoked_before': int(token.split('.')[1])}]
+    }
+    AuthTokenMgr().sync_revocations()
+
+    with pytest.raises(HTTPException):
+        AuthTokenMgr().is_token_valid(1, token)
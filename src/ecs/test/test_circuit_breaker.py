@@ -0,0 +1,91 @@
+import pytest
+from src import circuit_breaker as circuit_breaker_module
+from src.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker_module.time, 'monotonic', clock.monotonic)
+    return clock
+
+
+def call(circuit_breaker, is_failure):
+    is_probe = circuit_breaker.acquire()
+    circuit_breaker.record(is_failure, is_probe)
+
+
+def test_opens_at_failure_rate_once_there_are_enough_calls(clock):
+    circuit_breaker = CircuitBreaker(failure_rate=0.5, min_calls=4, window=10)
+
+    for _ in range(3):
+        call(circuit_breaker, True)
+    assert circuit_breaker.state == CLOSED
+
+    call(circuit_breaker, False)
+    assert circuit_breaker.state == OPEN
+
+    with pytest.raises(CircuitOpenError):
+        circuit_breaker.acquire()
+    assert circuit_breaker.stats() == {'state': OPEN, 'opened': 1, 'rejected': 1}
+
+
+def test_stays_closed_below_failure_rate(clock):
+    circuit_breaker = CircuitBreaker(failure_rate=0.5, min_calls=4, window=4)
+
+    for is_failure in [True, False, False, False, True, False, False, False]:
+        call(circuit_breaker, is_failure)
+
+    assert circuit_breaker.state == CLOSED
+
+
+def test_half_open_probe_closes_on_success(clock):
+    circuit_breaker = CircuitBreaker(failure_rate=0.5, min_calls=2, open_seconds=30)
+    call(circuit_breaker, True)
+    call(circuit_breaker, True)
+
+    clock.now += 30
+    assert circuit_breaker.acquire() is True
+    assert circuit_breaker.state == HALF_OPEN
+
+    # only one probe at a time
+    with pytest.raises(CircuitOpenError):
+        circuit_breaker.acquire()
+
+    circuit_breaker.record(False, True)
+    assert circuit_breaker.state == CLOSED
+    assert circuit_breaker.acquire() is False
+
+
+def test_half_open_probe_reopens_on_failure(clock):
+    circuit_breaker = CircuitBreaker(failure_rate=0.5, min_calls=2, open_seconds=30)
+    call(circuit_breaker, True)
+    call(circuit_breaker, True)
+
+    clock.now += 30
+    call(circuit_breaker, True)
+
+    assert circuit_breaker.state == OPEN
+    assert circuit_breaker.opened == 2
+
+    with pytest.raises(CircuitOpenError):
+        circuit_breaker.acquire()
+
+
+def test_cancelled_probe_frees_its_slot(clock):
+    circuit_breaker = CircuitBreaker(failure_rate=0.5, min_calls=2, open_seconds=30)
+    call(circuit_breaker, True)
+    call(circuit_breaker, True)
+
+    clock.now += 30
+    circuit_breaker.release(circuit_breaker.acquire())
+
+    assert circuit_breaker.acquire() is True
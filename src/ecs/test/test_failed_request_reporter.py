@@ -0,0 +1,71 @@
+import json
+from unittest.mock import MagicMock
+from fastapi import HTTPException
+from starlette.requests import Request
+from src.failed_request_reporter import FailedRequestReporter
+
+
+def make_request():
+    return Request({
+        'type': 'http',
+        'method': 'GET',
+        'scheme': 'http',
+        'server': ('test', 80),
+        'path': '/trips',
+        'query_string': b'trip_id=1',
+        'headers': [(b'authorization', b'secret-token'), (b'user-id', b'1')],
+    })
+
+
+def test_reports_are_sent_in_batches_and_drained_on_stop():
+    sqs_client = MagicMock()
+    sqs_client.send_message_batch.return_value = {}
+    reporter = FailedRequestReporter(sqs_client, 'queue_url', flush_interval=60)
+
+    for _ in range(25):
+        reporter.report(make_request(), HTTPException(status_code=404, detail='Trips not found'))
+    reporter.stop()
+
+    batch_sizes = [len(call.kwargs['Entries']) for call in sqs_client.send_message_batch.call_args_list]
+    assert batch_sizes == [10, 10, 5]
+    assert reporter.sent == 25
+
+    message = json.loads(sqs_client.send_message_batch.call_args.kwargs['Entries'][0]['MessageBody'])
+    assert message == {
+        'status_code': 404,
+        'description': 'Trips not found',
+        'request': {
+            'method': 'GET',
+            'url': 'http://test/trips?trip_id=1',
+            'headers': {'authorization': '[REDACTED]', 'user-id': '1'},
+        }
+    }
+
+
+def test_partial_batch_is_sent_after_flush_interval():
+    sqs_client = MagicMock()
+    sqs_client.send_message_batch.return_value = {}
+    reporter = FailedRequestReporter(sqs_client, 'queue_url', flush_interval=0.01)
+
+    reporter.report(make_request(), HTTPException(status_code=500, detail='error'))
+
+    for _ in range(100):
+        if reporter.sent:
+            break
+        reporter._thread.join(0.01)
+
+    assert reporter.sent == 1
+    reporter.stop()
+
+
+def test_reports_are_dropped_when_queue_is_full():
+    sqs_client = MagicMock()
+    reporter = FailedRequestReporter(sqs_client, 'queue_url', max_queue_size=2)
+    # stop the worker from consuming the queue
+    reporter._thread = MagicMock()
+
+    for _ in range(5):
+        reporter.report(make_request(), HTTPException(status_code=500, detail='error'))
+
+    assert reporter.queue.qsize() == 2
+    assert reporter.dropped == 3
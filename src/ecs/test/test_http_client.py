@@ -0,0 +1,69 @@
+import asyncio
+import httpx
+import pytest
+from src.http_client import HttpClient, HEDGE_MIN_SAMPLES, WEATHERBIT
+from src.circuit_breaker import CircuitOpenError
+
+
+class FakeUpstream:
+    """Responds after `latencies[i]` seconds to the i-th request, `latency` after the list runs out."""
+
+    def __init__(self, status_code=200, latency=0.0):
+        self.status_code = status_code
+        self.latency = latency
+        self.latencies = []
+        self.requests = 0
+
+    async def handle(self, request):
+        latency = self.latencies[self.requests] if self.requests < len(self.latencies) else self.latency
+        self.requests += 1
+        await asyncio.sleep(latency)
+        return httpx.Response(self.status_code, json={'request': self.requests})
+
+
+def test_open_circuit_rejects_without_calling_the_upstream():
+    upstream = FakeUpstream(status_code=503)
+    http_client = HttpClient(transport=httpx.MockTransport(upstream.handle),
+                             circuit_breaker_options={'min_calls': 3, 'open_seconds': 60})
+
+    async def run():
+        for _ in range(3):
+            await http_client.get(WEATHERBIT, 'https://upstream.test/')
+
+        with pytest.raises(CircuitOpenError):
+            await http_client.get(WEATHERBIT, 'https://upstream.test/')
+
+    asyncio.run(run())
+
+    assert upstream.requests == 3
+    assert http_client.stats()[WEATHERBIT]['circuit'] == {'state': 'open', 'opened': 1, 'rejected': 1}
+
+
+def test_slow_request_is_hedged():
+    upstream = FakeUpstream(latency=0.01)
+    http_client = HttpClient(transport=httpx.MockTransport(upstream.handle), hedge_percentile=0.9)
+
+    async def run():
+        for _ in range(HEDGE_MIN_SAMPLES):
+            await http_client.get(WEATHERBIT, 'https://upstream.test/')
+
+        # the next request stalls, the hedge sent after the p90 latency answers first
+        upstream.latencies = [0.01] * HEDGE_MIN_SAMPLES + [5.0]
+        return await asyncio.wait_for(http_client.get(WEATHERBIT, 'https://upstream.test/'), timeout=1)
+
+    response = asyncio.run(run())
+
+    assert response.json() == {'request': HEDGE_MIN_SAMPLES + 2}
+    assert http_client.stats()[WEATHERBIT]['hedges'] == 1
+    # the cancelled request is not counted as a failure
+    assert http_client.stats()[WEATHERBIT]['errors'] == 0
+
+
+def test_requests_are_not_hedged_without_enough_latencies():
+    upstream = FakeUpstream(latency=0.01)
+    http_client = HttpClient(transport=httpx.MockTransport(upstream.handle), hedge_percentile=0.5)
+
+    asyncio.run(http_client.get(WEATHERBIT, 'https://upstream.test/'))
+
+    assert upstream.requests == 1
+    assert http_client.stats()[WEATHERBIT]['hedges'] == 0
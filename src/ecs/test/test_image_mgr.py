@@ -0,0 +1,181 @@
+import asyncio
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src import image_mgr as image_mgr_module
+from src.image_mgr import image_mgr, open_cached_photo, read_file_chunks, photo_download_flights
+from src.disk_cache import DiskLRUCache
+from src.auth_route_dependency import authenticate_request
+from src.http_client import HttpClient, GOOGLE_PLACES
+
+
+def google_places(request):
+    if request.url.path.endswith('findplacefromtext/json'):
+        photo_reference = 'photo-' + request.url.params['input']
+        return httpx.Response(200, json={'candidates': [{'photos': [{'photo_reference': photo_reference}]}]})
+
+    content = b'jpeg of ' + request.url.params['photoreference'].encode()
+    return httpx.Response(200, content=content, headers={'Content-Type': 'image/jpeg'})
+
+
+@pytest.fixture
+def image_api(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_mgr_module, 'image_cache', DiskLRUCache(str(tmp_path), 1024))
+    image_mgr_module.photo_reference_cache.clear()
+
+    http_client = HttpClient(transport=httpx.MockTransport(google_places))
+
+    app = FastAPI()
+    image_mgr(app, None, http_client)
+    app.dependency_overrides[authenticate_request] = lambda: 1
+    return TestClient(app), http_client
+
+
+def test_repeated_images_are_served_from_the_cache(image_api):
+    client, http_client = image_api
+
+    first = client.get('/image', params={'location': 'London'})
+    second = client.get('/image', params={'location': 'London'})
+
+    assert first.content == second.content == b'jpeg of photo-London'
+    assert first.headers['ETag'] == second.headers['ETag']
+    assert first.headers['Cache-Control'].startswith('private, max-age=')
+    assert first.headers['Accept-Ranges'] == 'bytes'
+    assert http_client.stats()[GOOGLE_PLACES]['requests'] == 2
+
+
+def test_if_none_match_returns_not_modified(image_api):
+    client, http_client = image_api
+
+    etag = client.get('/image', params={'location': 'London'}).headers['ETag']
+
+    response = client.get('/image', params={'location': 'London'}, headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.content == b''
+    assert response.headers['ETag'] == etag
+
+    response = client.get('/image', params={'location': 'London'}, headers={'If-None-Match': '"stale"'})
+    assert response.status_code == 200
+    assert http_client.stats()[GOOGLE_PLACES]['requests'] == 2
+
+
+def test_images_are_streamed_in_chunks(image_api, monkeypatch):
+    _, http_client = image_api
+    monkeypatch.setattr(image_mgr_module, 'CHUNK_SIZE', 4)
+
+    async def stream():
+        cached_image, file = await open_cached_photo(http_client, 'photo-London', 'key')
+        return [chunk async for chunk in read_file_chunks(file, 0, cached_image.size - 1)]
+
+    chunks = asyncio.run(stream())
+
+    assert b''.join(chunks) == b'jpeg of photo-London'
+    assert max(len(chunk) for chunk in chunks) <= 4
+
+    cached_image = image_mgr_module.image_cache.get('photo-London')
+    assert cached_image.size == len(b'jpeg of photo-London')
+
+
+def test_concurrent_first_requests_share_one_download(tmp_path, monkeypatch):
+    monkeypatch.setattr(image_mgr_module, 'image_cache', DiskLRUCache(str(tmp_path), 1024))
+    image_mgr_module.photo_reference_cache.clear()
+    photo_requests = []
+
+    async def slow_google_places(request):
+        if 'photoreference' in request.url.params:
+            photo_requests.append(request)
+            # keeps the download in flight while the other requests arrive
+            await asyncio.sleep(0.05)
+        return google_places(request)
+
+    app = FastAPI()
+    image_mgr(app, None, HttpClient(transport=httpx.MockTransport(slow_google_places)))
+    app.dependency_overrides[authenticate_request] = lambda: 1
+
+    async def get_images():
+        async with httpx.AsyncClient(app=app, base_url='http://test') as client:
+            return await asyncio.gather(*[client.get('/image', params={'location': 'Paris'}) for _ in range(5)])
+
+    collapsed = photo_download_flights.stats()['collapsed']
+    responses = asyncio.run(get_images())
+
+    assert [response.content for response in responses] == [b'jpeg of photo-Paris'] * 5
+    assert len(photo_requests) == 1
+    assert photo_download_flights.stats()['collapsed'] == collapsed + 4
+
+
+@pytest.mark.parametrize('range_header, status_code, content, content_range', [
+    ('bytes=0-3', 206, b'jpeg', 'bytes 0-3/20'),
+    ('bytes=8-', 206, b'photo-London', 'bytes 8-19/20'),
+    ('bytes=-6', 206, b'London', 'bytes 14-19/20'),
+    ('bytes=0-3,5-6', 200, b'jpeg of photo-London', None),
+    ('bytes=8-100', 206, b'photo-London', 'bytes 8-19/20'),
+    ('bytes=5-3', 200, b'jpeg of photo-London', None),
+    ('bytes=25-3', 200, b'jpeg of photo-London', None),
+])
+def test_range_requests(image_api, range_header, status_code, content, content_range):
+    client, _ = image_api
+
+    # the first request downloads the photo, the second is served from disk
+    for _ in range(2):
+        response = client.get('/image', params={'location': 'London'}, headers={'Range': range_header})
+
+        assert response.status_code == status_code
+        assert response.content == content
+        assert response.headers.get('Content-Range') == content_range
+
+
+def test_unsatisfiable_range(image_api):
+    client, _ = image_api
+
+    for range_header in ('bytes=20-', 'bytes=25-30', 'bytes=-0'):
+        response = client.get('/image', params={'location': 'London'}, headers={'Range': range_header})
+
+        assert response.status_code == 416
+        assert response.headers['Content-Range'] == 'bytes */20'
+
+
+def test_disk_cache_evicts_the_least_recently_used(tmp_path):
+    cache = DiskLRUCache(str(tmp_path), 10)
+
+    cache.put('a', b'aaaa', 'image/jpeg')
+    cache.put('b', b'bbbb', 'image/jpeg')
+    cache.get('a')
+    cache.put('c', b'cccc', 'image/jpeg')
+
+    assert cache.get('b') is None
+    with cache.get('a').open() as file:
+        assert file.read() == b'aaaa'
+    with cache.get('c').open() as file:
+        assert file.read() == b'cccc'
+    assert cache.total_bytes == 8
+    assert len(list(tmp_path.iterdir())) == 2
+
+
+def test_concurrent_lookups_share_one_api_call(image_api):
+    _, http_client = image_api
+
+    async def run():
+        return await asyncio.gather(*[
+            image_mgr_module.get_photo_reference(http_client, location, 'key') for location in ['Paris', ' paris'] * 3
+        ])
+
+    assert asyncio.run(run()) == ['photo-Paris'] * 6
+    assert http_client.stats()[GOOGLE_PLACES]['requests'] == 1
+
+
+def test_expired_photo_reference_is_used_when_the_api_fails(image_api, monkeypatch):
+    client, http_client = image_api
+    image_mgr_module.photo_reference_cache.set('london', 'photo-London', ttl=-1)
+
+    async def failing_get(upstream, url, **kwargs):
+        raise httpx.ConnectError('unreachable')
+
+    monkeypatch.setattr(http_client, 'get', failing_get)
+
+    assert asyncio.run(image_mgr_module.get_photo_reference(http_client, 'London', 'key')) == 'photo-London'
+
+    with pytest.raises(Exception) as exception_info:
+        asyncio.run(image_mgr_module.get_photo_reference(http_client, 'Paris', 'key'))
+    assert exception_info.value.status_code == 502
@@ -0,0 +1,72 @@
+import asyncio
+import gzip
+import brotli
+import orjson
+import pytest
+from decimal import Decimal
+from starlette.requests import Request
+from src.json_response import fast_json_response, choose_encoding, COMPRESSION_MIN_BYTES
+
+TRIPS = [{'trip_id': trip_id, 'location': 'London', 'cost': Decimal('12.5')} for trip_id in range(100)]
+
+
+def request(accept_encoding=None):
+    headers = [(b'accept-encoding', accept_encoding.encode())] if accept_encoding else []
+    return Request({'type': 'http', 'method': 'GET', 'path': '/trips', 'headers': headers})
+
+
+@pytest.mark.parametrize('accept_encoding, encoding', [
+    (None, None),
+    ('gzip, deflate', 'gzip'),
+    ('gzip, deflate, br', 'br'),
+    ('br;q=0, gzip', 'gzip'),
+    ('*', 'br'),
+    ('identity', None),
+    ('gzip;q=abc', None),
+    ('br;q=abc, gzip', 'gzip'),
+])
+def test_choose_encoding(accept_encoding, encoding):
+    assert choose_encoding(accept_encoding) == encoding
+
+
+def test_large_responses_are_compressed():
+    response = asyncio.run(fast_json_response(request('gzip'), TRIPS))
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    assert orjson.loads(gzip.decompress(response.body))[0] == {'trip_id': 0, 'location': 'London', 'cost': 12.5}
+
+    response = asyncio.run(fast_json_response(request('gzip, br'), TRIPS))
+    assert response.headers['Content-Encoding'] == 'br'
+    assert len(orjson.loads(brotli.decompress(response.body))) == 100
+
+    response = asyncio.run(fast_json_response(request(), TRIPS))
+    assert 'Content-Encoding' not in response.headers
+    assert len(orjson.loads(response.body)) == 100
+
+
+def test_small_responses_are_not_compressed():
+    content = {'trip_id': 1}
+    assert len(orjson.dumps(content)) < COMPRESSION_MIN_BYTES
+
+    response = asyncio.run(fast_json_response(request('gzip, br'), content))
+
+    assert 'Content-Encoding' not in response.headers
+    assert orjson.loads(response.body) == content
+
+
+def test_large_bodies_are_compressed_off_the_event_loop(monkeypatch):
+    calls = []
+
+    async def run_in_threadpool(func, *args):
+        calls.append(func)
+        return func(*args)
+
+    monkeypatch.setattr('src.json_response.run_in_threadpool', run_in_threadpool)
+    monkeypatch.setattr('src.json_response.COMPRESSION_THREADPOOL_MIN_BYTES', 4096)
+
+    response = asyncio.run(fast_json_response(request('gzip'), TRIPS))
+    assert len(calls) == 1
+    assert len(orjson.loads(gzip.decompress(response.body))) == 100
+
+    asyncio.run(fast_json_response(request('gzip'), TRIPS[:30]))
+    assert len(calls) == 1
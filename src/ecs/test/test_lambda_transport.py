@@ -0,0 +1,167 @@
+import asyncio
+import io
+import json
+import threading
+import time
+import boto3
+import httpx
+import pytest
+from fastapi import FastAPI
+from decimal import Decimal
+from src.lambda_transport import LambdaTransport, InProcessTransport, load_lambda_handler, TRIP_MGR, \
+    use_thread_local_boto3_sessions, _BoundedTransport
+from src.trip_mgr import trip_mgr
+from src.trip_cache import TripCache
+from src.auth_route_dependency import authenticate_request
+
+LAMBDA_LATENCY = 0.05
+CONCURRENT_REQUESTS = 10
+
+
+class CountingLambdaClient:
+    """
+    Stand-in for the boto3 lambda client that counts the invocations in flight. Every invocation takes LAMBDA_LATENCY
+    seconds, or waits at `barrier` until as many invocations as it has parties are in flight at once.
+    """
+
+    def __init__(self, barrier=None):
+        self.barrier = barrier
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+
+    def invoke(self, FunctionName, InvocationType, Payload):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        try:
+            if self.barrier is not None:
+                self.barrier.wait()
+            else:
+                time.sleep(LAMBDA_LATENCY)
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+        trip_id = json.loads(Payload)['body']['trip_id']
+        return {
+            'ResponseMetadata': {'HTTPStatusCode': 200},
+            'Payload': io.BytesIO(json.dumps({
+                'statusCode': 200,
+                'body': {'trip_id': trip_id}
+            }).encode('utf-8'))
+        }
+
+
+async def send_concurrent_requests(lambda_client, max_concurrency):
+    """Sends CONCURRENT_REQUESTS concurrent requests through a gateway with the given concurrency cap."""
+    app = FastAPI()
+    trip_mgr(app, LambdaTransport(lambda_client, max_concurrency), TripCache())
+    app.dependency_overrides[authenticate_request] = lambda: 1
+
+    async with httpx.AsyncClient(app=app, base_url='http://test') as client:
+        responses = await asyncio.gather(*[
+            client.get('/trips', params={'trip_id': trip_id}) for trip_id in range(CONCURRENT_REQUESTS)
+        ])
+
+    assert [response.status_code for response in responses] == [200] * CONCURRENT_REQUESTS
+    assert [response.json()['trip_id'] for response in responses] == list(range(CONCURRENT_REQUESTS))
+
+
+def test_concurrent_requests_invoke_the_lambda_concurrently():
+    # each invocation is held until all of them are in flight, a transport that queued them would break the barrier
+    lambda_client = CountingLambdaClient(threading.Barrier(CONCURRENT_REQUESTS, timeout=5))
+
+    asyncio.run(send_concurrent_requests(lambda_client, max_concurrency=CONCURRENT_REQUESTS))
+
+    assert lambda_client.max_in_flight == CONCURRENT_REQUESTS
+
+
+def test_concurrency_cap_is_respected():
+    lambda_client = CountingLambdaClient()
+    transport = LambdaTransport(lambda_client, max_concurrency=3)
+
+    async def invoke_all():
+        payload = {'body': {'trip_id': 1}}
+        return await asyncio.gather(*[transport.invoke(TRIP_MGR, payload) for _ in range(9)])
+
+    results = asyncio.run(invoke_all())
+
+    assert len(results) == 9
+    assert lambda_client.max_in_flight == 3
+
+    # with a cap of 1 the requests are served one at a time
+    lambda_client = CountingLambdaClient()
+    asyncio.run(send_concurrent_requests(lambda_client, max_concurrency=1))
+    assert lambda_client.max_in_flight == 1
+
+
+def test_transport_without_invoke_sync_cannot_be_created():
+    class IncompleteTransport(_BoundedTransport):
+        pass
+
+    with pytest.raises(TypeError):
+        IncompleteTransport()
+
+
+def test_in_process_transport_calls_handler_without_serialising():
+    events = []
+
+    def trip_mgr_handler(event, context):
+        events.append(event)
+        return {
+            'statusCode': 200,
+            'body': {'trip_id': Decimal('17028438789525'), 'rating': Decimal('4.5'), 'approved': [Decimal('1')]}
+        }
+
+    transport = InProcessTransport({TRIP_MGR: trip_mgr_handler})
+    payload = {'httpMethod': 'GET', 'action': 'get_trip_info_by_id', 'body': {'trip_id': 17028438789525}}
+
+    response_payload = asyncio.run(transport.invoke(TRIP_MGR, payload))
+
+    assert events == [payload]
+    assert response_payload == {
+        'statusCode': 200,
+        'body': {'trip_id': 17028438789525, 'rating': 4.5, 'approved': [1]}
+    }
+    assert type(response_payload['body']['trip_id']) is int
+
+
+def test_in_process_handlers_get_a_boto3_session_per_thread(monkeypatch):
+    monkeypatch.setattr(boto3, 'DEFAULT_SESSION', None)
+    use_thread_local_boto3_sessions()
+    barrier = threading.Barrier(4, timeout=5)
+    sessions = {}
+
+    def trip_mgr_handler(event, context):
+        # every handler is in flight at once, each on its own worker thread
+        barrier.wait()
+        boto3.resource('dynamodb', region_name='eu-west-1')
+        sessions[threading.get_ident()] = boto3.DEFAULT_SESSION.session()
+        return {'statusCode': 200}
+
+    transport = InProcessTransport({TRIP_MGR: trip_mgr_handler}, max_concurrency=4)
+
+    async def invoke_all():
+        return await asyncio.gather(*[transport.invoke(TRIP_MGR, {'action': 'get_all_trips'}) for _ in range(4)])
+
+    asyncio.run(invoke_all())
+    transport.close()
+
+    assert len(sessions) == 4
+    assert len({id(session) for session in sessions.values()}) == 4
+
+
+def test_load_lambda_handler_imports_trip_mgr(monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'eu-west-1')
+    monkeypatch.setenv('TRIPS_DYNAMODB_TABLE', 'trip_table')
+    monkeypatch.setenv('USERS_DYNAMODB_TABLE', 'user_table')
+
+    handler = load_lambda_handler(TRIP_MGR)
+
+    assert handler.__module__ == '_in_process_trip_mgr.index'
+    assert handler({'httpMethod': 'GET', 'action': 'unknown'}, None) == {
+        'statusCode': 400,
+        'body': 'Bad Request'
+    }
@@ -0,0 +1,106 @@
+import pytest
+from urllib.parse import urlencode
+from unittest.mock import patch
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from src import rate_limiter as rate_limiter_module
+from src.rate_limiter import TokenBucketLimiter, COST_DEFAULT, COST_QUERY, COST_SCAN
+from src.trip_mgr import trip_mgr, trips_cost
+from src.trip_cache import TripCache
+from src.auth_route_dependency import authenticate_request
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    fake_clock = FakeClock()
+    with patch('src.rate_limiter.time.monotonic', fake_clock):
+        yield fake_clock
+
+
+def test_bucket_allows_a_burst_then_refills(clock):
+    limiter = TokenBucketLimiter(capacity=3, refill_per_second=1)
+
+    assert [limiter.acquire(1) for _ in range(3)] == [0, 0, 0]
+    assert limiter.acquire(1) == pytest.approx(1)
+
+    # other users have their own bucket
+    assert limiter.acquire(2) == 0
+
+    clock.now += 0.5
+    assert limiter.acquire(1) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert limiter.acquire(1) == 0
+
+    assert limiter.stats() == {'users': 2, 'allowed': 5, 'rejected': 2}
+
+
+def test_costly_requests_take_more_tokens(clock):
+    limiter = TokenBucketLimiter(capacity=10, refill_per_second=2)
+
+    assert limiter.acquire(1, 8) == 0
+    assert limiter.acquire(1, 8) == pytest.approx(3)
+    assert limiter.acquire(1, 2) == 0
+
+    # a cost above the capacity is capped, so it can be made once the bucket is full
+    clock.now += 5
+    assert limiter.acquire(1, 100) == 0
+
+
+def test_least_recently_seen_users_are_dropped(clock):
+    limiter = TokenBucketLimiter(capacity=1, refill_per_second=1, max_users=2)
+
+    limiter.acquire(1)
+    limiter.acquire(2)
+    limiter.acquire(1)
+    limiter.acquire(3)
+
+    assert limiter.stats()['users'] == 2
+    assert limiter.acquire(2) == 0
+
+
+def test_unfiltered_trips_are_limited_before_lookups(clock, monkeypatch):
+    monkeypatch.setattr(rate_limiter_module, 'rate_limiter', TokenBucketLimiter(capacity=COST_SCAN, refill_per_second=1))
+
+    class FakeTransport:
+        def __init__(self):
+            self.payloads = []
+
+        async def invoke(self, target, payload):
+            self.payloads.append(payload)
+            return {'statusCode': 200, 'body': [{'trip_id': 1}]}
+
+    transport = FakeTransport()
+    app = FastAPI()
+    trip_mgr(app, transport, TripCache())
+    app.dependency_overrides[authenticate_request] = lambda: 1
+    client = TestClient(app)
+
+    assert client.get('/trips').status_code == 200
+
+    response = client.get('/trips')
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == str(COST_SCAN)
+    assert len(transport.payloads) == 1
+
+    clock.now += 1
+    assert client.get('/trips', params={'trip_id': 1}).status_code == 200
+
+
+def test_paging_through_all_trips_costs_a_scan():
+    def cost(**query_params):
+        return trips_cost(Request({'type': 'http', 'query_string': urlencode(query_params).encode('utf-8')}))
+
+    assert cost() == COST_SCAN
+    assert cost(limit=1000) == COST_SCAN
+    assert cost(cursor='x') == COST_SCAN
+    assert cost(location='London', limit=10) == COST_QUERY
+    assert cost(admin_id=1, cursor='x') == COST_QUERY
+    assert cost(trip_id=1) == COST_DEFAULT
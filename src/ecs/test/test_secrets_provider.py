@@ -0,0 +1,101 @@
+import json
+from unittest.mock import MagicMock
+import pytest
+from fastapi import HTTPException
+from src.secrets_provider import SecretsProvider
+from src.singleton import SingletonParentClass
+
+
+def secret_response(values):
+    return {'SecretString': json.dumps(values)}
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    monkeypatch.delenv('WEATHER_API_KEY', raising=False)
+    monkeypatch.delenv('IMAGE_API_KEY', raising=False)
+    monkeypatch.setenv('SECRETS_RETRY_SECONDS', '60')
+    # long enough that the background refresh never runs during a test
+    monkeypatch.setenv('SECRETS_REFRESH_SECONDS', '3600')
+    SingletonParentClass._instances.pop(SecretsProvider, None)
+
+    provider = SecretsProvider()
+    provider._client = MagicMock()
+    provider._client.get_secret_value.return_value = secret_response({'WEATHER_API_KEY': 'weather'})
+
+    yield provider
+
+    SingletonParentClass._instances.pop(SecretsProvider, None)
+
+
+def test_secret_is_loaded_on_first_use_only(provider):
+    provider._client.get_secret_value.assert_not_called()
+
+    assert provider.get('WEATHER_API_KEY') == 'weather'
+    assert provider.get('WEATHER_API_KEY') == 'weather'
+
+    provider._client.get_secret_value.assert_called_once_with(SecretId='cloudCourseWork')
+    assert provider.loads == 1
+
+
+def test_environment_overrides_secret(provider, monkeypatch):
+    monkeypatch.setenv('WEATHER_API_KEY', 'local')
+
+    assert provider.get('WEATHER_API_KEY') == 'local'
+    provider._client.get_secret_value.assert_not_called()
+
+
+def test_missing_value(provider):
+    with pytest.raises(HTTPException) as e:
+        provider.get('IMAGE_API_KEY')
+
+    assert e.value.status_code == 500
+
+
+def test_first_load_failure_is_not_retried_until_retry_interval(provider):
+    provider._client.get_secret_value.side_effect = Exception('unavailable')
+
+    for _ in range(3):
+        with pytest.raises(HTTPException) as e:
+            provider.get('WEATHER_API_KEY')
+        assert e.value.status_code == 503
+
+    assert provider._client.get_secret_value.call_count == 1
+    assert provider.failures == 1
+
+
+def test_first_load_is_retried_after_retry_interval(provider):
+    provider._client.get_secret_value.side_effect = [Exception('unavailable'),
+                                                     secret_response({'WEATHER_API_KEY': 'weather'})]
+
+    with pytest.raises(HTTPException):
+        provider.get('WEATHER_API_KEY')
+
+    provider.retry_interval = 0
+
+    assert provider.get('WEATHER_API_KEY') == 'weather'
+
+
+def test_failed_refresh_keeps_last_good_values(provider, monkeypatch):
+    assert provider.get('WEATHER_API_KEY') == 'weather'
+
+    provider._client.get_secret_value.side_effect = Exception('unavailable')
+    monkeypatch.setattr('src.secrets_provider.time.sleep', MagicMock(side_effect=[None, StopIteration]))
+
+    with pytest.raises(StopIteration):
+        provider._refresh_forever()
+
+    assert provider.get('WEATHER_API_KEY') == 'weather'
+    assert provider.failures == 1
+
+
+def test_refresh_picks_up_rotated_values(provider, monkeypatch):
+    assert provider.get('WEATHER_API_KEY') == 'weather'
+
+    provider._client.get_secret_value.return_value = secret_response({'WEATHER_API_KEY': 'rotated'})
+    monkeypatch.setattr('src.secrets_provider.time.sleep', MagicMock(side_effect=[None, StopIteration]))
+
+    with pytest.raises(StopIteration):
+        provider._refresh_forever()
+
+    assert provider.get('WEATHER_API_KEY') == 'rotated'
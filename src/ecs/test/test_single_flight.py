@@ -0,0 +1,98 @@
+import asyncio
+import pytest
+from src.single_flight import SingleFlight
+
+
+class SlowCall:
+    """Counts calls, each one waits until `release` is set."""
+
+    def __init__(self, result='result'):
+        self.result = result
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.release.wait()
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+def test_concurrent_calls_are_collapsed():
+    async def run():
+        flights = SingleFlight()
+        call = SlowCall()
+
+        waiters = [asyncio.ensure_future(flights.do('key', call)) for _ in range(5)]
+        await asyncio.sleep(0)
+        assert flights.stats() == {'in_flight': 1, 'calls': 1, 'collapsed': 4}
+
+        call.release.set()
+        assert await asyncio.gather(*waiters) == ['result'] * 5
+        assert call.calls == 1
+        assert flights.stats()['in_flight'] == 0
+
+    asyncio.run(run())
+
+
+def test_different_keys_are_not_collapsed():
+    async def run():
+        flights = SingleFlight()
+        call = SlowCall()
+        call.release.set()
+
+        await asyncio.gather(flights.do('a', call), flights.do('b', call))
+
+        assert call.calls == 2
+        assert flights.stats()['collapsed'] == 0
+
+    asyncio.run(run())
+
+
+def test_finished_calls_are_not_reused():
+    async def run():
+        flights = SingleFlight()
+        call = SlowCall()
+        call.release.set()
+
+        await flights.do('key', call)
+        await flights.do('key', call)
+
+        assert call.calls == 2
+
+    asyncio.run(run())
+
+
+def test_exception_is_raised_to_every_caller():
+    async def run():
+        flights = SingleFlight()
+        call = SlowCall(ValueError('upstream failed'))
+
+        waiters = [asyncio.ensure_future(flights.do('key', call)) for _ in range(3)]
+        call.release.set()
+
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        assert call.calls == 1
+
+    asyncio.run(run())
+
+
+def test_cancelled_caller_does_not_cancel_the_call():
+    async def run():
+        flights = SingleFlight()
+        call = SlowCall()
+
+        first = asyncio.ensure_future(flights.do('key', call))
+        second = asyncio.ensure_future(flights.do('key', call))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        call.release.set()
+
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert await second == 'result'
+
+    asyncio.run(run())
@@ -0,0 +1,198 @@
+import asyncio
+import time
+from src.trip_cache import TripCache, BY_TRIP_ID, BY_LOCATION, BY_ADMIN_ID
+
+
+def trip(trip_id, location='London', admin_id=1):
+    return {'trip_id': trip_id, 'location': location, 'admin_id': admin_id}
+
+
+class FakeTripMgr:
+    """Counts fetches and returns whatever response is currently configured for a key."""
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = 0
+
+    def fetcher(self, key):
+        async def fetch():
+            self.calls += 1
+            return self.responses[key]
+        return fetch
+
+
+def test_hit_after_miss():
+    async def run():
+        cache = TripCache()
+        trip_mgr = FakeTripMgr({(BY_TRIP_ID, 1): {'statusCode': 200, 'body': trip(1)}})
+
+        first = await cache.get_or_fetch((BY_TRIP_ID, 1), trip_mgr.fetcher((BY_TRIP_ID, 1)))
+        second = await cache.get_or_fetch((BY_TRIP_ID, 1), trip_mgr.fetcher((BY_TRIP_ID, 1)))
+
+        assert first == second == {'statusCode': 200, 'body': trip(1)}
+        assert trip_mgr.calls == 1
+        assert cache.stats()['hits'] == 1
+        assert cache.stats()['misses'] == 1
+
+    asyncio.run(run())
+
+
+def test_not_found_is_cached_briefly():
+    async def run():
+        cache = TripCache(negative_ttl=0.05)
+        key = (BY_LOCATION, 'Atlantis')
+        trip_mgr = FakeTripMgr({key: {'statusCode': 404}})
+
+        await cache.get_or_fetch(key, trip_mgr.fetcher(key))
+        await cache.get_or_fetch(key, trip_mgr.fetcher(key))
+        assert trip_mgr.calls == 1
+        assert cache.stats()['negative_hits'] == 1
+
+        time.sleep(0.06)
+        await cache.get_or_fetch(key, trip_mgr.fetcher(key))
+        assert trip_mgr.calls == 2
+
+    asyncio.run(run())
+
+
+def test_stale_entry_is_served_while_refreshed():
+    async def run():
+        cache = TripCache(ttl=0.05, stale_ttl=10)
+        key = (BY_TRIP_ID, 1)
+        trip_mgr = FakeTripMgr({key: {'statusCode': 200, 'body': trip(1, location='London')}})
+
+        await cache.get_or_fetch(key, trip_mgr.fetcher(key))
+        time.sleep(0.06)
+
+        trip_mgr.responses[key] = {'statusCode': 200, 'body': trip(1, location='Paris')}
+        stale = await cache.get_or_fetch(key, trip_mgr.fetcher(key))
+        assert stale['body']['location'] == 'London'
+
+        # let the background refresh run
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+        fresh = await cache.get_or_fetch(key, trip_mgr.fetcher(key))
+        assert fresh['body']['location'] == 'Paris'
+        assert trip_mgr.calls == 2
+        assert cache.stats()['stale_hits'] == 1
+
+    asyncio.run(run())
+
+
+def test_invalidate_trip_only_removes_lookups_containing_it():
+    async def run():
+        cache = TripCache()
+        trip_mgr = FakeTripMgr({
+            (BY_TRIP_ID, 1): {'statusCode': 200, 'body': trip(1)},
+            (BY_TRIP_ID, 2): {'statusCode': 200, 'body': trip(2)},
+            (BY_LOCATION, 'London'): {'statusCode': 200, 'body': [trip(1), trip(2)]},
+            (BY_ADMIN_ID, 5): {'statusCode': 200, 'body': [trip(3, admin_id=5)]},
+        })
+
+        for key in trip_mgr.responses:
+            await cache.get_or_fetch(key, trip_mgr.fetcher(key))
+
+        cache.invalidate_trip(1)
+
+        for key in trip_mgr.responses:
+            await cache.get_or_fetch(key, trip_mgr.fetcher(key))
+
+        # trip 1 and the London lookup are fetched again, trip 2 and admin 5 are served from the cache
+        assert trip_mgr.calls == 6
+        assert cache.stats()['hits'] == 2
+
+    asyncio.run(run())
+
+
+def test_invalidate_new_trip_removes_negative_location_entry():
+    async def run():
+        cache = TripCache()
+        key = (BY_LOCATION, 'New York')
+        trip_mgr = FakeTripMgr({key: {'statusCode': 404}})
+
+        await cache.get_or_fetch(key, trip_mgr.fetcher(key))
+        cache.invalidate_new_trip('new yORK', 1)
+
+        trip_mgr.responses[key] = {'statusCode': 200, 'body': [trip(9, location='New York')]}
+        response = await cache.get_or_fetch(key, trip_mgr.fetcher(key))
+
+        assert response['statusCode'] == 200
+
+    asyncio.run(run())
+
+
+def test_fetch_overlapping_an_invalidation_is_not_cached():
+    async def run():
+        cache = TripCache()
+        key = (BY_TRIP_ID, 1)
+        trip_mgr = FakeTripMgr({key: {'statusCode': 200, 'body': trip(1)}})
+
+        async def fetch_then_mutated():
+            response = await trip_mgr.fetcher(key)()
+            cache.invalidate_trip(1)
+            return response
+
+        await cache.get_or_fetch(key, fetch_then_mutated)
+        await cache.get_or_fetch(key, trip_mgr.fetcher(key))
+
+        assert trip_mgr.calls == 2
+
+    asyncio.run(run())
+
+
+def test_concurrent_misses_share_one_fetch():
+    async def run():
+        cache = TripCache()
+        trip_mgr = FakeTripMgr({(BY_LOCATION, 'London'): {'statusCode': 200, 'body': [trip(1)]}})
+
+        responses = await asyncio.gather(*[
+            cache.get_or_fetch((BY_LOCATION, 'London'), trip_mgr.fetcher((BY_LOCATION, 'London'))) for _ in range(5)
+        ])
+
+        assert all(response == {'statusCode': 200, 'body': [trip(1)]} for response in responses)
+        assert trip_mgr.calls == 1
+        assert cache.stats()['misses'] == 5
+        assert cache.stats()['collapsed'] == 4
+
+    asyncio.run(run())
+
+
+def test_fetch_in_flight_is_not_shared_after_invalidation():
+    async def run():
+        cache = TripCache()
+        trip_mgr = FakeTripMgr({(BY_TRIP_ID, 1): {'statusCode': 200, 'body': trip(1)}})
+        fetch = trip_mgr.fetcher((BY_TRIP_ID, 1))
+
+        before = asyncio.ensure_future(cache.get_or_fetch((BY_TRIP_ID, 1), fetch))
+        await asyncio.sleep(0)
+        cache.invalidate_trip(1)
+        after = asyncio.ensure_future(cache.get_or_fetch((BY_TRIP_ID, 1), fetch))
+
+        await asyncio.gather(before, after)
+
+        assert trip_mgr.calls == 2
+        assert cache.stats()['collapsed'] == 0
+
+    asyncio.run(run())
+
+
+def test_new_trip_invalidates_projected_lookups():
+    cache = TripCache()
+    key = (BY_LOCATION, 'London')
+    projected_key = key + (('title', 'trip_id', 'version'),)
+    fetches = []
+
+    async def fetch():
+        fetches.append(1)
+        return {'statusCode': 200, 'body': [{'trip_id': 1}]}
+
+    async def run():
+        await cache.get_or_fetch(projected_key, fetch)
+        await cache.get_or_fetch(projected_key, fetch)
+        cache.invalidate_new_trip('london', 2)
+        await cache.get_or_fetch(projected_key, fetch)
+
+    asyncio.run(run())
+
+    assert len(fetches) == 2
@@ -0,0 +1,129 @@
+import asyncio
+import time
+import httpx
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from src import trip_enrichment as trip_enrichment_module
+from src.trip_enrichment import trip_enrichment
+from src.trip_cache import TripCache
+from src.weather_mgr import weather_cache
+from src.image_mgr import photo_reference_cache, photo_etag
+from src.lambda_transport import TRIP_MGR
+from src.auth_route_dependency import authenticate_request
+from src.http_client import HttpClient
+
+ADMIN_ID = 19823091
+TRIP_ID = 17028438789525
+START_DATE = 946684800  # 1st jan 2000
+DELAY = 0.3
+
+
+class FakeTransport:
+    """Stand-in for the lambda transport, the account mgr responds after `email_delay` seconds."""
+
+    def __init__(self):
+        self.email_delay = DELAY
+
+    async def invoke(self, target, payload):
+        if target == TRIP_MGR:
+            if payload['body']['trip_id'] != TRIP_ID:
+                return {'statusCode': 404}
+
+            return {'statusCode': 200, 'body': {
+                'trip_id': TRIP_ID, 'admin_id': ADMIN_ID, 'location': 'London',
+                'start_date': START_DATE, 'end_date': START_DATE + 86400,
+            }}
+
+        await asyncio.sleep(self.email_delay)
+        return {'statusCode': 200, 'body': {'email': 'admin@example.com'}}
+
+
+class FakeApis:
+    """Stand-in for weatherbit and google places, each responding after DELAY seconds."""
+
+    def __init__(self):
+        self.weather_status_code = 200
+
+    async def handle(self, request):
+        await asyncio.sleep(DELAY)
+
+        if request.url.host == 'api.weatherbit.io':
+            return httpx.Response(self.weather_status_code, json={
+                'data': [{'ts': START_DATE + hour * 3600, 'temp': 10 + hour, 'precip': 0.5,
+                          'weather': {'description': 'Sunny'}} for hour in range(24)]
+            })
+
+        return httpx.Response(200, json={'candidates': [{'photos': [{'photo_reference': 'photo-London'}]}]})
+
+
+@pytest.fixture
+def full_trip_api():
+    weather_cache.clear()
+    photo_reference_cache.clear()
+
+    transport = FakeTransport()
+    apis = FakeApis()
+
+    app = FastAPI()
+    trip_enrichment(app, transport, HttpClient(transport=httpx.MockTransport(apis.handle)), TripCache())
+    app.dependency_overrides[authenticate_request] = lambda: 1
+    return TestClient(app), transport, apis
+
+
+def test_dependencies_are_fetched_concurrently(full_trip_api):
+    client, transport, apis = full_trip_api
+
+    start = time.perf_counter()
+    response = client.get(f'/trips/{TRIP_ID}/full')
+    elapsed = time.perf_counter() - start
+
+    assert response.status_code == 200
+    assert response.json() == {
+        'trip': {'trip_id': TRIP_ID, 'admin_id': ADMIN_ID, 'location': 'London',
+                 'start_date': START_DATE, 'end_date': START_DATE + 86400},
+        'weather': {'days': [{'date': '2000-01-01', 'temp_min': 10.0, 'temp_max': 33.0, 'temp_mean': 21.5,
+                              'precip_total': 12.0, 'description': 'Sunny'}]},
+        'image': {'url': '/image?location=London', 'etag': photo_etag('photo-London')},
+        'admin_email': 'admin@example.com',
+        'errors': {},
+    }
+    # the slowest dependency, not the sum of the three
+    assert elapsed < 2 * DELAY
+
+
+def test_slow_dependency_is_left_out(full_trip_api, monkeypatch):
+    client, transport, apis = full_trip_api
+    monkeypatch.setattr(trip_enrichment_module, 'EMAIL_TIMEOUT', DELAY / 3)
+    transport.email_delay = DELAY * 10
+
+    start = time.perf_counter()
+    response = client.get(f'/trips/{TRIP_ID}/full')
+    elapsed = time.perf_counter() - start
+
+    assert response.status_code == 200
+    assert response.json()['admin_email'] is None
+    assert response.json()['errors'] == {'admin_email': 'Timed out'}
+    assert response.json()['weather'] is not None
+    assert elapsed < 2 * DELAY
+
+
+def test_failed_dependency_is_left_out(full_trip_api):
+    client, transport, apis = full_trip_api
+    apis.weather_status_code = 503
+
+    response = client.get(f'/trips/{TRIP_ID}/full')
+
+    assert response.status_code == 200
+    assert response.json()['weather'] is None
+    assert list(response.json()['errors']) == ['weather']
+    assert response.json()['image'] is not None
+    assert response.json()['admin_email'] == 'admin@example.com'
+
+
+def test_missing_trip(full_trip_api):
+    client, transport, apis = full_trip_api
+
+    response = client.get('/trips/1/full')
+
+    assert response.status_code == 404
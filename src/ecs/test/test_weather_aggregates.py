@@ -0,0 +1,48 @@
+from src.weather_aggregates import daily_aggregates
+
+
+def hour(timestamp_local, temp, precip, description):
+    return {'timestamp_local': timestamp_local, 'temp': temp, 'precip': precip,
+            'weather': {'description': description}}
+
+
+def test_hours_are_aggregated_per_day():
+    hours = [
+        hour('2024-05-01T22:00:00', 10.0, 0.5, 'Light rain'),
+        hour('2024-05-01T23:00:00', 8.0, 1.0, 'Light rain'),
+        hour('2024-05-02T00:00:00', 7.0, 0.0, 'Clear sky'),
+        hour('2024-05-02T01:00:00', 6.5, 0.0, 'Clear sky'),
+        hour('2024-05-02T02:00:00', 9.0, 0.25, 'Few clouds'),
+    ]
+
+    assert daily_aggregates(hours) == [
+        {'date': '2024-05-01', 'temp_min': 8.0, 'temp_max': 10.0, 'temp_mean': 9.0, 'precip_total': 1.5,
+         'description': 'Light rain'},
+        {'date': '2024-05-02', 'temp_min': 6.5, 'temp_max': 9.0, 'temp_mean': 7.5, 'precip_total': 0.25,
+         'description': 'Clear sky'},
+    ]
+
+
+def test_missing_values_are_skipped():
+    hours = [
+        hour('2024-05-01T00:00:00', None, None, None),
+        hour('2024-05-01T01:00:00', 12.0, None, 'Sunny'),
+        hour('2024-05-02T00:00:00', None, 2.0, 'Rain'),
+    ]
+
+    days = daily_aggregates(hours)
+
+    assert days[0]['temp_min'] == days[0]['temp_max'] == days[0]['temp_mean'] == 12.0
+    assert days[0]['precip_total'] == 0.0
+    assert days[1]['temp_mean'] is None
+    assert days[1]['precip_total'] == 2.0
+
+
+def test_unix_timestamp_is_used_without_a_local_one():
+    hours = [{'ts': 1714607999, 'temp': 1.0}, {'ts': 1714608000, 'temp': 2.0}]
+
+    assert [day['date'] for day in daily_aggregates(hours)] == ['2024-05-01', '2024-05-02']
+
+
+def test_no_hours():
+    assert daily_aggregates([]) == []
@@ -0,0 +1,130 @@
+import asyncio
+import json
+import httpx
+import pytest
+from unittest.mock import patch
+from fastapi import HTTPException
+from src.http_client import HttpClient, WEATHERBIT
+from src.weather_mgr import get_weather, weather_cache
+
+START_DATE = 946684800  # 1st jan 2000
+END_DATE = 946713600
+
+
+class FakeWeatherApi:
+    """Stand-in for weatherbit, responding with `temp` or `status_code`, or raising `error`."""
+
+    def __init__(self, temp, status_code=200):
+        self.temp = temp
+        self.status_code = status_code
+        self.error = None
+        self.requests = []
+        self.http_client = HttpClient(transport=httpx.MockTransport(self.handle))
+
+    def handle(self, request):
+        self.requests.append(request)
+
+        if self.error is not None:
+            raise self.error
+
+        return httpx.Response(self.status_code, json={
+            'data': [{'ts': START_DATE + hour * 3600, 'temp': self.temp, 'weather': {'description': 'Sunny'}}
+                     for hour in range(3)]
+        })
+
+    def get_weather(self, *args):
+        return asyncio.run(get_weather(self.http_client, *args))
+
+
+@pytest.fixture(autouse=True)
+def clear_weather_cache():
+    weather_cache.clear()
+
+
+def test_weather_is_cached_by_normalised_location():
+    weather_api = FakeWeatherApi(12)
+
+    first = weather_api.get_weather('new YORK', START_DATE, END_DATE, True)
+    second = weather_api.get_weather('  New   York ', START_DATE + 60, END_DATE + 60, True)
+
+    assert json.loads(first.body) == json.loads(second.body) == {'temp': 12, 'description': 'Sunny'}
+    assert len(weather_api.requests) == 1
+
+
+def test_history_and_forecast_are_cached_separately():
+    weather_api = FakeWeatherApi(12)
+
+    weather_api.get_weather('London', START_DATE, END_DATE, True)
+    weather_api.get_weather('London', START_DATE, END_DATE, False)
+
+    assert len(weather_api.requests) == 2
+
+
+@patch('src.weather_mgr.FORECAST_TTL', 0)
+def test_stale_weather_is_served_when_the_api_fails():
+    weather_api = FakeWeatherApi(12)
+    weather_api.get_weather('London', START_DATE, END_DATE, False)
+
+    weather_api.status_code = 503
+    response = weather_api.get_weather('London', START_DATE, END_DATE, False)
+    assert json.loads(response.body) == {'temp': 12, 'description': 'Sunny'}
+
+    weather_api.error = httpx.ReadTimeout('timed out')
+    response = weather_api.get_weather('London', START_DATE, END_DATE, False)
+    assert json.loads(response.body) == {'temp': 12, 'description': 'Sunny'}
+
+    assert len(weather_api.requests) == 3
+
+
+def test_api_failure_without_cached_weather():
+    weather_api = FakeWeatherApi(12)
+    weather_api.error = httpx.ConnectError('connection refused')
+
+    with pytest.raises(HTTPException) as exception_info:
+        weather_api.get_weather('London', START_DATE, END_DATE, False)
+
+    assert exception_info.value.status_code == 502
+
+
+def test_upstream_latency_is_recorded():
+    weather_api = FakeWeatherApi(12)
+    weather_api.get_weather('London', START_DATE, END_DATE, True)
+
+    weather_api.status_code = 503
+    with pytest.raises(HTTPException):
+        weather_api.get_weather('Paris', START_DATE, END_DATE, True)
+
+    stats = weather_api.http_client.stats()[WEATHERBIT]
+    assert stats['requests'] == 2
+    assert stats['errors'] == 1
+    assert stats['p50_ms'] is not None
+
+
+def test_concurrent_requests_share_one_api_call():
+    weather_api = FakeWeatherApi(12)
+
+    async def run():
+        return await asyncio.gather(*[
+            get_weather(weather_api.http_client, location, START_DATE, END_DATE, False)
+            for location in ['London', 'london', ' LONDON '] * 3
+        ])
+
+    responses = asyncio.run(run())
+
+    assert all(json.loads(response.body) == {'temp': 12, 'description': 'Sunny'} for response in responses)
+    assert len(weather_api.requests) == 1
+
+
+def test_daily_aggregates_are_cached_apart_from_the_middle_hour():
+    weather_api = FakeWeatherApi(12)
+
+    middle = weather_api.get_weather('London', START_DATE, END_DATE, False)
+    daily = weather_api.get_weather('London', START_DATE, END_DATE, False, 'daily')
+    weather_api.get_weather('London', START_DATE, END_DATE, False, 'daily')
+
+    assert json.loads(middle.body) == {'temp': 12, 'description': 'Sunny'}
+    assert json.loads(daily.body) == {'days': [{
+        'date': '2000-01-01', 'temp_min': 12.0, 'temp_max': 12.0, 'temp_mean': 12.0, 'precip_total': 0.0,
+        'description': 'Sunny'
+    }]}
+    assert len(weather_api.requests) == 2
@@ -0,0 +1,99 @@
+"""
+Measures the wall-clock time of scanning the whole trips table serially and with parallel segments, against a local
+moto table. moto answers in-process, so each scan call is delayed by --latency-ms to stand in for DynamoDB reading
+a page, and pages are capped at --page-size items to stand in for DynamoDB's 1 MB pages.
+
+moto's own work per call grows with the size of the table and runs under the GIL, so it does not parallelise, the
+cpu seconds column shows how much of the wall-clock time it accounts for.
+
+Run from src/tripMgr:
+    python -m benchmark.parallel_scan [--trips 2000] [--page-size 50] [--latency-ms 100] [--segments 1 2 4 8 16]
+"""
+import argparse
+import os
+import time
+import boto3
+from moto import mock_aws
+from src import parallel_scan as parallel_scan_module
+from src.parallel_scan import parallel_scan
+from src.utils import read_pages
+
+TABLE_NAME = 'benchmark_trips'
+
+
+class DelayedTable:
+    """Wraps a table so every scan call takes at least `latency` seconds longer."""
+
+    def __init__(self, table, latency):
+        self.table = table
+        self.latency = latency
+        self.name = table.name
+
+    def scan(self, **kwargs):
+        time.sleep(self.latency)
+        return self.table.scan(**kwargs)
+
+
+def create_trips_table(count):
+    table = boto3.resource('dynamodb').create_table(
+        TableName=TABLE_NAME,
+        KeySchema=[{'AttributeName': 'trip_id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'trip_id', 'AttributeType': 'N'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+
+    with table.batch_writer() as batch:
+        for trip_id in range(count):
+            batch.put_item(Item={
+                'trip_id': 17000000000000 + trip_id,
+                'admin_id': 100000000000 + trip_id % 500,
+                'location': 'London',
+                'title': f'Trip number {trip_id}',
+                'description': 'A week of walking, food and museums with a group of friends from the course.',
+                'awaiting_approval': [],
+                'approved': [],
+            })
+
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--trips', type=int, default=2000)
+    parser.add_argument('--page-size', type=int, default=50)
+    parser.add_argument('--latency-ms', type=float, default=100)
+    parser.add_argument('--segments', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    args = parser.parse_args()
+
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'eu-west-1')
+    latency = args.latency_ms / 1000
+
+    with mock_aws():
+        table = create_trips_table(args.trips)
+        parallel_scan_module.create_table = lambda table_name: DelayedTable(
+            boto3.session.Session().resource('dynamodb').Table(table_name), latency
+        )
+
+        print(f'{args.trips} trips, pages of {args.page_size}, {args.latency_ms} ms per call')
+        print(f'{"segments":>8} {"seconds":>8} {"cpu seconds":>12} {"speedup":>8}')
+
+        serial_seconds = None
+        for segments in args.segments:
+            start = time.perf_counter()
+            cpu_start = time.process_time()
+
+            if segments == 1:
+                items, _ = read_pages(DelayedTable(table, latency).scan, Limit=args.page_size)
+            else:
+                items, _ = parallel_scan(TABLE_NAME, segments, Limit=args.page_size)
+
+            seconds = time.perf_counter() - start
+            cpu_seconds = time.process_time() - cpu_start
+            serial_seconds = serial_seconds or seconds
+
+            assert len(items) == args.trips
+            print(f'{segments:>8} {seconds:>8.2f} {cpu_seconds:>12.2f} {serial_seconds / seconds:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -2,24 +2,29 @@ import os
 from botocore.exceptions import BotoCoreError
 from boto3.dynamodb.conditions import Key
 import boto3
-from .utils import parse_dynamo_item, str_to_upper
+from .utils import parse_dynamo_item, str_to_upper, read_pages, projection, page_limit
+from .parallel_scan import parallel_scan, is_segment_cursor
 
 
 def get_by_id(event, table):
     """
-    Gets a trip by its id.
+    Gets a trip by its id. The body can contain the `fields` to read, see `projection`.
 
     :param event: Event passed to lambda.
     :type event: dict
     :param table: Table containing the trips.
     :type table: dynamodb.Table
-    :return: 200 if trip_id was found, 404 if trip_id was not found, 500 for any internal error.
+    :return: 200 if trip_id was found, 404 if trip_id was not found, 400 if a field is unknown, 500 for any internal
+    error.
     :rtype: dict
     """
     response = None
 
     try:
-        dynamo_response = table.get_item(Key={'trip_id': event['body']['trip_id']})
+        dynamo_response = table.get_item(
+            Key={'trip_id': event['body']['trip_id']},
+            **projection(event['body'].get('fields'))
+        )
 
         if 'Item' in dynamo_response and dynamo_response['Item']:
             response = {
@@ -31,6 +36,12 @@ def get_by_id(event, table):
                 'statusCode': 404,
             }
 
+    except ValueError as e:
+        response = {
+            'statusCode': 400,
+            'details': str(e)
+        }
+
     except BotoCoreError as e:
         response = {
             'statusCode': 500,
@@ -46,15 +57,72 @@ def get_by_id(event, table):
     return response
 
 
+def verify_trip_admin(event, table):
+    """
+    Checks that a user is the admin of a trip, intended to guard the actions after it in a batch.
+
+    :param event: Event passed to lambda.
+    :type event: dict
+    :param table: Table containing the trips.
+    :type table: dynamodb.Table
+    :return: 200 if admin_id is the admin of trip_id, 401 if it is not, 404 if trip_id was not found,
+    500 for any internal error.
+    :rtype: dict
+    """
+    response = get_by_id(event, table)
+
+    if response['statusCode'] == 200:
+        if response['body']['admin_id'] == event['body']['admin_id']:
+            response = {
+                'statusCode': 200,
+            }
+        else:
+            response = {
+                'statusCode': 401,
+                'details': 'User is not the admin of the trip'
+            }
+
+    return response
+
+
+def paged_response(event, items, next_cursor):
+    """
+    Creates the response of a query that can be paged.
+
+    :param event: Event passed to lambda.
+    :type event: dict
+    :param items: The items read.
+    :type items: list
+    :param next_cursor: The cursor of the next page, None if there are no more items.
+    :type next_cursor: str
+    :return: 200 with the items and the `next_cursor`. 404 if nothing was found, unless a cursor was given, as the
+    previous page can end exactly at the last item.
+    :rtype: dict
+    """
+    if not items and not event['body'].get('cursor'):
+        return {
+            'statusCode': 404,
+        }
+
+    return {
+        'statusCode': 200,
+        'body': items,
+        'next_cursor': next_cursor
+    }
+
+
 def get_by_location(event, table):
     """
-    Gets trips by location.
+    Gets trips by location. The body can contain a `limit` to get a page of the trips, the `cursor` of the
+    previous page to continue from and the `fields` to read, see `projection`. Without a limit, or above it, at most
+    MAX_PAGE_LIMIT trips are returned.
 
     :param event: Event passed to lambda.
     :type event: dict
     :param table: Table containing the trips.
     :type table: dynamodb.Table
-    :return: 200 if location was found, 404 if location was not found, 500 for any internal error.
+    :return: 200 if location was found, with a `next_cursor` if there are more, 404 if location was not found,
+    400 if the cursor or a field is invalid, 500 for any internal error.
     :rtype: dict
     """
     response = None
@@ -62,20 +130,22 @@ def get_by_location(event, table):
     try:
         location = str_to_upper(event['body']['location'])
 
-        dynamo_response = table.query(
+        items, next_cursor = read_pages(
+            table.query,
+            limit=page_limit(event['body'].get('limit')),
+            cursor=event['body'].get('cursor'),
             IndexName='location-index',
-            KeyConditionExpression=Key('location').eq(location)
+            KeyConditionExpression=Key('location').eq(location),
+            **projection(event['body'].get('fields'))
         )
 
-        if len(dynamo_response.get('Items', [])) > 0:
-            response = {
-                'statusCode': 200,
-                'body': dynamo_response.get('Items', [])
-            }
-        else:
-            response = {
-                'statusCode': 404,
-            }
+        response = paged_response(event, items, next_cursor)
+
+    except ValueError as e:
+        response = {
+            'statusCode': 400,
+            'details': str(e)
+        }
 
     except BotoCoreError as e:
         response = {
@@ -94,13 +164,16 @@ def get_by_location(event, table):
 
 def get_by_admin_id(event, table):
     """
-    Gets trips by their associated admin_id.
+    Gets trips by their associated admin_id. The body can contain a `limit` to get a page of the trips, the
+    `cursor` of the previous page to continue from and the `fields` to read, see `projection`. Without a limit, or
+    above it, at most MAX_PAGE_LIMIT trips are returned.
 
     :param event: Event passed to lambda.
     :type event: dict
     :param table: Table containing the trips.
     :type table: dynamodb.Table
-    :return: 200 if admin_id was found, 404 if admin_id was not found, 500 for any internal error.
+    :return: 200 if admin_id was found, with a `next_cursor` if there are more, 404 if admin_id was not found,
+    400 if the cursor or a field is invalid, 500 for any internal error.
     :rtype: dict
     """
     response = None
@@ -108,20 +181,22 @@ def get_by_admin_id(event, table):
     try:
         admin_id = event['body']['admin_id']
 
-        dynamo_response = table.query(
+        items, next_cursor = read_pages(
+            table.query,
+            limit=page_limit(event['body'].get('limit')),
+            cursor=event['body'].get('cursor'),
             IndexName='admin_id-index',
-            KeyConditionExpression=Key('admin_id').eq(admin_id)
+            KeyConditionExpression=Key('admin_id').eq(admin_id),
+            **projection(event['body'].get('fields'))
         )
 
-        if len(dynamo_response.get('Items', [])) > 0:
-            response = {
-                'statusCode': 200,
-                'body': dynamo_response.get('Items', [])
-            }
-        else:
-            response = {
-                'statusCode': 404,
-            }
+        response = paged_response(event, items, next_cursor)
+
+    except ValueError as e:
+        response = {
+            'statusCode': 400,
+            'details': str(e)
+        }
 
     except BotoCoreError as e:
         response = {
@@ -138,25 +213,47 @@ def get_by_admin_id(event, table):
     return response
 
 
-def get_all_trips(table):
+def get_all_trips(event, table):
     """
-    Scans dynamodb and returns all trips.
+    Scans dynamodb and returns a page of the trips, of `limit` trips or at most MAX_PAGE_LIMIT. The table is scanned in
+    parallel segments if `segments` in the body, or the `PARALLEL_SCAN_SEGMENTS` environment variable, is above 1.
 
+    :param event: Event passed to lambda, the body can contain a `limit`, a `cursor` to continue from, the number
+    of `segments` and the `fields` to read, see `projection`.
+    :type event: dict
     :param table: Table containing the trips.
     :type table: dynamodb.Table
-    :return: 200 if all trips are being returned maximum is around 1mb, 404 if no trips exist,
-    500 for any internal error.
+    :return: 200 with the trips and a `next_cursor` if there are more, 400 if the cursor, segments or a field are
+    invalid, 500 for any internal error.
     :rtype: dict
     """
     response = None
+    body = event.get('body') or {}
 
     try:
-        # Scan the table - Note that this will read the entire table.
-        dynamo_response = table.scan()
+        segments = int(body.get('segments') or os.getenv('PARALLEL_SCAN_SEGMENTS', 1))
+        projection_kwargs = projection(body.get('fields'))
+
+        if segments > 1 or is_segment_cursor(body.get('cursor')):
+            items, next_cursor = parallel_scan(
+                table.name, segments, limit=page_limit(body.get('limit')), cursor=body.get('cursor'),
+                **projection_kwargs
+            )
+        else:
+            items, next_cursor = read_pages(
+                table.scan, limit=page_limit(body.get('limit')), cursor=body.get('cursor'), **projection_kwargs
+            )
 
         response = {
             'statusCode': 200,
-            'body': dynamo_response['Items']  # 'Items' will contain all the records
+            'body': items,
+            'next_cursor': next_cursor
+        }
+
+    except ValueError as e:
+        response = {
+            'statusCode': 400,
+            'details': str(e)
         }
 
     except BotoCoreError as e:
@@ -182,14 +279,15 @@ def get_all_trips(table):
 
 def get_all_trips_for_user_id(event, user_table, trip_table_name):
     """
-    Gets trips associated with a specified user_id.
+    Gets trips associated with a specified user_id. The body can contain the `fields` to read, see `projection`.
 
     :param event: Event passed to lambda.
     :type event: dict
     :param user_table: Table containing the user.
     :type user_table: dynamodb.Table
     :param trip_table_name: The name of the trips table.
-    :return: 200 if user_id was found, 404 if user_id or trips where not found, 500 for any internal error.
+    :return: 200 if user_id was found, 404 if user_id or trips where not found, 400 if a field is unknown, 500 for any
+    internal error.
     :rtype: dict
     """
     dynamodb = boto3.client('dynamodb')
@@ -210,7 +308,8 @@ def get_all_trips_for_user_id(event, user_table, trip_table_name):
             RequestItems={
                 trip_table_name: {
                     'Keys': keys,
-                    'ConsistentRead': False
+                    'ConsistentRead': False,
+                    **projection(event['body'].get('fields'))
                 }
             }
         )
@@ -225,6 +324,12 @@ def get_all_trips_for_user_id(event, user_table, trip_table_name):
             }
         }
 
+    except ValueError as e:
+        response = {
+            'statusCode': 400,
+            'details': str(e)
+        }
+
     except BotoCoreError as e:
         if "Invalid length for parameter" in str(e):
             response = {
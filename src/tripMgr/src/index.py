@@ -1,4 +1,5 @@
-from .get import get_by_id, get_by_location, get_by_admin_id, get_all_trips, get_all_trips_for_user_id
+from .get import get_by_id, get_by_location, get_by_admin_id, get_all_trips, get_all_trips_for_user_id, \
+    verify_trip_admin
 from .post import create_trip, user_wants_to_go_on_trip, user_approval_request, remove_user_application
 from .delete import delete_trip
 import boto3
@@ -8,6 +9,7 @@ import os
 def main(event, context):
     """
     Main event handler, this method directs events to the correct functions based on a action and httpMethod.
+    Events with the httpMethod `BATCH` run a list of actions in a single invocation, see `run_batch`.
     """
     # get DYNAMO_TABLE from environment variable
     dynamodb_resource = boto3.resource('dynamodb')
@@ -16,6 +18,16 @@ def main(event, context):
     USERS_DYNAMODB_TABLE = os.environ['USERS_DYNAMODB_TABLE']
     user_table = dynamodb_resource.Table(USERS_DYNAMODB_TABLE)
 
+    if event['httpMethod'] == 'BATCH':
+        return run_batch(event, trips_table, user_table, TRIPS_DYNAMO_TABLE, USERS_DYNAMODB_TABLE)
+
+    return dispatch(event, trips_table, user_table, TRIPS_DYNAMO_TABLE, USERS_DYNAMODB_TABLE)
+
+
+def dispatch(event, trips_table, user_table, TRIPS_DYNAMO_TABLE, USERS_DYNAMODB_TABLE):
+    """
+    Directs a single action to the correct function based on its action and httpMethod.
+    """
     http_method = event['httpMethod']
     action = event['action']
 
@@ -32,11 +44,14 @@ def main(event, context):
             response = get_by_admin_id(event, trips_table)
 
         elif action == 'get_all_trips':
-            response = get_all_trips(trips_table)
+            response = get_all_trips(event, trips_table)
 
         elif action == 'get_all_trips_for_user_id':
             response = get_all_trips_for_user_id(event, user_table, TRIPS_DYNAMO_TABLE)
 
+        elif action == 'verify_trip_admin':
+            response = verify_trip_admin(event, trips_table)
+
     elif http_method == 'POST':
         if action == 'create_trip':
             response = create_trip(event, trips_table)
@@ -59,3 +74,61 @@ def main(event, context):
         'body': 'Bad Request'
     }
 
+
+def run_batch(event, trips_table, user_table, TRIPS_DYNAMO_TABLE, USERS_DYNAMODB_TABLE):
+    """
+    Runs each action in `event['actions']` in order, each action is an event of its own with a httpMethod, action
+    and body. If `event['stop_on_failure']` is True, the actions after the first failed action (any statusCode of 400
+    or above) are skipped.
+
+    Example event:
+    {
+        'httpMethod': 'BATCH',
+        'stop_on_failure': True,
+        'actions': [
+            {'httpMethod': 'GET', 'action': 'verify_trip_admin', 'body': {'trip_id': 1, 'admin_id': 2}},
+            {'httpMethod': 'DELETE', 'action': 'delete_trip', 'body': {'trip_id': 1}}
+        ]
+    }
+
+    :return: 200 with a body containing one response per action in the same order, skipped actions respond with 424.
+    400 if the batch is malformed, i.e. its actions are not a list of events or contain a batch.
+    :rtype: dict
+    """
+    actions = event.get('actions')
+
+    if not isinstance(actions, list) or any(
+            not isinstance(action, dict) or action.get('httpMethod') == 'BATCH' for action in actions
+    ):
+        return {
+            'statusCode': 400,
+            'body': 'Bad Request'
+        }
+
+    stop_on_failure = event.get('stop_on_failure', False)
+    has_failed = False
+
+    responses = []
+    for action in actions:
+        if has_failed and stop_on_failure:
+            responses.append({
+                'statusCode': 424,
+                'details': 'Skipped, an earlier action in the batch failed'
+            })
+            continue
+
+        try:
+            response = dispatch(action, trips_table, user_table, TRIPS_DYNAMO_TABLE, USERS_DYNAMODB_TABLE)
+        except Exception as e:
+            response = {
+                'statusCode': 500,
+                'details': 'Error: ' + str(e)
+            }
+
+        has_failed = has_failed or response['statusCode'] >= 400
+        responses.append(response)
+
+    return {
+        'statusCode': 200,
+        'body': responses
+    }
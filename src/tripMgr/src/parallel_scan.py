@@ -0,0 +1,129 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+from .utils import read_key_pages, encode_cursor, decode_cursor, is_dynamo_key
+
+MAX_SEGMENTS = 16
+
+# Kept across warm invocations, along with each worker's table
+_executor = None
+_executor_lock = threading.Lock()
+_local = threading.local()
+
+
+def _get_executor():
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_SEGMENTS, thread_name_prefix='parallel-scan')
+
+    return _executor
+
+
+def create_table(table_name):
+    """
+    Creates a table for the calling worker thread, boto3 resources must not be shared between threads.
+
+    :param table_name: The name of the table.
+    :type table_name: str
+    :return: The table.
+    :rtype: dynamodb.Table
+    """
+    return boto3.session.Session().resource('dynamodb').Table(table_name)
+
+
+def _worker_table(table_name):
+    tables = getattr(_local, 'tables', None)
+    if tables is None:
+        tables = _local.tables = {}
+
+    if table_name not in tables:
+        tables[table_name] = create_table(table_name)
+
+    return tables[table_name]
+
+
+def _scan_segment(table_name, segment, total_segments, limit, start_key, kwargs):
+    kwargs = dict(kwargs, Segment=segment, TotalSegments=total_segments)
+    if start_key:
+        kwargs['ExclusiveStartKey'] = start_key
+
+    return read_key_pages(_worker_table(table_name).scan, limit, **kwargs)
+
+
+def is_segment_cursor(cursor):
+    """
+    :param cursor: A cursor passed to get_all_trips.
+    :type cursor: str
+    :return: True if the cursor was made by `parallel_scan`, so the scan must continue in parallel.
+    :rtype: bool
+    """
+    if not cursor:
+        return False
+
+    try:
+        return isinstance(decode_cursor(cursor), list)
+    except ValueError:
+        return False
+
+
+def parallel_scan(table_name, segments, limit=None, cursor=None, **kwargs):
+    """
+    Scans a table with `segments` workers, each scanning a segment of the table (Segment / TotalSegments), and merges
+    their items in segment order.
+
+    With a limit, the limit is split between the segments that have items left and the cursor records where each
+    segment got to, so a page never has more than `limit` items.
+
+    :param table_name: The name of the table.
+    :type table_name: str
+    :param segments: The number of segments to scan in parallel, at most MAX_SEGMENTS.
+    :type segments: int
+    :param limit: The maximum number of items to read, None to read the whole table.
+    :type limit: int
+    :param cursor: A cursor from a previous call to continue from, it decides the number of segments.
+    :type cursor: str
+    :param kwargs: Passed to each scan.
+    :return: (items, next_cursor), next_cursor is None once every segment has been read.
+    :rtype: tuple
+
+    :raises ValueError: If the cursor is malformed or segments is out of range.
+    """
+    if cursor:
+        # None: the segment has not been started, False: the segment is finished, else the segment's LastEvaluatedKey
+        state = decode_cursor(cursor)
+
+        if not isinstance(state, list) or not 1 <= len(state) <= MAX_SEGMENTS or \
+                not all(key is None or key is False or is_dynamo_key(key) for key in state):
+            raise ValueError('Invalid cursor')
+    else:
+        if not 1 <= segments <= MAX_SEGMENTS:
+            raise ValueError(f'segments must be between 1 and {MAX_SEGMENTS}')
+
+        state = [None] * segments
+
+    active = [segment for segment, key in enumerate(state) if key is not False]
+    segment_limit = None
+
+    if limit is not None:
+        if limit < len(active):
+            active = active[:limit]
+        segment_limit = limit // len(active) if active else None
+
+    executor = _get_executor()
+    futures = [
+        executor.submit(_scan_segment, table_name, segment, len(state), segment_limit, state[segment], kwargs)
+        for segment in active
+    ]
+
+    items = []
+    for segment, future in zip(active, futures):
+        segment_items, last_evaluated_key = future.result()
+
+        items += segment_items
+        state[segment] = last_evaluated_key if last_evaluated_key else False
+
+    next_cursor = encode_cursor(state) if any(key is not False for key in state) else None
+
+    return items, next_cursor
@@ -1,5 +1,5 @@
 from botocore.exceptions import BotoCoreError, ClientError
-from .utils import create_new_id, remove_element_from_list, str_to_upper
+from .utils import create_new_id, remove_element_from_list, str_to_upper, VERSION_UPDATE, VERSION_CLIENT_VALUES
 import boto3
 
 
@@ -31,7 +31,8 @@ def create_trip(event, table):
             'title': title_name,
             'description': event['body']['description'],
             'awaiting_approval': [],
-            'approved': []
+            'approved': [],
+            'version': 1
         })
 
         response = {
@@ -91,10 +92,11 @@ def user_wants_to_go_on_trip(event, trip_table_name, user_table_name):
                 'Update': {
                     'TableName': trip_table_name,
                     'Key': {'trip_id': {'N': str(trip_id)}},
-                    'UpdateExpression': 'SET awaiting_approval = list_append(if_not_exists(awaiting_approval, :empty_list), :val)',
+                    'UpdateExpression': 'SET awaiting_approval = list_append(if_not_exists(awaiting_approval, :empty_list), :val), ' + VERSION_UPDATE,
                     'ExpressionAttributeValues': {':val': {'L': [{'N': str(user_id)}]},
                                                   ':empty_list': {'L': []},
-                                                  ':user_id': {'N': str(user_id)}
+                                                  ':user_id': {'N': str(user_id)},
+                                                  **VERSION_CLIENT_VALUES
                                                   },
                     'ConditionExpression': 'attribute_not_exists(awaiting_approval) OR NOT contains(awaiting_approval, :user_id)',
                 }
@@ -156,10 +158,11 @@ def user_approval_request(event, trip_table_name, user_table_name):
                     'Update': {
                         'TableName': trip_table_name,
                         'Key': {'trip_id': {'N': str(trip_id)}},
-                        'UpdateExpression': 'SET approved = list_append(if_not_exists(approved, :empty_list), :val)',
+                        'UpdateExpression': 'SET approved = list_append(if_not_exists(approved, :empty_list), :val), ' + VERSION_UPDATE,
                         'ExpressionAttributeValues': {':val': {'L': [{'N': str(user_id)}]},
                                                       ':empty_list': {'L': []},
-                                                      ':user_id': {'N': str(user_id)}
+                                                      ':user_id': {'N': str(user_id)},
+                                                      **VERSION_CLIENT_VALUES
                                                       },
                         'ConditionExpression': 'attribute_not_exists(approved) OR NOT contains(approved, :user_id)',
                     }
@@ -1,7 +1,27 @@
+import base64
+import json
+import os
 import random
 import time
+from decimal import Decimal
 import boto3
 
+# Added to the UpdateExpression of every write to a trip, so its `version` goes up with each change and the gateway
+# can derive ETags from it. Trips written before versions existed start from 0.
+VERSION_UPDATE = 'version = if_not_exists(version, :zero) + :one'
+VERSION_VALUES = {':zero': 0, ':one': 1}
+# The same values in the low level format, for transact_write_items
+VERSION_CLIENT_VALUES = {':zero': {'N': '0'}, ':one': {'N': '1'}}
+
+# Attributes of a trip that reads can be limited to with `fields`
+TRIP_FIELDS = ('trip_id', 'admin_id', 'location', 'title', 'description', 'start_date', 'end_date',
+               'awaiting_approval', 'approved', 'version')
+# Always read, the gateway needs them to cache the trips and derive their ETags
+REQUIRED_TRIP_FIELDS = ('trip_id', 'version')
+# The most trips a query or scan returns, also when no limit is given, so the response stays well below the 6 MB
+# lambda response limit. The rest are read with the next_cursor.
+MAX_PAGE_LIMIT = int(os.getenv('MAX_PAGE_LIMIT', 1000))
+
 
 def create_new_id(table):
     """
@@ -40,7 +60,7 @@ def remove_element_from_list(table_name, is_user_table, lookup_id, element_to_re
     :type element_to_remove: int
     :param is_approved_column: Is the entry being removed in the approved (True) or awaiting approval (False) column.
     :type is_approved_column: bool
-    :return: None
+    :return: None, removing from a trip also bumps its version.
     :raises Exception: Raised if entry could not be removed, likely cause is if the entry did not exist.
     """
 
@@ -57,10 +77,18 @@ def remove_element_from_list(table_name, is_user_table, lookup_id, element_to_re
     for id_value in item[approval_column]:
         if str(id_value) == str(element_to_remove):
             update_expression = f'REMOVE {approval_column}[{index}]'
-            table.update_item(
-                Key={id_column: int(lookup_id)},
-                UpdateExpression=update_expression
-            )
+
+            if is_user_table:
+                table.update_item(
+                    Key={id_column: int(lookup_id)},
+                    UpdateExpression=update_expression
+                )
+            else:
+                table.update_item(
+                    Key={id_column: int(lookup_id)},
+                    UpdateExpression=f'{update_expression} SET {VERSION_UPDATE}',
+                    ExpressionAttributeValues=VERSION_VALUES
+                )
             return
         else:
             index += 1
@@ -116,3 +144,146 @@ def parse_dynamo_item(item):
     for key, val in item.items():
         parsed_item[key] = parse_dynamo_value(val)
     return parsed_item
+
+
+def _cursor_default(value):
+    if isinstance(value, Decimal):
+        return int(value) if value % 1 == 0 else float(value)
+    raise TypeError('Cannot encode ' + type(value).__name__ + ' in a cursor')
+
+
+def encode_cursor(value):
+    """
+    Encodes a LastEvaluatedKey, or the state of a parallel scan, as an opaque cursor that can be passed back to
+    continue a scan or query.
+
+    :param value: The LastEvaluatedKey returned by dynamodb, or any other JSON value.
+    :return: The cursor.
+    :rtype: str
+    """
+    encoded = json.dumps(value, default=_cursor_default).encode('utf-8')
+
+    return base64.urlsafe_b64encode(encoded).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor made by `encode_cursor`.
+
+    :param cursor: The cursor.
+    :type cursor: str
+    :return: The encoded value, numbers that are not whole are Decimals as boto3 requires.
+
+    :raises ValueError: If the cursor is malformed.
+    """
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)), parse_float=Decimal)
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor')
+
+
+def is_dynamo_key(value):
+    """
+    :param value: A decoded cursor.
+    :return: True if the value can be used as an ExclusiveStartKey.
+    :rtype: bool
+    """
+    return isinstance(value, dict) and all(isinstance(val, (int, str, Decimal)) for val in value.values())
+
+
+def projection(fields):
+    """
+    Builds the arguments that make a read return only some attributes of the trips, which reads fewer capacity units
+    and makes smaller responses. trip_id and version are always read. The attributes are given by placeholder, as
+    some of them (e.g. location) are reserved words.
+
+    :param fields: The attributes to read, None or empty to read whole items.
+    :type fields: list
+    :return: ProjectionExpression and ExpressionAttributeNames to pass to get_item, query, scan or batch_get_item,
+    empty to read whole items.
+    :rtype: dict
+
+    :raises ValueError: If a field is not an attribute of a trip.
+    """
+    if not fields:
+        return {}
+
+    unknown = [field for field in fields if field not in TRIP_FIELDS]
+    if unknown:
+        raise ValueError('Unknown fields: ' + ', '.join(str(field) for field in unknown))
+
+    names = [field for field in TRIP_FIELDS if field in fields or field in REQUIRED_TRIP_FIELDS]
+
+    return {
+        'ProjectionExpression': ', '.join(f'#p{index}' for index in range(len(names))),
+        'ExpressionAttributeNames': {f'#p{index}': name for index, name in enumerate(names)},
+    }
+
+
+def page_limit(limit):
+    """
+    :param limit: The limit given in an event, None if there was none.
+    :type limit: int | None
+    :return: The limit capped at MAX_PAGE_LIMIT, MAX_PAGE_LIMIT if there was none.
+    :rtype: int
+    """
+    return MAX_PAGE_LIMIT if limit is None else min(int(limit), MAX_PAGE_LIMIT)
+
+
+def read_pages(read, limit=None, cursor=None, **kwargs):
+    """
+    Calls a scan or query, following LastEvaluatedKey until `limit` items have been read or there are no more pages.
+
+    :param read: table.scan or table.query.
+    :type read: function
+    :param limit: The maximum number of items to read, None to read every page.
+    :type limit: int
+    :param cursor: A cursor from a previous call to continue from.
+    :type cursor: str
+    :param kwargs: Passed to read, e.g. IndexName and KeyConditionExpression.
+    :return: (items, next_cursor), next_cursor is None once there are no more items.
+    :rtype: tuple
+
+    :raises ValueError: If the cursor is malformed.
+    """
+    if cursor:
+        kwargs['ExclusiveStartKey'] = decode_cursor(cursor)
+
+        if not is_dynamo_key(kwargs['ExclusiveStartKey']):
+            raise ValueError('Invalid cursor')
+
+    items, last_evaluated_key = read_key_pages(read, limit, **kwargs)
+
+    return items, encode_cursor(last_evaluated_key) if last_evaluated_key else None
+
+
+def read_key_pages(read, limit=None, **kwargs):
+    """
+    The same as `read_pages`, but continuing from and returning a LastEvaluatedKey rather than a cursor.
+
+    :param read: table.scan or table.query.
+    :type read: function
+    :param limit: The maximum number of items to read, None to read every page.
+    :type limit: int
+    :param kwargs: Passed to read, e.g. ExclusiveStartKey.
+    :return: (items, last_evaluated_key), last_evaluated_key is None once there are no more items.
+    :rtype: tuple
+    """
+    items = []
+
+    while True:
+        if limit is not None:
+            kwargs['Limit'] = limit - len(items)
+
+        dynamo_response = read(**kwargs)
+        items += dynamo_response.get('Items', [])
+
+        last_evaluated_key = dynamo_response.get('LastEvaluatedKey')
+
+        if not last_evaluated_key:
+            return items, None
+
+        if limit is not None and len(items) >= limit:
+            return items, last_evaluated_key
+
+        kwargs['ExclusiveStartKey'] = last_evaluated_key
@@ -3,6 +3,8 @@ from unittest.mock import patch, MagicMock
 from src.index import main
 from botocore.exceptions import BotoCoreError
 from boto3.dynamodb.conditions import Key
+from decimal import Decimal
+from src.utils import MAX_PAGE_LIMIT
 
 
 class TestLambdaFunction(unittest.TestCase):
@@ -157,13 +159,15 @@ class TestLambdaFunction(unittest.TestCase):
         response = main(lambda_event, lambda_context)
 
         mock_dynamodb_table.query.assert_called_once_with(
+            Limit=MAX_PAGE_LIMIT,
             IndexName='location-index',
             KeyConditionExpression=Key('location').eq(location)
         )
 
         expected_response = {
             'statusCode': 200,
-            'body': mock_response['Items']
+            'body': mock_response['Items'],
+            'next_cursor': None
         }
 
         self.assertEqual(response, expected_response)
@@ -267,13 +271,15 @@ class TestLambdaFunction(unittest.TestCase):
         response = main(lambda_event, lambda_context)
 
         mock_dynamodb_table.query.assert_called_once_with(
+            Limit=MAX_PAGE_LIMIT,
             IndexName='admin_id-index',
             KeyConditionExpression=Key('admin_id').eq(admin_id)
         )
 
         expected_response = {
             'statusCode': 200,
-            'body': mock_response['Items']
+            'body': mock_response['Items'],
+            'next_cursor': None
         }
 
         self.assertEqual(response, expected_response)
@@ -333,3 +339,106 @@ class TestLambdaFunction(unittest.TestCase):
         }
 
         self.assertEqual(response, expected_response)
+
+    @patch('boto3.resource')
+    def test_verify_trip_admin(self, mock_boto3_resource):
+        mock_dynamodb_resource = MagicMock()
+        mock_boto3_resource.return_value = mock_dynamodb_resource
+        mock_dynamodb_table = MagicMock()
+        mock_dynamodb_resource.Table.return_value = mock_dynamodb_table
+
+        mock_dynamodb_table.get_item.return_value = {'Item': {'trip_id': 123, 'admin_id': 19823091}}
+
+        def verify(admin_id):
+            return main({
+                'httpMethod': 'GET',
+                'action': 'verify_trip_admin',
+                'body': {
+                    'trip_id': 123,
+                    'admin_id': admin_id
+                }
+            }, {})
+
+        self.assertEqual(verify(19823091), {'statusCode': 200})
+        self.assertEqual(verify(1)['statusCode'], 401)
+
+        mock_dynamodb_table.get_item.return_value = {}
+        self.assertEqual(verify(19823091), {'statusCode': 404})
+
+    @patch('boto3.resource')
+    def test_get_all_trips_follows_last_evaluated_key(self, mock_boto3_resource):
+        mock_dynamodb_resource = MagicMock()
+        mock_boto3_resource.return_value = mock_dynamodb_resource
+        mock_dynamodb_table = MagicMock()
+        mock_dynamodb_resource.Table.return_value = mock_dynamodb_table
+
+        mock_dynamodb_table.scan.side_effect = [
+            {'Items': [{'trip_id': 1}], 'LastEvaluatedKey': {'trip_id': Decimal(1)}},
+            {'Items': [{'trip_id': 2}]},
+        ]
+
+        response = main({'httpMethod': 'GET', 'action': 'get_all_trips'}, {})
+
+        self.assertEqual(response, {'statusCode': 200, 'body': [{'trip_id': 1}, {'trip_id': 2}], 'next_cursor': None})
+        mock_dynamodb_table.scan.assert_called_with(Limit=MAX_PAGE_LIMIT - 1, ExclusiveStartKey={'trip_id': Decimal(1)})
+
+    @patch('src.get.page_limit', return_value=2)
+    @patch('boto3.resource')
+    def test_get_all_trips_without_a_limit_stops_at_the_maximum_page(self, mock_boto3_resource, mock_page_limit):
+        mock_dynamodb_resource = MagicMock()
+        mock_boto3_resource.return_value = mock_dynamodb_resource
+        mock_dynamodb_table = MagicMock()
+        mock_dynamodb_resource.Table.return_value = mock_dynamodb_table
+
+        mock_dynamodb_table.scan.return_value = {
+            'Items': [{'trip_id': 1}, {'trip_id': 2}], 'LastEvaluatedKey': {'trip_id': Decimal(2)}
+        }
+
+        response = main({'httpMethod': 'GET', 'action': 'get_all_trips'}, {})
+
+        self.assertEqual(response['body'], [{'trip_id': 1}, {'trip_id': 2}])
+        self.assertIsNotNone(response['next_cursor'])
+        mock_dynamodb_table.scan.assert_called_once_with(Limit=2)
+        mock_page_limit.assert_called_once_with(None)
+
+    @patch('boto3.resource')
+    def test_get_trips_by_location_in_pages(self, mock_boto3_resource):
+        mock_dynamodb_resource = MagicMock()
+        mock_boto3_resource.return_value = mock_dynamodb_resource
+        mock_dynamodb_table = MagicMock()
+        mock_dynamodb_resource.Table.return_value = mock_dynamodb_table
+
+        mock_dynamodb_table.query.return_value = {
+            'Items': [{'trip_id': 1}, {'trip_id': 2}],
+            'LastEvaluatedKey': {'trip_id': Decimal(2), 'location': 'London'}
+        }
+
+        def get_page(cursor=None):
+            body = {'location': 'london', 'limit': 2}
+            if cursor:
+                body['cursor'] = cursor
+            return main({'httpMethod': 'GET', 'action': 'get_trip_info_by_location', 'body': body}, {})
+
+        first_page = get_page()
+
+        self.assertEqual(first_page['statusCode'], 200)
+        self.assertEqual(first_page['body'], [{'trip_id': 1}, {'trip_id': 2}])
+        mock_dynamodb_table.query.assert_called_once_with(
+            Limit=2,
+            IndexName='location-index',
+            KeyConditionExpression=Key('location').eq('London')
+        )
+
+        # the previous page ended on the last trip
+        mock_dynamodb_table.query.return_value = {'Items': []}
+        second_page = get_page(first_page['next_cursor'])
+
+        self.assertEqual(second_page, {'statusCode': 200, 'body': [], 'next_cursor': None})
+        mock_dynamodb_table.query.assert_called_with(
+            Limit=2,
+            ExclusiveStartKey={'trip_id': 2, 'location': 'London'},
+            IndexName='location-index',
+            KeyConditionExpression=Key('location').eq('London')
+        )
+
+        self.assertEqual(get_page('not a cursor')['statusCode'], 400)
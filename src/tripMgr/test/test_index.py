@@ -0,0 +1,153 @@
+import unittest
+from unittest.mock import patch, MagicMock
+from src.index import main
+
+
+class TestBatch(unittest.TestCase):
+    @patch('src.delete.remove_element_from_list')
+    @patch('boto3.resource')
+    def test_batch_runs_every_action(self, mock_boto3_resource, mock_remove_element):
+        mock_dynamodb_resource = MagicMock()
+        mock_boto3_resource.return_value = mock_dynamodb_resource
+        mock_dynamodb_table = MagicMock()
+        mock_dynamodb_resource.Table.return_value = mock_dynamodb_table
+
+        trip_id = 17028438789525
+        admin_id = 19823091
+        mock_dynamodb_table.get_item.return_value = {
+            'Item': {
+                'trip_id': trip_id,
+                'admin_id': admin_id,
+                'awaiting_approval': [],
+                'approved': []
+            }
+        }
+
+        lambda_event = {
+            'httpMethod': 'BATCH',
+            'stop_on_failure': True,
+            'actions': [
+                {
+                    'httpMethod': 'GET',
+                    'action': 'verify_trip_admin',
+                    'body': {
+                        'trip_id': trip_id,
+                        'admin_id': admin_id
+                    }
+                },
+                {
+                    'httpMethod': 'DELETE',
+                    'action': 'delete_trip',
+                    'body': {
+                        'trip_id': trip_id
+                    }
+                }
+            ]
+        }
+
+        response = main(lambda_event, {})
+
+        mock_dynamodb_table.delete_item.assert_called_once_with(Key={'trip_id': trip_id})
+
+        expected_response = {
+            'statusCode': 200,
+            'body': [
+                {'statusCode': 200},
+                {'statusCode': 200}
+            ]
+        }
+        self.assertEqual(response, expected_response)
+
+    @patch('boto3.resource')
+    def test_batch_stop_on_failure_skips_remaining_actions(self, mock_boto3_resource):
+        mock_dynamodb_resource = MagicMock()
+        mock_boto3_resource.return_value = mock_dynamodb_resource
+        mock_dynamodb_table = MagicMock()
+        mock_dynamodb_resource.Table.return_value = mock_dynamodb_table
+
+        trip_id = 17028438789525
+        mock_dynamodb_table.get_item.return_value = {
+            'Item': {
+                'trip_id': trip_id,
+                'admin_id': 19823091,
+            }
+        }
+
+        lambda_event = {
+            'httpMethod': 'BATCH',
+            'stop_on_failure': True,
+            'actions': [
+                {
+                    'httpMethod': 'GET',
+                    'action': 'verify_trip_admin',
+                    'body': {
+                        'trip_id': trip_id,
+                        'admin_id': 1
+                    }
+                },
+                {
+                    'httpMethod': 'DELETE',
+                    'action': 'delete_trip',
+                    'body': {
+                        'trip_id': trip_id
+                    }
+                }
+            ]
+        }
+
+        response = main(lambda_event, {})
+
+        mock_dynamodb_table.delete_item.assert_not_called()
+
+        self.assertEqual(response['statusCode'], 200)
+        self.assertEqual([result['statusCode'] for result in response['body']], [401, 424])
+
+    @patch('boto3.resource')
+    def test_batch_without_stop_on_failure_runs_remaining_actions(self, mock_boto3_resource):
+        mock_dynamodb_resource = MagicMock()
+        mock_boto3_resource.return_value = mock_dynamodb_resource
+        mock_dynamodb_table = MagicMock()
+        mock_dynamodb_resource.Table.return_value = mock_dynamodb_table
+
+        mock_dynamodb_table.get_item.side_effect = [{}, {'Item': {'trip_id': 2}}]
+
+        lambda_event = {
+            'httpMethod': 'BATCH',
+            'actions': [
+                {'httpMethod': 'GET', 'action': 'get_trip_info_by_id', 'body': {'trip_id': 1}},
+                {'httpMethod': 'GET', 'action': 'get_trip_info_by_id', 'body': {'trip_id': 2}},
+                {'httpMethod': 'GET', 'action': 'unknown_action'}
+            ]
+        }
+
+        response = main(lambda_event, {})
+
+        expected_response = {
+            'statusCode': 200,
+            'body': [
+                {'statusCode': 404},
+                {'statusCode': 200, 'body': {'trip_id': 2}},
+                {'statusCode': 400, 'body': 'Bad Request'}
+            ]
+        }
+        self.assertEqual(response, expected_response)
+
+    @patch('boto3.resource')
+    def test_batch_rejects_nested_batches(self, mock_boto3_resource):
+        lambda_event = {
+            'httpMethod': 'BATCH',
+            'actions': [
+                {'httpMethod': 'BATCH', 'actions': []}
+            ]
+        }
+
+        response = main(lambda_event, {})
+
+        self.assertEqual(response, {'statusCode': 400, 'body': 'Bad Request'})
+
+    @patch('boto3.resource')
+    def test_batch_rejects_actions_that_are_not_events(self, mock_boto3_resource):
+        for actions in ([None], ['delete_trip'], [{'httpMethod': 'GET', 'action': 'verify_trip_admin'}, 1]):
+            response = main({'httpMethod': 'BATCH', 'actions': actions}, {})
+
+            self.assertEqual(response, {'statusCode': 400, 'body': 'Bad Request'})
@@ -0,0 +1,68 @@
+import boto3
+import pytest
+from moto import mock_aws
+from src.get import get_all_trips
+
+TRIP_COUNT = 50
+
+
+@pytest.fixture
+def trips_table(aws_credentials, monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'eu-west-1')
+
+    with mock_aws():
+        table = boto3.resource('dynamodb').create_table(
+            TableName='trip_table',
+            KeySchema=[{'AttributeName': 'trip_id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'trip_id', 'AttributeType': 'N'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+
+        with table.batch_writer() as batch:
+            for trip_id in range(TRIP_COUNT):
+                batch.put_item(Item={'trip_id': trip_id, 'location': 'London'})
+
+        yield table
+
+
+def trip_ids(items):
+    return sorted(int(item['trip_id']) for item in items)
+
+
+def test_parallel_scan_reads_every_trip(trips_table):
+    serial = get_all_trips({}, trips_table)
+    parallel = get_all_trips({'body': {'segments': 4}}, trips_table)
+
+    assert serial['statusCode'] == parallel['statusCode'] == 200
+    assert trip_ids(parallel['body']) == trip_ids(serial['body']) == list(range(TRIP_COUNT))
+
+
+def test_parallel_scan_in_pages(trips_table):
+    items = []
+    cursor = None
+    pages = 0
+
+    while True:
+        body = {'segments': 4, 'limit': 8}
+        if cursor:
+            # the cursor continues the parallel scan without the segments being passed again
+            body = {'limit': 8, 'cursor': cursor}
+
+        response = get_all_trips({'body': body}, trips_table)
+
+        assert response['statusCode'] == 200
+        assert len(response['body']) <= 8
+
+        items += response['body']
+        cursor = response['next_cursor']
+        pages += 1
+
+        if cursor is None:
+            break
+
+    assert trip_ids(items) == list(range(TRIP_COUNT))
+    assert pages > TRIP_COUNT // 8
+
+
+def test_parallel_scan_rejects_bad_segments(trips_table):
+    assert get_all_trips({'body': {'segments': 100}}, trips_table)['statusCode'] == 400
@@ -64,7 +64,8 @@ class TestLambdaFunction(unittest.TestCase):
             'title': title,
             'description': description,
             'awaiting_approval': [],
-            'approved': []
+            'approved': [],
+            'version': 1
         })
 
         # Define the expected response
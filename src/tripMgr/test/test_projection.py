@@ -0,0 +1,104 @@
+import boto3
+import pytest
+from moto import mock_aws
+from src.get import get_by_id, get_by_location, get_by_admin_id, get_all_trips, get_all_trips_for_user_id
+from src.utils import projection
+
+ADMIN_ID = 19823091
+USER_ID = 1
+FIELDS = ['title', 'location', 'start_date']
+
+
+@pytest.fixture
+def tables(aws_credentials, monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'eu-west-1')
+
+    with mock_aws():
+        dynamodb = boto3.resource('dynamodb')
+
+        trips_table = dynamodb.create_table(
+            TableName='trip_table',
+            KeySchema=[{'AttributeName': 'trip_id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[
+                {'AttributeName': 'trip_id', 'AttributeType': 'N'},
+                {'AttributeName': 'location', 'AttributeType': 'S'},
+                {'AttributeName': 'admin_id', 'AttributeType': 'N'},
+            ],
+            GlobalSecondaryIndexes=[{
+                'IndexName': f'{key}-index',
+                'KeySchema': [{'AttributeName': key, 'KeyType': 'HASH'}],
+                'Projection': {'ProjectionType': 'ALL'},
+            } for key in ('location', 'admin_id')],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        users_table = dynamodb.create_table(
+            TableName='user_table',
+            KeySchema=[{'AttributeName': 'user_id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'user_id', 'AttributeType': 'N'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+
+        for trip_id in range(3):
+            trips_table.put_item(Item={
+                'trip_id': trip_id,
+                'admin_id': ADMIN_ID,
+                'location': 'London',
+                'title': f'Trip {trip_id}',
+                'description': 'A long description',
+                'start_date': 946684800,
+                'end_date': 946713600,
+                'awaiting_approval': [USER_ID],
+                'approved': [],
+                'version': 2,
+            })
+        users_table.put_item(Item={'user_id': USER_ID, 'awaiting_approval': [0, 1, 2], 'approved': []})
+
+        yield trips_table, users_table
+
+
+def assert_projected(items):
+    assert items
+    for item in items:
+        assert set(item) == {'trip_id', 'version', 'title', 'location', 'start_date'}
+
+
+def test_every_read_returns_only_the_requested_fields(tables):
+    trips_table, users_table = tables
+
+    response = get_by_id({'body': {'trip_id': 1, 'fields': FIELDS}}, trips_table)
+    assert_projected([response['body']])
+
+    response = get_by_location({'body': {'location': 'london', 'fields': FIELDS}}, trips_table)
+    assert_projected(response['body'])
+
+    response = get_by_admin_id({'body': {'admin_id': ADMIN_ID, 'fields': FIELDS, 'limit': 2}}, trips_table)
+    assert_projected(response['body'])
+    assert response['next_cursor'] is not None
+
+    response = get_all_trips({'body': {'fields': FIELDS}}, trips_table)
+    assert_projected(response['body'])
+
+    response = get_all_trips({'body': {'fields': FIELDS, 'segments': 2}}, trips_table)
+    assert_projected(response['body'])
+
+    response = get_all_trips_for_user_id({'body': {'user_id': USER_ID, 'fields': FIELDS}}, users_table, 'trip_table')
+    assert_projected(response['body']['items'])
+
+
+def test_whole_trips_are_read_without_fields(tables):
+    trips_table, users_table = tables
+
+    response = get_by_id({'body': {'trip_id': 1}}, trips_table)
+
+    assert 'description' in response['body']
+    assert 'awaiting_approval' in response['body']
+
+
+def test_unknown_fields_are_rejected(tables):
+    trips_table, users_table = tables
+
+    with pytest.raises(ValueError):
+        projection(['title', 'password'])
+
+    assert get_by_id({'body': {'trip_id': 1, 'fields': ['password']}}, trips_table)['statusCode'] == 400
+    assert get_all_trips({'body': {'fields': ['password']}}, trips_table)['statusCode'] == 400
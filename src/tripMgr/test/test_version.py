@@ -0,0 +1,52 @@
+import boto3
+import pytest
+from moto import mock_aws
+from src.post import user_wants_to_go_on_trip, user_approval_request, remove_user_application
+
+TRIP_ID = 17028438789525
+USER_ID = 19823091
+
+
+@pytest.fixture
+def tables(aws_credentials, monkeypatch):
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'eu-west-1')
+
+    with mock_aws():
+        dynamodb = boto3.resource('dynamodb')
+
+        def create_table(name, key):
+            return dynamodb.create_table(
+                TableName=name,
+                KeySchema=[{'AttributeName': key, 'KeyType': 'HASH'}],
+                AttributeDefinitions=[{'AttributeName': key, 'AttributeType': 'N'}],
+                BillingMode='PAY_PER_REQUEST'
+            )
+
+        trips_table = create_table('trip_table', 'trip_id')
+        users_table = create_table('user_table', 'user_id')
+
+        # a trip written before versions existed
+        trips_table.put_item(Item={'trip_id': TRIP_ID, 'awaiting_approval': [], 'approved': []})
+        users_table.put_item(Item={'user_id': USER_ID, 'awaiting_approval': [], 'approved': []})
+
+        yield trips_table, users_table
+
+
+def version(trips_table):
+    return trips_table.get_item(Key={'trip_id': TRIP_ID})['Item'].get('version')
+
+
+def test_every_write_to_a_trip_bumps_its_version(tables):
+    trips_table, users_table = tables
+    event = {'body': {'trip_id': TRIP_ID, 'user_id': USER_ID, 'is_approved': True}}
+
+    assert user_wants_to_go_on_trip(event, 'trip_table', 'user_table')['statusCode'] == 200
+    assert version(trips_table) == 1
+
+    # removed from awaiting_approval, then added to approved
+    assert user_approval_request(event, 'trip_table', 'user_table')['statusCode'] == 200
+    assert version(trips_table) == 3
+
+    assert remove_user_application(event, 'trip_table', 'user_table')['statusCode'] == 200
+    assert version(trips_table) == 4
+    assert 'version' not in users_table.get_item(Key={'user_id': USER_ID})['Item']